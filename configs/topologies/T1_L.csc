@@ -736,8 +736,130 @@ log.log("Headless simulation started\n");
 log.log("Duration: @SIM_TIME_SEC@s\n");
 log.log("Nodes: " + sim.getMotesCount() + "\n");
 var trustFile = "@TRUST_FEEDBACK_PATH@";
+// Unix socket of the sweep's feedback bridge. Unset (empty or still the
+// placeholder) or unreachable means trustFile is polled instead.
+var trustSocket = "@TRUST_FEEDBACK_SOCKET@";
+// "neighbors" delivers an update only to motes within radio range of the
+// updated node (its RPL neighbors and parent candidates); otherwise every
+// mote gets it.
+var trustTargets = "@TRUST_INJECT_TARGETS@";
+// Updates packed into one TRUST,<node>,<trust>[,<node>,<trust>...] command.
+var trustBatch = parseInt("@TRUST_INJECT_BATCH@");
+if(isNaN(trustBatch) || trustBatch < 1) {
+  trustBatch = 1;
+}
+// Longest serial command; stays under the motes' serial_line buffer.
+var trustLineMax = 72;
+var trustRange = 45.0;
 var lastCheckMs = 0;
 var lastPos = 0;
+var lastSimLogUs = 0;
+// 0-based line of the feedback file, the "update" of trust_engine --latency-out.
+var trustIndex = 0;
+var fileIndex = 0;
+// Updates read since the last delivery; only the latest per node is sent.
+var pendingTrust = [];
+var pendingByNode = {};
+var trustNeighbors = null;
+var channel = null;
+var channelBuf = null;
+var channelText = "";
+function buildNeighbors() {
+  trustNeighbors = {};
+  var range2 = trustRange * trustRange;
+  for(var i = 0; i < sim.getMotesCount(); i++) {
+    var a = sim.getMote(i).getInterfaces().getPosition();
+    var near = [];
+    for(var j = 0; j < sim.getMotesCount(); j++) {
+      var b = sim.getMote(j).getInterfaces().getPosition();
+      var dx = a.getXCoordinate() - b.getXCoordinate();
+      var dy = a.getYCoordinate() - b.getYCoordinate();
+      if(i != j && dx * dx + dy * dy <= range2) {
+        near.push(j);
+      }
+    }
+    trustNeighbors[String(sim.getMote(i).getID())] = near;
+  }
+}
+function trustTargetsOf(node) {
+  if(trustTargets == "neighbors") {
+    if(trustNeighbors == null) {
+      buildNeighbors();
+    }
+    if(trustNeighbors[node] != null) {
+      return trustNeighbors[node];
+    }
+  }
+  var all = [];
+  for(var i = 0; i < sim.getMotesCount(); i++) {
+    all.push(i);
+  }
+  return all;
+}
+function queueTrust(line) {
+  line = String(line).trim();
+  if(line.length == 0) {
+    return;
+  }
+  var parts = line.split(",");
+  if(parts.length < 3) {
+    return;
+  }
+  if(parts[0] != "TRUST") {
+    return;
+  }
+  var update = {index: trustIndex, node: parts[1], trust: parts[2]};
+  var previous = pendingByNode[update.node];
+  if(previous != null) {
+    previous.superseded = true;
+  }
+  pendingByNode[update.node] = update;
+  pendingTrust.push(update);
+  trustIndex++;
+}
+function flushTrust() {
+  var commands = {};
+  var delivered = [];
+  for(var u = 0; u < pendingTrust.length; u++) {
+    var update = pendingTrust[u];
+    if(update.superseded) {
+      continue;
+    }
+    var pair = update.node + "," + update.trust;
+    var targets = trustTargetsOf(update.node);
+    for(var t = 0; t < targets.length; t++) {
+      var m = targets[t];
+      if(commands[m] == null) {
+        commands[m] = [];
+      }
+      var cmds = commands[m];
+      var last = cmds.length - 1;
+      if(last < 0 || cmds[last].pairs >= trustBatch
+         || cmds[last].text.length + pair.length + 1 > trustLineMax) {
+        cmds.push({text: "TRUST", pairs: 0});
+        last++;
+      }
+      cmds[last].text += "," + pair;
+      cmds[last].pairs++;
+    }
+    delivered.push(update);
+  }
+  for(var m in commands) {
+    var mote = sim.getMote(parseInt(m));
+    for(var c = 0; c < commands[m].length; c++) {
+      try {
+        mote.getInterfaces().getLog().writeString(commands[m][c].text + "\n");
+      } catch (e) {
+      }
+    }
+  }
+  for(var d = 0; d < delivered.length; d++) {
+    log.log("CSV,INJECT," + delivered[d].index + "," + delivered[d].node + "," + delivered[d].trust + ","
+            + time + "," + java.lang.System.currentTimeMillis() + "\n");
+  }
+  pendingTrust = [];
+  pendingByNode = {};
+}
 function pollTrust() {
   try {
     var file = new java.io.File(trustFile);
@@ -748,37 +870,79 @@ function pollTrust() {
     raf.seek(lastPos);
     var line;
     while((line = raf.readLine()) != null) {
-      line = String(line).trim();
-      if(line.length() == 0) {
-        continue;
-      }
-      var parts = line.split(",");
-      if(parts.length < 3) {
-        continue;
-      }
-      if(parts[0] != "TRUST") {
-        continue;
-      }
-      var node = parts[1];
-      var trust = parts[2];
-      var cmd = "TRUST," + node + "," + trust + "\n";
-      for(var i = 0; i < sim.getMotesCount(); i++) {
-        var mote = sim.getMote(i);
-        try {
-          mote.getInterfaces().getLog().writeString(cmd);
-        } catch (e) {
-        }
+      // Lines already delivered through the socket are not injected twice.
+      if(fileIndex++ >= trustIndex) {
+        queueTrust(line);
       }
     }
     lastPos = raf.getFilePointer();
     raf.close();
   } catch (e) {
   }
+  flushTrust();
+}
+function openChannel() {
+  if(trustSocket.length == 0 || trustSocket.charAt(0) == "@") {
+    return;
+  }
+  try {
+    channel = java.nio.channels.SocketChannel.open(java.net.StandardProtocolFamily.UNIX);
+    channel.connect(java.net.UnixDomainSocketAddress.of(trustSocket));
+    channel.configureBlocking(false);
+    channelBuf = java.nio.ByteBuffer.allocate(8192);
+    log.log("Trust feedback via " + trustSocket + "\n");
+  } catch (e) {
+    channel = null;
+    log.log("Trust feedback socket unavailable, polling " + trustFile + "\n");
+  }
 }
+function drainChannel() {
+  var n = -1;
+  try {
+    n = channel.read(channelBuf);
+  } catch (e) {
+  }
+  if(n < 0) {
+    try {
+      channel.close();
+    } catch (e) {
+    }
+    channel = null;
+    log.log("Trust feedback socket closed, polling " + trustFile + "\n");
+    return;
+  }
+  if(n == 0) {
+    return;
+  }
+  channelBuf.flip();
+  channelText += String(java.nio.charset.StandardCharsets.US_ASCII.decode(channelBuf));
+  channelBuf.clear();
+  var end;
+  while((end = channelText.indexOf("\n")) >= 0) {
+    queueTrust(channelText.substring(0, end));
+    channelText = channelText.substring(end + 1);
+  }
+  flushTrust();
+}
+openChannel();
 while(true) {
   YIELD();
+  // Simulated-time heartbeat (ms) for the sweep watchdog and log timestamps.
+  if(time - lastSimLogUs >= 1000000) {
+    log.log("CSV,SIMTIME," + Math.floor(time / 1000) + "\n");
+    lastSimLogUs = time;
+  }
   if(msg != null) {
     log.log(msg + "\n");
+    // Exact sim time (us) and wall clock (ms) of trust-loop lines for tools/feedback_latency.py.
+    if(msg.indexOf("CSV,FWD,") == 0 || msg.indexOf("CSV,TRUST_SET,") == 0) {
+      log.log("CSV,STAMP," + time + "," + java.lang.System.currentTimeMillis() + "\n");
+    }
+  }
+  if(channel != null) {
+    // Updates arrive as soon as the engine computes them.
+    drainChannel();
+    continue;
   }
   var now = java.lang.System.currentTimeMillis();
   if(now - lastCheckMs > 200) {
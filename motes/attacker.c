@@ -139,25 +139,38 @@ is_forwarded_udp_to_root(void)
   return uip_ipaddr_cmp(&UIP_IP_BUF->destipaddr, &root_ipaddr);
 }
 
+static void
+apply_trust(unsigned node_id, unsigned trust)
+{
+  brpl_trust_override((uint16_t)node_id, (uint16_t)trust);
+#if CSV_VERBOSE_LOGGING
+  uint16_t self_id = (uint16_t)linkaddr_node_addr.u8[LINKADDR_SIZE - 1];
+  printf("CSV,TRUST_IN,%u,%u,%u\n", self_id, node_id, trust);
+#endif
+
+  /* Auto-blacklist if trust is below threshold */
+  if(trust < BLACKLIST_TRUST_THRESHOLD) {
+    brpl_blacklist_add((uint16_t)node_id);
+  } else {
+    brpl_blacklist_remove((uint16_t)node_id);
+  }
+}
+
+/* TRUST,<node>,<trust>[,<node>,<trust>...]: batched updates, applied in order */
 static void
 handle_trust_input(const char *line)
 {
   unsigned node_id = 0;
   unsigned trust = 0;
-  if(sscanf(line, "TRUST,%u,%u", &node_id, &trust) == 2) {
-    brpl_trust_override((uint16_t)node_id, (uint16_t)trust);
-#if CSV_VERBOSE_LOGGING
-    uint16_t self_id = (uint16_t)linkaddr_node_addr.u8[LINKADDR_SIZE - 1];
-    printf("CSV,TRUST_IN,%u,%u,%u\n", self_id, node_id, trust);
-#endif
-    
-    /* Auto-blacklist if trust is below threshold */
-    if(trust < BLACKLIST_TRUST_THRESHOLD) {
-      brpl_blacklist_add((uint16_t)node_id);
-    } else {
-      brpl_blacklist_remove((uint16_t)node_id);
-    }
+  int used = 0;
+  if(sscanf(line, "TRUST,%u,%u%n", &node_id, &trust, &used) != 2) {
+    return;
   }
+  do {
+    apply_trust(node_id, trust);
+    line += used;
+    used = 0;
+  } while(sscanf(line, ",%u,%u%n", &node_id, &trust, &used) == 2);
 }
 
 static int
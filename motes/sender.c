@@ -143,22 +143,34 @@ echo_rx_callback(struct simple_udp_connection *c,
          (unsigned)datalen);
 }
 
+static void
+apply_trust(unsigned node_id, unsigned trust)
+{
+  brpl_trust_override((uint16_t)node_id, (uint16_t)trust);
+  /* Auto-blacklist if trust is below threshold */
+  if(trust < BLACKLIST_TRUST_THRESHOLD) {
+    brpl_blacklist_add((uint16_t)node_id);
+  } else {
+    /* Remove from blacklist if trust recovers */
+    brpl_blacklist_remove((uint16_t)node_id);
+  }
+}
+
+/* TRUST,<node>,<trust>[,<node>,<trust>...]: batched updates, applied in order */
 static void
 handle_trust_input(const char *line)
 {
   unsigned node_id = 0;
   unsigned trust = 0;
-  if(sscanf(line, "TRUST,%u,%u", &node_id, &trust) == 2) {
-    brpl_trust_override((uint16_t)node_id, (uint16_t)trust);
-    /* Auto-blacklist if trust is below threshold */
-    if(trust < BLACKLIST_TRUST_THRESHOLD) {
-      brpl_blacklist_add((uint16_t)node_id);
-    } else {
-      /* Remove from blacklist if trust recovers */
-      brpl_blacklist_remove((uint16_t)node_id);
-    }
-
+  int used = 0;
+  if(sscanf(line, "TRUST,%u,%u%n", &node_id, &trust, &used) != 2) {
+    return;
   }
+  do {
+    apply_trust(node_id, trust);
+    line += used;
+    used = 0;
+  } while(sscanf(line, ",%u,%u%n", &node_id, &trust, &used) == 2);
 }
 
 PROCESS(sender_process, "UDP sender (sensor)");
@@ -5,14 +5,28 @@ import json
 import math
 import os
 import re
+import sys
 from collections import Counter, defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "tools"))
+import event_cache
+import latency_sketch
+import seq_sets
+
+import run_manifest
 
 
 RUN_RE = re.compile(
-    r"^(?P<topo>[^_]+)_(?P<scenario>[^_]+)_atk(?P<attack>\d+)_trust(?P<trust>[01])_"
-    r"lam(?P<lam>[^_]+)_gam(?P<gam>[^_]+)_s(?P<seed>\d+)$"
+    r"^(?P<topo>.+)_(?P<scenario>[^_]+)_atk(?P<attack>\d+)_trust(?P<trust>[01])_"
+    r"lam(?P<lam>[^_]+)_gam(?P<gam>[^_]+)(?:_v(?P<variant>\d+))?_s(?P<seed>\d+)$"
 )
 
+# Event fields parse_log reads back from the event cache.
+SUMMARY_FIELDS = ("node", "seq", "tagged", "delay", "state")
+
 
 def parse_run_name(name):
     match = RUN_RE.match(name)
@@ -35,100 +49,56 @@ def parse_run_name(name):
     }
 
 
-def parse_log(log_path):
-    tx = set()
-    rx = set()
-    delays = []
-    routing_timeout = False
-    routing_wait = False
-    with open(log_path, errors="ignore") as handle:
-        for line in handle:
-            line = line.strip()
-            if line.startswith("CSV,TX,"):
-                parts = line.split(",")
-                if len(parts) >= 4:
-                    try:
-                        node = int(parts[2])
-                        seq = int(parts[3])
-                        tx.add((node, seq))
-                    except ValueError:
-                        pass
-            elif line.startswith("CSV,RX,"):
-                parts = line.split(",")
-                if "node=1" in parts:
-                    try:
-                        node_index = parts.index("node=1")
-                        src = parts[node_index + 1]
-                        seq = parts[node_index + 2]
-                        rx.add((src, int(seq)))
-                    except (ValueError, IndexError):
-                        pass
-                elif len(parts) >= 4:
-                    # Fallback when node=1 is not explicitly logged.
-                    src = parts[2]
-                    try:
-                        seq = int(parts[3])
-                        rx.add((src, seq))
-                    except ValueError:
-                        pass
-            elif line.startswith("CSV,DELAY,"):
-                parts = line.split(",")
-                if len(parts) >= 3:
-                    try:
-                        delays.append(int(parts[2]))
-                    except ValueError:
-                        pass
-            elif "ROUTING_WAIT_TIMEOUT" in line:
-                routing_timeout = True
-            elif "ROUTING_WAIT joined=0 reachable=0" in line:
-                routing_wait = True
-    tx_count = len(tx)
-    rx_count = len(rx)
+def parse_log(log_path, use_cache=True):
+    delays = latency_sketch.delay_tracker()
+    wait_states = set()
+
+    def deliveries():
+        # One pass: DELAY/ROUTING_WAIT are consumed here, TX/RX go on to seq_sets.
+        events = event_cache.iter_events(
+            log_path, ("TX", "RX", "DELAY", "ROUTING_WAIT"), use_cache, fields=SUMMARY_FIELDS
+        )
+        for kind, event in events:
+            if kind == "DELAY":
+                latency_sketch.track_delay(delays, event)
+            elif kind == "ROUTING_WAIT":
+                wait_states.add(event.state)
+            else:
+                if kind == "RX":
+                    latency_sketch.track_rx(delays, event)
+                yield kind, event
+
+    tx, rx = seq_sets.account(deliveries())
+    delay_sketch, node_sketches = latency_sketch.tracked_delays(delays)
+    tx_count = sum(seq_sets.seq_count(entry) for entry in tx.values())
+    rx_count = sum(seq_sets.seq_count(entry) for entry in rx.values())
     pdr = (rx_count * 100 / tx_count) if tx_count > 0 else None
-    avg_delay = (sum(delays) / len(delays)) if delays else None
     return {
         "tx": tx_count,
         "rx": rx_count,
         "pdr": pdr,
-        "avg_delay_ms": avg_delay,
-        "routing_timeout": routing_timeout,
-        "routing_wait": routing_wait,
+        "avg_delay_ms": latency_sketch.sketch_mean(delay_sketch),
+        "delay_sketch": delay_sketch,
+        "node_delay_sketches": node_sketches,
+        "routing_timeout": "timeout" in wait_states,
+        "routing_wait": "wait" in wait_states,
     }
 
 
-def read_last_row(csv_path):
-    last = None
-    with open(csv_path, errors="ignore") as handle:
-        for row in csv.reader(handle):
-            if row and not row[0].startswith("#"):
-                last = row
-    return last
-
-
 def read_parent_switch_avg(csv_path):
-    rates = []
-    with open(csv_path, errors="ignore") as handle:
-        reader = csv.DictReader(handle)
-        for row in reader:
-            try:
-                rates.append(float(row["switch_rate"]))
-            except (ValueError, KeyError):
-                pass
-    return sum(rates) / len(rates) if rates else None
+    return run_manifest.parent_switch_avg(csv_path)
 
 
 def read_stats_last_switch(stats_path):
-    last = None
-    with open(stats_path, errors="ignore") as handle:
-        for row in csv.reader(handle):
-            if row and row[0] != "line":
-                last = row
-    if last and len(last) >= 8:
-        try:
-            return float(last[7])
-        except ValueError:
-            return None
-    return None
+    last = run_manifest.tail_row_dict(stats_path)
+    return to_float(last.get("parent_switch_rate")) if last else None
+
+
+def to_float(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
 
 
 def mean(values):
@@ -150,55 +120,66 @@ def ci95(values):
 
 def write_csv(path, fieldnames, rows):
     with open(path, "w", newline="") as handle:
-        writer = csv.DictWriter(handle, fieldnames=fieldnames)
+        writer = csv.DictWriter(handle, fieldnames=fieldnames, extrasaction="ignore")
         writer.writeheader()
         for row in rows:
             writer.writerow(row)
 
 
-def main():
-    parser = argparse.ArgumentParser()
-    parser.add_argument("results_dir", help="results/experiments-...")
-    parser.add_argument("--matrix", help="Optional sweep_matrix.csv to update")
-    args = parser.parse_args()
-
-    summary_rows = []
-    invalid_rows = []
-    run_entries = []
-    for name in os.listdir(args.results_dir):
-        run_dir = os.path.join(args.results_dir, name)
-        if not os.path.isdir(run_dir):
-            continue
-        run_info = parse_run_name(name)
-        if not run_info:
-            continue
-        run_entries.append(name)
-        log_path = os.path.join(run_dir, "logs", "COOJA.testlog")
-        if not os.path.exists(log_path):
-            invalid_rows.append(
-                {
-                    **run_info,
-                    "run": name,
-                    "reason": "missing_log",
-                }
-            )
-            continue
-
-        log_stats = parse_log(log_path)
-        exposure_path = os.path.join(run_dir, "exposure.csv")
-        parent_path = os.path.join(run_dir, "parent_switch.csv")
-        stats_path = os.path.join(run_dir, "stats.csv")
-
+def read_exposure_metrics(exposure_path):
+    last = run_manifest.tail_row_dict(exposure_path)
+    if not last:
+        return None, None
+    try:
+        return float(last["e1"]), float(last["e3"])
+    except (KeyError, TypeError, ValueError):
+        return None, None
+
+
+def manifest_metrics(manifest):
+    """(e1, e3, parent_switch) from run_manifest.json, matching the CSV readers."""
+    e1 = e3 = parent_switch = None
+    exposure = manifest.get("exposure")
+    if exposure is not None:
+        e1, e3 = to_float(exposure.get("e1")), to_float(exposure.get("e3"))
+        if e1 is None or e3 is None:
+            e1 = e3 = None
+    if "parent_switch_avg" in manifest:
+        parent_switch = manifest["parent_switch_avg"]
+    if parent_switch is None and "stats" in manifest:
+        parent_switch = to_float(manifest["stats"].get("parent_switch_rate"))
+    return e1, e3, parent_switch
+
+
+def summarize_run(results_dir, name, use_cache=True):
+    run_dir = os.path.join(results_dir, name)
+    if not os.path.isdir(run_dir):
+        return None
+    run_info = parse_run_name(name)
+    if not run_info:
+        return None
+    log_path = os.path.join(run_dir, "logs", "COOJA.testlog")
+    if not os.path.exists(log_path):
+        return "invalid", {
+            **run_info,
+            "run": name,
+            "reason": "missing_log",
+        }
+
+    log_stats = parse_log(log_path, use_cache)
+    latency_sketch.write_run(run_dir, log_stats["delay_sketch"], log_stats["node_delay_sketches"], "DELAY")
+    exposure_path = os.path.join(run_dir, "exposure.csv")
+    parent_path = os.path.join(run_dir, "parent_switch.csv")
+    stats_path = os.path.join(run_dir, "stats.csv")
+
+    manifest = run_manifest.read_manifest(run_dir)
+    if manifest is not None:
+        e1, e3, parent_switch = manifest_metrics(manifest)
+    else:
         e1 = None
         e3 = None
         if os.path.exists(exposure_path):
-            last = read_last_row(exposure_path)
-            if last and len(last) >= 7:
-                try:
-                    e1 = float(last[5])
-                    e3 = float(last[6])
-                except ValueError:
-                    pass
+            e1, e3 = read_exposure_metrics(exposure_path)
 
         parent_switch = None
         if os.path.exists(parent_path):
@@ -206,51 +187,85 @@ def main():
         if parent_switch is None and os.path.exists(stats_path):
             parent_switch = read_stats_last_switch(stats_path)
 
-        reasons = []
-        if log_stats["tx"] == 0:
-            reasons.append("tx=0")
-        if log_stats["rx"] == 0:
-            reasons.append("rx=0")
-        if (log_stats["tx"] == 0 or log_stats["rx"] == 0) and (
-            log_stats["routing_timeout"] or log_stats["routing_wait"]
-        ):
-            reasons.append("routing_not_ready")
-        if log_stats["pdr"] is None or log_stats["avg_delay_ms"] is None:
-            reasons.append("missing_core_metrics")
-        if run_info["trust"] == 1 and (
-            e1 is None or e3 is None or parent_switch is None
-        ):
-            reasons.append("missing_trust_metrics")
-
-        if reasons:
-            invalid_rows.append(
-                {
-                    **run_info,
-                    "run": name,
-                    "reason": ";".join(sorted(set(reasons))),
-                }
-            )
-            continue
+    reasons = []
+    if log_stats["tx"] == 0:
+        reasons.append("tx=0")
+    if log_stats["rx"] == 0:
+        reasons.append("rx=0")
+    if (log_stats["tx"] == 0 or log_stats["rx"] == 0) and (
+        log_stats["routing_timeout"] or log_stats["routing_wait"]
+    ):
+        reasons.append("routing_not_ready")
+    if log_stats["pdr"] is None or log_stats["avg_delay_ms"] is None:
+        reasons.append("missing_core_metrics")
+    if run_info["trust"] == 1 and (
+        e1 is None or e3 is None or parent_switch is None
+    ):
+        reasons.append("missing_trust_metrics")
+
+    if reasons:
+        return "invalid", {
+            **run_info,
+            "run": name,
+            "reason": ";".join(sorted(set(reasons))),
+        }
+
+    delay = latency_sketch.sketch_summary(log_stats["delay_sketch"])
+    return "summary", {
+        "run": name,
+        "topology": run_info["topology"],
+        "attack_rate": run_info["attack_rate"],
+        "trust": run_info["trust"],
+        "lambda": run_info["lambda"] if run_info["lambda"] is not None else "NA",
+        "gamma": run_info["gamma"] if run_info["gamma"] is not None else "NA",
+        "seed": run_info["seed"],
+        "pdr": f"{log_stats['pdr']:.2f}",
+        "avg_delay_ms": f"{log_stats['avg_delay_ms']:.2f}",
+        "p50_delay_ms": f"{delay['p50']:.2f}",
+        "p95_delay_ms": f"{delay['p95']:.2f}",
+        "p99_delay_ms": f"{delay['p99']:.2f}",
+        # Not written to the CSV; merged per group below.
+        "delay_sketch": log_stats["delay_sketch"],
+        "tx": log_stats["tx"],
+        "rx": log_stats["rx"],
+        "lost": log_stats["tx"] - log_stats["rx"],
+        "e1": f"{e1:.4f}" if e1 is not None else "",
+        "e3": f"{e3:.4f}" if e3 is not None else "",
+        "parent_switch_rate": f"{parent_switch:.4f}" if parent_switch is not None else "",
+    }
+
+
+def map_runs(jobs, func, names, results_dir, use_cache):
+    """func(results_dir, name, use_cache) for each name, in input order."""
+    if jobs <= 1 or len(names) <= 1:
+        return [func(results_dir, name, use_cache) for name in names]
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        chunksize = max(1, len(names) // (jobs * 4))
+        return list(pool.map(func, repeat(results_dir), names, repeat(use_cache), chunksize=chunksize))
 
-        summary_rows.append(
-            {
-                "run": name,
-                "topology": run_info["topology"],
-                "attack_rate": run_info["attack_rate"],
-                "trust": run_info["trust"],
-                "lambda": run_info["lambda"] if run_info["lambda"] is not None else "NA",
-                "gamma": run_info["gamma"] if run_info["gamma"] is not None else "NA",
-                "seed": run_info["seed"],
-                "pdr": f"{log_stats['pdr']:.2f}",
-                "avg_delay_ms": f"{log_stats['avg_delay_ms']:.2f}",
-                "tx": log_stats["tx"],
-                "rx": log_stats["rx"],
-                "lost": log_stats["tx"] - log_stats["rx"],
-                "e1": f"{e1:.4f}" if e1 is not None else "",
-                "e3": f"{e3:.4f}" if e3 is not None else "",
-                "parent_switch_rate": f"{parent_switch:.4f}" if parent_switch is not None else "",
-            }
-        )
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("results_dir", help="results/experiments-...")
+    parser.add_argument("--matrix", help="Optional sweep_matrix.csv to update")
+    parser.add_argument("--no-event-cache", dest="event_cache", action="store_false",
+                        help="Re-parse every log instead of using logs/COOJA.events sidecars")
+    parser.add_argument("--jobs", type=int, default=1, help="Summarize this many runs in parallel processes")
+    args = parser.parse_args()
+
+    summary_rows = []
+    invalid_rows = []
+    run_entries = []
+    names = sorted(os.listdir(args.results_dir))
+    for name, result in zip(names, map_runs(args.jobs, summarize_run, names, args.results_dir, args.event_cache)):
+        if result is None:
+            continue
+        kind, row = result
+        run_entries.append(name)
+        if kind == "summary":
+            summary_rows.append(row)
+        else:
+            invalid_rows.append(row)
 
     summary_rows_sorted = sorted(summary_rows, key=lambda r: r["run"])
     invalid_rows_sorted = sorted(invalid_rows, key=lambda r: r["run"])
@@ -269,6 +284,9 @@ def main():
             "seed",
             "pdr",
             "avg_delay_ms",
+            "p50_delay_ms",
+            "p95_delay_ms",
+            "p99_delay_ms",
             "tx",
             "rx",
             "lost",
@@ -360,6 +378,11 @@ def main():
             for r in rows
             if r["parent_switch_rate"] != ""
         ]
+        # Tail latency over every sample of the group, not a mean of per-seed tails.
+        delay_sketch = latency_sketch.sketch()
+        for r in rows:
+            latency_sketch.sketch_merge(delay_sketch, r["delay_sketch"])
+        delay = latency_sketch.sketch_summary(delay_sketch)
         aggregate_rows.append(
             {
                 "topology": key[0],
@@ -377,6 +400,9 @@ def main():
                 "mean_parent_switch": f"{mean(ps_values):.4f}" if ps_values else "",
                 "std_parent_switch": f"{stddev(ps_values):.4f}" if ps_values else "",
                 "ci95_parent_switch": f"{ci95(ps_values):.4f}" if ps_values else "",
+                "p50_delay_ms": latency_sketch.fmt_ms(delay["p50"]),
+                "p95_delay_ms": latency_sketch.fmt_ms(delay["p95"]),
+                "p99_delay_ms": latency_sketch.fmt_ms(delay["p99"]),
             }
         )
 
@@ -400,6 +426,9 @@ def main():
                 "mean_parent_switch",
                 "std_parent_switch",
                 "ci95_parent_switch",
+                "p50_delay_ms",
+                "p95_delay_ms",
+                "p99_delay_ms",
             ],
             aggregate_rows,
         )
@@ -432,7 +461,9 @@ def main():
         if t3_rows:
             handle.write("| lambda | gamma | mean_e1 | mean_parent_switch | mean_pdr |\n")
             handle.write("|---|---|---|---|---|\n")
-            for row in sorted(t3_rows, key=lambda r: (r["lambda"], r["gamma"])):
+            # Trust-off baselines carry "NA" for lambda/gamma; list them first.
+            t3_rows.sort(key=lambda r: (r["trust"], r["lambda"] if r["trust"] else 0, r["gamma"] if r["trust"] else 0))
+            for row in t3_rows:
                 handle.write(
                     f"| {row['lambda']} | {row['gamma']} | {row['mean_e1']} | "
                     f"{row['mean_parent_switch']} | {row['mean_pdr']} |\n"
@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+Unix-socket bridge for the event-driven trust feedback channel.
+
+With --feedback-channel socket the sweep starts one bridge per run, in a
+short temporary directory (AF_UNIX paths are limited to ~100 bytes):
+
+  engine.sock  trust_engine --feed-socket connects here and writes each
+               TRUST,<node>,<trust> line as soon as it is computed
+  cooja.sock   the ScriptRunner connects here (@TRUST_FEEDBACK_SOCKET@) and
+               drains it with a non-blocking read on every YIELD
+
+A selector thread forwards bytes from the engine to Cooja as they arrive
+and holds them until Cooja has connected. The engine still writes
+trust_feedback.txt, and the ScriptRunner polls that file as before when
+the socket cannot be opened or closes mid-run.
+"""
+
+import os
+import selectors
+import shutil
+import socket
+import sys
+import tempfile
+import threading
+
+
+SELECT_TIMEOUT_SECONDS = 0.5
+
+
+def listen(path):
+    server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    server.bind(path)
+    server.listen(1)
+    return server
+
+
+def receive(conn, size):
+    """Bytes read from conn; b"" once the peer has closed or reset it."""
+    try:
+        return conn.recv(size)
+    except OSError:
+        return b""
+
+
+def forward(bridge, engine_server, cooja_server):
+    sel = selectors.DefaultSelector()
+    sel.register(engine_server, selectors.EVENT_READ, "engine_server")
+    sel.register(cooja_server, selectors.EVENT_READ, "cooja_server")
+    pending = bytearray()
+    cooja = None
+
+    def drop(conn):
+        sel.unregister(conn)
+        conn.close()
+
+    while not bridge["stop"].is_set():
+        for key, _ in sel.select(timeout=SELECT_TIMEOUT_SECONDS):
+            role = key.data
+            if role == "engine_server":
+                conn, _ = engine_server.accept()
+                sel.register(conn, selectors.EVENT_READ, "engine")
+            elif role == "cooja_server":
+                if cooja is not None:
+                    drop(cooja)
+                cooja, _ = cooja_server.accept()
+                # Cooja never writes; readable means it closed the connection.
+                sel.register(cooja, selectors.EVENT_READ, "cooja")
+            elif role == "engine":
+                data = receive(key.fileobj, 1 << 16)
+                if data:
+                    pending += data
+                else:
+                    drop(key.fileobj)
+            elif role == "cooja":
+                if not receive(cooja, 1 << 12):
+                    drop(cooja)
+                    cooja = None
+        if pending and cooja is not None:
+            try:
+                cooja.sendall(pending)
+            except OSError as exc:
+                print(f"[WARN] feedback bridge: Cooja connection lost: {exc}", file=sys.stderr)
+                drop(cooja)
+                cooja = None
+                continue
+            bridge["forwarded"] += pending.count(b"\n")
+            pending.clear()
+
+    for key in list(sel.get_map().values()):
+        key.fileobj.close()
+    sel.close()
+
+
+def start():
+    """Listening bridge dict, or None when Unix sockets are unavailable."""
+    if not hasattr(socket, "AF_UNIX"):
+        return None
+    sock_dir = tempfile.mkdtemp(prefix="trust-fb-")
+    bridge = {
+        "dir": sock_dir,
+        "engine": os.path.join(sock_dir, "engine.sock"),
+        "cooja": os.path.join(sock_dir, "cooja.sock"),
+        "stop": threading.Event(),
+        "forwarded": 0,
+    }
+    try:
+        engine_server = listen(bridge["engine"])
+        cooja_server = listen(bridge["cooja"])
+    except OSError as exc:
+        print(f"[WARN] feedback bridge unavailable: {exc}", file=sys.stderr)
+        shutil.rmtree(sock_dir, ignore_errors=True)
+        return None
+    bridge["thread"] = threading.Thread(target=forward, args=(bridge, engine_server, cooja_server), daemon=True)
+    bridge["thread"].start()
+    return bridge
+
+
+def stop(bridge):
+    """Stop forwarding and remove the sockets; returns the lines forwarded."""
+    bridge["stop"].set()
+    bridge["thread"].join(timeout=5)
+    shutil.rmtree(bridge["dir"], ignore_errors=True)
+    return bridge["forwarded"]
@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+"""
+Content-addressed cache for Cooja mote firmware.
+
+A firmware variant is identified by the mote sources, project-conf.h, the
+Contiki-NG revision and the make invocation (makefile, target, DEFINES and
+other variables) taken from a motetype's <commands>. Each variant is built
+once into build-cache/firmware/<key>/ with its own BUILD_DIR, and rendered
+.csc files are pointed at the cached .cooja binary instead of rebuilding.
+"""
+
+import argparse
+import fcntl
+import hashlib
+import html
+import json
+import re
+import shlex
+import subprocess
+import sys
+from functools import lru_cache
+from pathlib import Path
+
+
+PROJECT_DIR = Path(__file__).resolve().parents[1]
+MOTES_DIR = PROJECT_DIR / "motes"
+CONTIKI_DIR = PROJECT_DIR / "contiki-ng-brpl"
+CACHE_DIR = PROJECT_DIR / "build-cache" / "firmware"
+
+MOTETYPE_RE = re.compile(r"<motetype>.*?</motetype>", re.S)
+COMMANDS_RE = re.compile(r"<commands>(.*?)</commands>", re.S)
+# make flags that do not change the produced binary.
+IGNORED_VARIABLES = {"WERROR"}
+
+
+class FirmwareBuildError(RuntimeError):
+    pass
+
+
+def parse_make_command(command):
+    tokens = shlex.split(html.unescape(command))
+    if not tokens or tokens[0] != "make":
+        return None
+    makefile = None
+    target = None
+    variables = {}
+    idx = 1
+    while idx < len(tokens):
+        token = tokens[idx]
+        if token in ("-C", "-f") and idx + 1 < len(tokens):
+            if token == "-f":
+                makefile = tokens[idx + 1]
+            idx += 2
+            continue
+        if token.startswith("-"):
+            idx += 1
+            continue
+        if "=" in token:
+            name, value = token.split("=", 1)
+            variables[name] = value
+        else:
+            target = token
+        idx += 1
+    if makefile is None or target is None:
+        return None
+    return {"makefile": makefile, "target": target, "variables": variables}
+
+
+def contiki_revision():
+    try:
+        result = subprocess.run(
+            ["git", "-C", str(CONTIKI_DIR), "rev-parse", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+        return result.stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+@lru_cache(maxsize=None)
+def source_digest():
+    digest = hashlib.sha256()
+    paths = [p for p in MOTES_DIR.iterdir() if p.is_file() and (p.suffix in (".c", ".h") or p.name.startswith("Makefile"))]
+    paths.append(PROJECT_DIR / "project-conf.h")
+    for path in sorted(paths):
+        digest.update(path.name.encode())
+        digest.update(b"\0")
+        digest.update(path.read_bytes())
+        digest.update(b"\0")
+    digest.update(contiki_revision().encode())
+    return digest.hexdigest()
+
+
+def variant_key(spec):
+    variables = {k: v for k, v in spec["variables"].items() if k not in IGNORED_VARIABLES}
+    payload = json.dumps(
+        {
+            "sources": source_digest(),
+            "makefile": spec["makefile"],
+            "target": spec["target"],
+            "variables": sorted(variables.items()),
+        },
+        sort_keys=True,
+    )
+    return hashlib.sha256(payload.encode()).hexdigest()[:24]
+
+
+def variant_artifact(spec, key):
+    return CACHE_DIR / key / "build" / "cooja" / spec["target"]
+
+
+def config_variants(contents):
+    variants = []
+    for block in MOTETYPE_RE.findall(contents):
+        match = COMMANDS_RE.search(block)
+        if not match:
+            continue
+        spec = parse_make_command(match.group(1))
+        if spec is None:
+            continue
+        variants.append((variant_key(spec), spec))
+    return variants
+
+
+def build_variant(key, spec):
+    artifact = variant_artifact(spec, key)
+    variant_dir = CACHE_DIR / key
+    stamp = variant_dir / "variant.json"
+    if stamp.exists() and artifact.exists():
+        return artifact
+    variant_dir.mkdir(parents=True, exist_ok=True)
+    with (variant_dir / ".lock").open("w") as lock:
+        # Concurrent runs needing the same variant wait for one build.
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        if stamp.exists() and artifact.exists():
+            return artifact
+        variables = dict(spec["variables"])
+        variables["BUILD_DIR"] = str(variant_dir / "build")
+        # Building the BUILD_DIR artifact directly keeps make from copying
+        # the binary back into the shared motes/ directory.
+        cmd = ["make", "-C", str(MOTES_DIR), "-f", spec["makefile"], str(artifact)]
+        cmd += [f"{name}={value}" for name, value in variables.items()]
+        build_log = variant_dir / "build.log"
+        with build_log.open("w") as handle:
+            result = subprocess.run(cmd, stdout=handle, stderr=subprocess.STDOUT)
+        if result.returncode != 0 or not artifact.exists():
+            raise FirmwareBuildError(f"{spec['target']} ({key}) failed to build; see {build_log}")
+        stamp.write_text(json.dumps({**spec, "key": key, "sources": source_digest()}, indent=2))
+    return artifact
+
+
+def use_cached_firmware(contents):
+    def rewrite(match):
+        block = match.group(0)
+        commands = COMMANDS_RE.search(block)
+        if not commands:
+            return block
+        spec = parse_make_command(commands.group(1))
+        if spec is None:
+            return block
+        artifact = build_variant(variant_key(spec), spec)
+        block = COMMANDS_RE.sub(f"<commands>test -f {artifact}</commands>", block, count=1)
+        return block.replace("</commands>", f"</commands>\n      <firmware>{artifact}</firmware>", 1)
+
+    return MOTETYPE_RE.sub(rewrite, contents)
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Build or list cached firmware variants of a .csc")
+    ap.add_argument("config", help="Rendered .csc file")
+    ap.add_argument("--list", action="store_true", help="Only print variant keys")
+    args = ap.parse_args()
+
+    contents = Path(args.config).read_text()
+    for key, spec in config_variants(contents):
+        if args.list:
+            print(f"{key} {spec['target']} DEFINES={spec['variables'].get('DEFINES', '')}")
+            continue
+        try:
+            print(build_variant(key, spec))
+        except FirmwareBuildError as exc:
+            print(exc, file=sys.stderr)
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,276 @@
+#!/usr/bin/env python3
+"""
+Offline re-scoring of finished runs through trust_engine.
+
+Runs the trust_engine binary once per (run, setting) over the stored
+logs/COOJA.testlog, reading it from the start without --follow, and
+collects E1/E3, the final sink metrics and the blacklist decisions into
+one CSV. Settings are the cartesian product of the --grid values, applied
+on top of the options the sweep used for the run. Each combination costs
+one pass of the engine over the log instead of a Cooja simulation.
+
+The log records what happened under the trust values injected during the
+real run, so E1/E3 and parent switching are those of the recorded run for
+every setting. What a replay changes is the scoring: trust values, which
+nodes get blacklisted and when, and the sink_* metrics.
+
+blacklist.csv has no time column; the blacklist line is recovered by
+matching the engine's per-update rows to the CSV,FWD lines that produced
+them.
+
+Usage:
+  python3 scripts/replay_trust_engine.py results/experiments-*/ archive/ \\
+      --grid metric=ewma,bayes,beta --grid alpha=0.2,0.5 --jobs 4
+"""
+
+import argparse
+import csv
+import itertools
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "tools"))
+import event_cache
+
+import run_manifest
+from run_trust_sweep import TRUST_ENGINE, trust_engine_options
+
+
+FIELDS = [
+    "run",
+    "setting",
+    "status",
+    "e1",
+    "e3",
+    "parent_switch_rate",
+    "sink_adv_attacker",
+    "sink_stab_attacker",
+    "attacker_blacklisted",
+    "attacker_blacklist_line",
+    "attacker_blacklist_ms",
+    "attacker_final_trust",
+    "false_positives",
+    "false_positive_nodes",
+    "updates",
+    "engine_s",
+]
+
+
+def find_runs(paths):
+    """Run directories (containing logs/COOJA.testlog) under the given paths."""
+    runs = []
+    for path in paths:
+        path = Path(path)
+        if (path / "logs" / "COOJA.testlog").is_file():
+            runs.append(path)
+            continue
+        for log_path in sorted(path.rglob("logs/COOJA.testlog")):
+            runs.append(log_path.parent.parent)
+    return sorted(set(runs))
+
+
+def parse_grid(entries):
+    """[{option: value}] for the cartesian product of name=v1,v2 entries."""
+    axes = []
+    for entry in entries:
+        name, sep, values = entry.partition("=")
+        if not sep or not values:
+            raise ValueError(f"bad --grid entry {entry!r}; expected name=v1,v2")
+        name = name.strip().lstrip("-").replace("_", "-")
+        axes.append([(name, value) for value in values.split(",") if value])
+    return [dict(combo) for combo in itertools.product(*axes)]
+
+
+def setting_label(setting):
+    return ";".join(f"{name}={value}" for name, value in sorted(setting.items())) or "default"
+
+
+def run_engine_options(run_dir):
+    """The engine options the sweep used for this run (see run_meta.json)."""
+    engine = {}
+    try:
+        with open(run_dir / "logs" / "run_meta.json") as handle:
+            engine = json.load(handle).get("engine") or {}
+    except (OSError, ValueError):
+        pass
+    return trust_engine_options({"engine": engine})
+
+
+def option_value(options, name, default):
+    value = default
+    for i, option in enumerate(options[:-1]):
+        if option == name:
+            value = options[i + 1]
+    return value
+
+
+def emitted_fwd(log_path):
+    """CSV,FWD events for which trust_engine writes a trust_metrics.csv row."""
+    log = event_cache.collect(str(log_path), ("FWD", "FINISHED"))
+    stop = log["FINISHED"][0].line if log["FINISHED"] else None
+    last = {}
+    emitted = []
+    for event in log["FWD"]:
+        if stop is not None and event.line > stop:
+            break
+        previous = last.get(event.node, (0, 0))
+        last[event.node] = (event.udp_to_root, event.dropped)
+        if event.udp_to_root > previous[0]:
+            emitted.append(event)
+    return emitted
+
+
+def read_rows(path):
+    with open(path, errors="ignore") as handle:
+        return list(csv.DictReader(handle))
+
+
+def blacklist_events(metrics_rows, blacklist_rows, fwd_events):
+    """{node: FWD event} at which each blacklisted node was first blacklisted.
+
+    blacklist.csv holds cumulative success/failed counts at the decision;
+    the matching trust_metrics.csv row is the node's first row whose
+    running totals reach them, and row k comes from the k-th emitted FWD.
+    """
+    wanted = {}
+    for row in blacklist_rows:
+        wanted.setdefault(int(row["node_id"]), (int(row["success"]), int(row["failed"])))
+    totals = {}
+    found = {}
+    for index, row in enumerate(metrics_rows):
+        node = int(row["node_id"])
+        succ, fail = totals.get(node, (0, 0))
+        totals[node] = (succ + int(row["success"]), fail + int(row["failed"]))
+        if node in wanted and node not in found and totals[node] == wanted[node]:
+            found[node] = fwd_events[index] if index < len(fwd_events) else None
+    return found
+
+
+def replay(run_dir, setting, engine=TRUST_ENGINE, timeout=None):
+    """One trust_engine pass over run_dir's log with setting; returns a FIELDS row."""
+    log_path = run_dir / "logs" / "COOJA.testlog"
+    options = run_engine_options(run_dir)
+    for name, value in setting.items():
+        options += [f"--{name}", str(value)]
+    attacker_id = int(option_value(options, "--attacker-id", 2))
+    row = {"run": run_dir.name, "setting": setting_label(setting), **setting}
+
+    with tempfile.TemporaryDirectory(prefix="trust_replay_") as tmp:
+        tmp = Path(tmp)
+        cmd = [
+            str(engine),
+            "--input", str(log_path),
+            "--output", str(tmp / "trust_feedback.txt"),
+            "--metrics-out", str(tmp / "trust_metrics.csv"),
+            "--blacklist-out", str(tmp / "blacklist.csv"),
+            "--exposure-out", str(tmp / "exposure.csv"),
+            "--parent-out", str(tmp / "parent_switch.csv"),
+            "--stats-out", str(tmp / "stats.csv"),
+            *options,
+            "--from-start",
+        ]
+        start = time.perf_counter()
+        try:
+            proc = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, timeout=timeout)
+        except subprocess.TimeoutExpired:
+            return {**row, "status": "timeout"}
+        row["engine_s"] = f"{time.perf_counter() - start:.3f}"
+        if proc.returncode != 0:
+            print(f"[WARN] {run_dir.name} {row['setting']}: trust_engine exited {proc.returncode}: "
+                  f"{proc.stdout.decode(errors='ignore').strip()[-200:]}", file=sys.stderr)
+            return {**row, "status": f"exit_{proc.returncode}"}
+
+        exposure = run_manifest.tail_row_dict(tmp / "exposure.csv") or {}
+        stats = run_manifest.tail_row_dict(tmp / "stats.csv") or {}
+        metrics_rows = read_rows(tmp / "trust_metrics.csv")
+        blacklist_rows = read_rows(tmp / "blacklist.csv")
+
+    fwd_events = emitted_fwd(log_path)
+    if len(fwd_events) != len(metrics_rows):
+        print(f"[WARN] {run_dir.name}: {len(metrics_rows)} engine updates but {len(fwd_events)} "
+              f"FWD lines; blacklist timing left empty", file=sys.stderr)
+        fwd_events = []
+    blacklisted = blacklist_events(metrics_rows, blacklist_rows, fwd_events)
+    attacker_event = blacklisted.get(attacker_id)
+    false_positives = sorted(node for node in blacklisted if node != attacker_id)
+    attacker_trust = [r["trust_raw"] for r in metrics_rows if int(r["node_id"]) == attacker_id]
+
+    row.update(
+        status="ok",
+        e1=exposure.get("e1", ""),
+        e3=exposure.get("e3", ""),
+        parent_switch_rate=stats.get("parent_switch_rate", ""),
+        sink_adv_attacker=stats.get("sink_adv_attacker", ""),
+        sink_stab_attacker=stats.get("sink_stab_attacker", ""),
+        attacker_blacklisted=int(attacker_id in blacklisted),
+        attacker_blacklist_line=attacker_event.line if attacker_event else "",
+        attacker_blacklist_ms=attacker_event.sim_ms if attacker_event and attacker_event.sim_ms is not None else "",
+        attacker_final_trust=attacker_trust[-1] if attacker_trust else "",
+        false_positives=len(false_positives),
+        false_positive_nodes=" ".join(str(node) for node in false_positives),
+        updates=len(metrics_rows),
+    )
+    return row
+
+
+def replay_task(task):
+    run_dir, setting, engine, timeout = task
+    return replay(run_dir, setting, engine, timeout)
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Re-score finished runs through trust_engine over a settings grid")
+    ap.add_argument("paths", nargs="+", help="Run directories or trees containing them (results/..., archive/)")
+    ap.add_argument("--grid", action="append", default=[],
+                    help="Engine option and values, e.g. metric=ewma,bayes or sink-beta=0.1,0.3 (repeatable)")
+    ap.add_argument("--out", default="trust_replay.csv", help="Output CSV")
+    ap.add_argument("--jobs", type=int, default=os.cpu_count() or 1, help="Parallel trust_engine processes")
+    ap.add_argument("--engine", default=str(TRUST_ENGINE), help="trust_engine binary")
+    ap.add_argument("--timeout", type=float, help="Per-replay timeout in seconds")
+    args = ap.parse_args()
+
+    engine = Path(args.engine)
+    if not engine.exists():
+        print(f"[ERROR] trust_engine binary missing: {engine}; build it in tools/trust_engine first.", file=sys.stderr)
+        sys.exit(1)
+    try:
+        settings = parse_grid(args.grid)
+    except ValueError as exc:
+        print(f"[ERROR] {exc}", file=sys.stderr)
+        sys.exit(1)
+    runs = find_runs(args.paths)
+    if not runs:
+        print("[ERROR] no run directories with logs/COOJA.testlog found", file=sys.stderr)
+        sys.exit(1)
+
+    # Build the event caches up front so workers only read them.
+    for run_dir in runs:
+        event_cache.collect(str(run_dir / "logs" / "COOJA.testlog"), ("FWD",))
+
+    tasks = [(run_dir, setting, engine, args.timeout) for run_dir in runs for setting in settings]
+    print(f"{len(runs)} run(s) x {len(settings)} setting(s) = {len(tasks)} replays, jobs={args.jobs}")
+    start = time.perf_counter()
+    if args.jobs <= 1:
+        rows = [replay_task(task) for task in tasks]
+    else:
+        with ProcessPoolExecutor(max_workers=args.jobs) as pool:
+            rows = list(pool.map(replay_task, tasks))
+
+    grid_names = sorted({name for setting in settings for name in setting})
+    fields = FIELDS[:2] + grid_names + FIELDS[2:]
+    with open(args.out, "w", newline="") as handle:
+        writer = csv.DictWriter(handle, fieldnames=fields, extrasaction="ignore")
+        writer.writeheader()
+        for row in rows:
+            writer.writerow(row)
+    print(f"{args.out} ({len(rows)} rows, {time.perf_counter() - start:.1f}s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+"""
+Project-wide store of finished sweep runs.
+
+Entries live in build-cache/results/<key>/ where the key hashes every input
+of a run: the rendered .csc (topology, seed, sim time, DEFINES), the firmware
+variant keys (mote sources, project-conf.h, Contiki-NG revision), the
+trust_engine options and binary, and the Cooja jar. A sweep that hits an
+entry links (or copies) its artifacts into the new run directory instead of
+simulating again.
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import sys
+import time
+from functools import lru_cache
+from pathlib import Path
+
+
+PROJECT_DIR = Path(__file__).resolve().parents[1]
+STORE_DIR = PROJECT_DIR / "build-cache" / "results"
+# Bump when the set or meaning of stored artifacts changes.
+STORE_VERSION = 1
+ARTIFACTS = (
+    "logs/COOJA.testlog",
+    "trust_feedback.txt",
+    "trust_metrics.csv",
+    "blacklist.csv",
+    "exposure.csv",
+    "parent_switch.csv",
+    "stats.csv",
+    "feedback_timing.csv",
+    "trust_engine.log",
+    "cooja_output.log",
+)
+
+
+@lru_cache(maxsize=None)
+def file_digest(path):
+    digest = hashlib.sha256()
+    try:
+        with open(path, "rb") as handle:
+            for block in iter(lambda: handle.read(1 << 20), b""):
+                digest.update(block)
+    except OSError:
+        return "missing"
+    return digest.hexdigest()
+
+
+def input_key(config, firmware_keys, engine_options, engine_binary, cooja_jar):
+    payload = json.dumps(
+        {
+            "version": STORE_VERSION,
+            "config": config,
+            "firmware": sorted(firmware_keys),
+            "engine_options": list(engine_options),
+            "engine_binary": file_digest(str(engine_binary)),
+            "cooja": file_digest(str(cooja_jar)),
+        },
+        sort_keys=True,
+    )
+    return hashlib.sha256(payload.encode()).hexdigest()[:32]
+
+
+def lookup(key):
+    entry = STORE_DIR / key
+    if (entry / "entry.json").exists():
+        return entry
+    return None
+
+
+def link_or_copy(src, dst):
+    dst.parent.mkdir(parents=True, exist_ok=True)
+    dst.unlink(missing_ok=True)
+    try:
+        os.link(src, dst)
+    except OSError:
+        # Different filesystem (e.g. results on NFS) or no hardlink support.
+        shutil.copy2(src, dst)
+
+
+def detach(run_dir):
+    # Artifacts may be hardlinks into the store; a rerun must not truncate
+    # them in place.
+    for rel in ARTIFACTS:
+        (run_dir / rel).unlink(missing_ok=True)
+
+
+def fetch(key, run_dir):
+    entry = lookup(key)
+    if entry is None:
+        return False
+    for rel in ARTIFACTS:
+        if (entry / rel).exists():
+            link_or_copy(entry / rel, run_dir / rel)
+    return True
+
+
+def store(key, run_dir, meta, replace=False):
+    entry = STORE_DIR / key
+    if lookup(key) and not replace:
+        return
+    tmp_dir = STORE_DIR / f".{key}.{os.getpid()}.tmp"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    for rel in ARTIFACTS:
+        if (run_dir / rel).exists():
+            link_or_copy(run_dir / rel, tmp_dir / rel)
+    stamp = {**meta, "key": key, "version": STORE_VERSION, "stored": time.strftime("%Y-%m-%dT%H:%M:%S")}
+    (tmp_dir / "entry.json").write_text(json.dumps(stamp, indent=2, sort_keys=True))
+    if replace:
+        shutil.rmtree(entry, ignore_errors=True)
+    try:
+        os.rename(tmp_dir, entry)
+    except OSError:
+        # Another sweep stored the same key first.
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+
+def main():
+    ap = argparse.ArgumentParser(description="List or prune stored sweep runs")
+    ap.add_argument("--prune-days", type=float, help="Remove entries stored more than this many days ago")
+    args = ap.parse_args()
+
+    if not STORE_DIR.is_dir():
+        print(f"No result store at {STORE_DIR}", file=sys.stderr)
+        return
+    cutoff = time.time() - args.prune_days * 86400 if args.prune_days is not None else None
+    for entry in sorted(STORE_DIR.iterdir()):
+        stamp_path = entry / "entry.json"
+        if not stamp_path.exists():
+            continue
+        if cutoff is not None and stamp_path.stat().st_mtime < cutoff:
+            shutil.rmtree(entry, ignore_errors=True)
+            print(f"removed {entry.name}")
+            continue
+        stamp = json.loads(stamp_path.read_text())
+        print(f"{entry.name} {stamp.get('run', '?')} {stamp.get('stored', '')}")
+
+
+if __name__ == "__main__":
+    main()
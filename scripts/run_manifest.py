@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+"""
+Per-run manifest of final trust_engine metrics.
+
+trust_engine appends a row to exposure.csv and stats.csv on every CSV,FWD
+line, so the files grow with the run while the summaries only need the
+last row. When a run finishes the sweep runner writes
+<run_dir>/run_manifest.json with those final values, the run status, its
+result-store input key and the size of every artifact. Summaries read the
+manifest instead of the CSVs; it is ignored when exposure.csv, stats.csv
+or parent_switch.csv no longer has the recorded size (a rerun or a manual
+edit). Without a
+usable manifest, tail_row() seeks back from the end of the CSV instead of
+reading it from the start.
+"""
+
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+
+import result_store
+
+
+MANIFEST_NAME = "run_manifest.json"
+# Bump when the set or meaning of manifest fields changes.
+MANIFEST_VERSION = 1
+TAIL_BLOCK = 1 << 14
+# Artifacts whose size must still match for the manifest metrics to be used.
+CHECKED = ("exposure.csv", "stats.csv", "parent_switch.csv")
+EXPOSURE_FIELDS = ("e1", "e1_num", "e1_den", "e3", "e3_num", "e3_den", "attacker_id")
+STATS_FIELDS = ("parent_switch_rate", "sink_adv_attacker", "sink_stab_attacker", "sink_adv_mean", "sink_stab_mean")
+
+
+def first_line(path):
+    with open(path, "rb") as handle:
+        return handle.readline().decode(errors="ignore")
+
+
+def tail_row(csv_path, skip=lambda row: False):
+    """Last non-empty CSV row of a file for which skip(row) is false, or None.
+
+    Reads fixed-size blocks backwards from the end, so the cost depends on
+    the length of the last rows, not of the file.
+    """
+    with open(csv_path, "rb") as handle:
+        handle.seek(0, os.SEEK_END)
+        pos = handle.tell()
+        carry = b""
+        while pos > 0:
+            start = max(0, pos - TAIL_BLOCK)
+            handle.seek(start)
+            chunk = handle.read(pos - start) + carry
+            lines = chunk.split(b"\n")
+            # The first piece may be a partial line unless we reached the start.
+            carry = lines.pop(0) if start > 0 else b""
+            for raw in reversed(lines):
+                row = next(csv.reader([raw.decode(errors="ignore").rstrip("\r")]), None)
+                if row and not skip(row):
+                    return row
+            pos = start
+        if carry:
+            row = next(csv.reader([carry.decode(errors="ignore").rstrip("\r")]), None)
+            if row and not skip(row):
+                return row
+    return None
+
+
+def tail_row_dict(csv_path):
+    """Last data row as a dict keyed by the header, as csv.DictReader would give."""
+    header = next(csv.reader([first_line(csv_path).rstrip("\r\n")]), None)
+    if not header:
+        return None
+    row = tail_row(csv_path)
+    if row is None or row == header:
+        return None
+    values = dict(zip(header, row))
+    for name in header[len(row):]:
+        values[name] = None
+    return values
+
+
+def artifact_sizes(run_dir):
+    sizes = {}
+    for rel in result_store.ARTIFACTS:
+        try:
+            sizes[rel] = os.path.getsize(os.path.join(run_dir, rel))
+        except OSError:
+            pass
+    return sizes
+
+
+def parent_switch_avg(csv_path):
+    rates = []
+    with open(csv_path, errors="ignore") as handle:
+        for row in csv.DictReader(handle):
+            try:
+                rates.append(float(row["switch_rate"]))
+            except (ValueError, KeyError, TypeError):
+                pass
+    return sum(rates) / len(rates) if rates else None
+
+
+def final_metrics(run_dir):
+    """Final exposure/stats values and the parent_switch.csv average of a run."""
+    metrics = {}
+    exposure_path = os.path.join(run_dir, "exposure.csv")
+    if os.path.exists(exposure_path):
+        last = tail_row_dict(exposure_path) or {}
+        metrics["exposure"] = {name: last.get(name) for name in EXPOSURE_FIELDS if name in last}
+    stats_path = os.path.join(run_dir, "stats.csv")
+    if os.path.exists(stats_path):
+        last = tail_row_dict(stats_path) or {}
+        metrics["stats"] = {name: last.get(name) for name in STATS_FIELDS if name in last}
+    parent_path = os.path.join(run_dir, "parent_switch.csv")
+    if os.path.exists(parent_path):
+        metrics["parent_switch_avg"] = parent_switch_avg(parent_path)
+    return metrics
+
+
+def write_manifest(run_dir, status, input_key=None, reason=None):
+    path = os.path.join(run_dir, MANIFEST_NAME)
+    manifest = {
+        "version": MANIFEST_VERSION,
+        "status": status,
+        "input_key": input_key,
+        "written": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "artifacts": artifact_sizes(run_dir),
+        **final_metrics(run_dir),
+    }
+    if reason:
+        manifest["reason"] = reason
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(tmp_path, "w") as handle:
+            json.dump(manifest, handle, indent=2, sort_keys=True)
+        os.replace(tmp_path, path)
+    except OSError as exc:
+        print(f"[WARN] could not write run manifest {path}: {exc}", file=sys.stderr)
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+    return manifest
+
+
+def read_manifest(run_dir):
+    """The run's manifest if it still describes the trust_engine outputs, else None."""
+    try:
+        with open(os.path.join(run_dir, MANIFEST_NAME)) as handle:
+            manifest = json.load(handle)
+    except (OSError, ValueError):
+        return None
+    if manifest.get("version") != MANIFEST_VERSION:
+        return None
+    recorded = manifest.get("artifacts", {})
+    for rel in CHECKED:
+        try:
+            size = os.path.getsize(os.path.join(run_dir, rel))
+        except OSError:
+            size = None
+        if recorded.get(rel) != size:
+            return None
+    return manifest
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Write run_manifest.json for finished run directories")
+    ap.add_argument("run_dirs", nargs="+", help="Run directories")
+    ap.add_argument("--status", default="completed", help="Status to record")
+    args = ap.parse_args()
+
+    for run_dir in args.run_dirs:
+        if not os.path.isdir(run_dir):
+            print(f"[WARN] not a directory: {run_dir}", file=sys.stderr)
+            continue
+        write_manifest(run_dir, args.status)
+        print(os.path.join(run_dir, MANIFEST_NAME))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,17 +1,55 @@
 #!/usr/bin/env python3
 import argparse
 import csv
+import itertools
 import json
+import math
 import os
 import re
 import shutil
 import subprocess
 import sys
+import threading
 import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, as_completed, wait
 from pathlib import Path
 
+import experiment_summary
+import feedback_bridge
+import result_store
+import run_manifest
+import work_queue
+from firmware_cache import FirmwareBuildError, build_variant, config_variants, use_cached_firmware
+
 
 PROJECT_DIR = Path(__file__).resolve().parents[1]
+TRUST_ENGINE = PROJECT_DIR / "tools" / "trust_engine" / "target" / "release" / "trust_engine"
+
+# JVM non-heap, trust_engine and on-demand mote builds on top of -Xmx.
+RUN_MEM_OVERHEAD_MB = 768
+ADMIT_POLL_SECONDS = 2.0
+WATCHDOG_POLL_SECONDS = 5.0
+# Wall-clock span over which the simulated-time rate is measured.
+RATE_WINDOW_SECONDS = 60.0
+QUEUE_POLL_SECONDS = 10.0
+JOURNAL_NAME = "run_journal.jsonl"
+# Settings that change simulation results; a resumed sweep must reuse them.
+RESUME_SETTINGS = (
+    "sim_time", "send_interval", "warmup", "feedback_channel", "trust_inject_targets", "trust_inject_batch"
+)
+# Seed scheduling of an adaptive sweep, restored so a resume keeps its rounds.
+ADAPTIVE_SETTINGS = ("adaptive_seeds", "seeds", "min_seeds", "max_seeds", "seed_batch", "ci_pdr", "ci_e1")
+TRUST_OUTPUTS = ("trust_metrics.csv", "exposure.csv", "stats.csv")
+LAMBDA_SET = [0, 1, 3, 10]
+GAMMA_SET = [1, 2, 4]
+# trust_engine knobs explored by --search-sink on top of the gray-only
+# (trust_alpha=1.0) variant; values follow run_experiments.sh defaults.
+SINK_SEARCH_SPACE = {
+    "sink_lambda_adv": [0.01, 0.05],
+    "sink_lambda_stab": [0.01, 0.05],
+    "sink_beta": [0.1, 0.3],
+}
 
 
 def remove_serial_socket_plugin(contents):
@@ -80,6 +118,23 @@ def build_run_name(topo_name, scenario, attack_rate, trust, lam, gam, seed):
     )
 
 
+def combo_run_name(combo):
+    run_name = build_run_name(
+        Path(combo["topology"]).stem,
+        combo["scenario"],
+        combo["attack_rate"],
+        combo["trust"],
+        combo["lambda"],
+        combo["gamma"],
+        combo["seed"],
+    )
+    if combo.get("variant") is not None:
+        # trust_engine variants of a search share lambda/gamma/seed.
+        base, seed = run_name.rsplit("_s", 1)
+        run_name = f"{base}_v{combo['variant']}_s{seed}"
+    return run_name
+
+
 def write_run_meta(log_dir, meta):
     log_dir.mkdir(parents=True, exist_ok=True)
     meta_path = log_dir / "run_meta.json"
@@ -87,18 +142,157 @@ def write_run_meta(log_dir, meta):
         json.dump(meta, handle, indent=2)
 
 
-def run_simulation(args, combo, results_dir):
+def render_config(args, combo, trust_feedback, feedback_socket=""):
+    sim_time_ms = int(args.sim_time * 1000)
+    contents = Path(combo["topology"]).read_text()
+    contents = apply_replacements(
+        contents,
+        [
+            (r"<randomseed>\d+</randomseed>", f"<randomseed>{combo['seed']}</randomseed>"),
+            (r"@SIM_TIME_MS@", str(sim_time_ms)),
+            (r"@SIM_TIME_SEC@", str(args.sim_time)),
+            (r"@TRUST_FEEDBACK_PATH@", str(trust_feedback)),
+            (r"@TRUST_FEEDBACK_SOCKET@", str(feedback_socket)),
+            (r"@TRUST_INJECT_TARGETS@", args.trust_inject_targets),
+            (r"@TRUST_INJECT_BATCH@", str(args.trust_inject_batch)),
+            (r"BRPL_MODE=\d", "BRPL_MODE=1"),
+            (r"TRUST_ENABLED=\d", f"TRUST_ENABLED={combo['trust']}"),
+            (r"ATTACK_DROP_PCT=\d+", f"ATTACK_DROP_PCT={combo['attack_rate']}"),
+            (r"SEND_INTERVAL_SECONDS=\d+", f"SEND_INTERVAL_SECONDS={args.send_interval}"),
+            (r"WARMUP_SECONDS=\d+", f"WARMUP_SECONDS={args.warmup}"),
+            (r",PROJECT_CONF_PATH=[^,< ]+", ""),
+            (r",PROJECT_CONF_PATH=\"[^\"]+\"", ""),
+        ],
+    )
+    trust_lambda = combo["lambda"] if combo["lambda"] is not None else 0
+    trust_gamma = combo["gamma"] if combo["gamma"] is not None else 1
+    contents = update_trust_defines(contents, trust_lambda, trust_gamma)
+    return remove_serial_socket_plugin(contents)
+
+
+def trust_engine_options(combo):
+    options = [
+        "--stats-interval",
+        "200",
+        "--metric",
+        "ewma",
+        "--alpha",
+        "0.2",
+        "--ewma-min",
+        "0.7",
+        "--miss-threshold",
+        "5",
+        "--forwarders-only",
+        "--fwd-drop-threshold",
+        "0.2",
+        "--attacker-id",
+        "2",
+    ]
+    for name, value in combo.get("engine", {}).items():
+        options += [f"--{name.replace('_', '-')}", str(value)]
+    return options
+
+
+def run_input_key(args, combo):
+    # The feedback path and socket differ per run directory but not the
+    # simulation; the channel mode does change injection timing.
+    feedback_socket = "@TRUST_FEEDBACK_SOCKET@" if args.feedback_channel == "socket" else ""
+    contents = render_config(args, combo, "@TRUST_FEEDBACK_PATH@", feedback_socket)
+    return result_store.input_key(
+        contents,
+        [key for key, _ in config_variants(contents)],
+        trust_engine_options(combo),
+        TRUST_ENGINE,
+        Path(args.cooja_path) / "tools" / "cooja" / "build" / "libs" / "cooja.jar",
+    )
+
+
+def scan_log_lines(lines, progress):
+    for line in lines:
+        if line.startswith(b"CSV,SIMTIME,"):
+            try:
+                progress["sim_ms"] = int(line[12:])
+            except ValueError:
+                pass
+        elif line.startswith(b"CSV,RX,"):
+            progress["rx"] += 1
+        elif line.startswith(b"ROUTING_WAIT_TIMEOUT") and progress["routing_timeout_ms"] is None:
+            progress["routing_timeout_ms"] = progress["sim_ms"] or 0
+
+
+def watch_cooja(args, proc, log_path, cancelled=None):
+    started = time.monotonic()
+    last_growth = started
+    offset = 0
+    partial = b""
+    samples = deque()
+    progress = {"sim_ms": None, "rx": 0, "routing_timeout_ms": None}
+    while True:
+        try:
+            proc.wait(timeout=WATCHDOG_POLL_SECONDS)
+            return ("completed" if proc.returncode == 0 else "failed"), None
+        except subprocess.TimeoutExpired:
+            pass
+        now = time.monotonic()
+        elapsed = now - started
+        if elapsed > args.timeout:
+            return "timeout", f"still running after {args.timeout}s"
+        if cancelled is not None and cancelled():
+            return "aborted", "cancelled while running"
+        if not args.watchdog:
+            continue
+
+        try:
+            with log_path.open("rb") as handle:
+                handle.seek(offset)
+                chunk = handle.read()
+        except OSError:
+            chunk = b""
+        if chunk:
+            offset += len(chunk)
+            last_growth = now
+            lines = (partial + chunk).split(b"\n")
+            partial = lines.pop()
+            scan_log_lines(lines, progress)
+        # The log stays empty while Cooja starts up or compiles firmware.
+        elif offset and args.stall_timeout and now - last_growth > args.stall_timeout:
+            return "stalled", f"COOJA.testlog unchanged for {int(now - last_growth)}s"
+
+        sim_ms = progress["sim_ms"]
+        if sim_ms is None:
+            # Configs without the SIMTIME heartbeat only get the stall check.
+            continue
+        timeout_ms = progress["routing_timeout_ms"]
+        if (
+            args.doomed_grace
+            and timeout_ms is not None
+            and progress["rx"] == 0
+            and sim_ms - timeout_ms > args.doomed_grace * 1000
+        ):
+            return "doomed", (
+                f"ROUTING_WAIT_TIMEOUT at {timeout_ms // 1000}s and no RX by {sim_ms // 1000}s simulated"
+            )
+
+        samples.append((now, sim_ms))
+        while len(samples) > 1 and now - samples[1][0] >= RATE_WINDOW_SECONDS:
+            samples.popleft()
+        window = now - samples[0][0]
+        if window < RATE_WINDOW_SECONDS:
+            continue
+        rate = (sim_ms - samples[0][1]) / 1000.0 / window
+        if rate <= 0:
+            return "stalled", f"simulated time stuck at {sim_ms // 1000}s for {int(window)}s"
+        projected = elapsed + (args.sim_time - sim_ms / 1000.0) / rate
+        if projected > args.timeout:
+            return "too_slow", (
+                f"{rate:.2f} simulated s per wall s; projected {int(projected)}s exceeds --timeout {args.timeout}s"
+            )
+
+
+def run_simulation(args, combo, results_dir, cancelled=None):
     topo_path = Path(combo["topology"])
     topo_name = topo_path.stem
-    run_name = build_run_name(
-        topo_name,
-        combo["scenario"],
-        combo["attack_rate"],
-        combo["trust"],
-        combo["lambda"],
-        combo["gamma"],
-        combo["seed"],
-    )
+    run_name = combo_run_name(combo)
     run_dir = results_dir / run_name
     log_dir = run_dir / "logs"
     log_dir.mkdir(parents=True, exist_ok=True)
@@ -114,50 +308,62 @@ def run_simulation(args, combo, results_dir):
         "seed": combo["seed"],
         "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
     }
+    if combo.get("engine"):
+        meta["engine"] = combo["engine"]
     write_run_meta(log_dir, meta)
 
     if args.dry_run:
         return run_name, "planned"
 
-    trust_engine = PROJECT_DIR / "tools" / "trust_engine" / "target" / "release" / "trust_engine"
-    if not trust_engine.exists():
+    if not TRUST_ENGINE.exists():
         raise RuntimeError("trust_engine binary missing; build it in tools/trust_engine first.")
 
-    temp_config = PROJECT_DIR / "configs" / f"temp_{run_name}.csc"
-    sim_time_ms = int(args.sim_time * 1000)
+    input_key = run_input_key(args, combo)
+    if args.result_cache and result_store.fetch(input_key, run_dir):
+        meta.update(status="completed", result_cache=input_key)
+        write_run_meta(log_dir, meta)
+        run_manifest.write_manifest(run_dir, "completed", input_key)
+        return run_name, "completed"
+    result_store.detach(run_dir)
+    # A manifest left by an earlier attempt must not describe the new run.
+    (run_dir / run_manifest.MANIFEST_NAME).unlink(missing_ok=True)
+
+    # Cooja resolves [CONFIG_DIR]/../motes relative to the config, so the temp
+    # file stays in configs/; the sweep (and search rung) directory names keep
+    # parallel sweeps apart.
+    temp_name = f"temp_{results_dir.parent.name}_{results_dir.name}_{run_name}.csc"
+    temp_config = PROJECT_DIR / "configs" / temp_name
     trust_feedback = run_dir / "trust_feedback.txt"
 
-    contents = topo_path.read_text()
-    contents = apply_replacements(
-        contents,
-        [
-            (r"<randomseed>\d+</randomseed>", f"<randomseed>{combo['seed']}</randomseed>"),
-            (r"@SIM_TIME_MS@", str(sim_time_ms)),
-            (r"@SIM_TIME_SEC@", str(args.sim_time)),
-            (r"@TRUST_FEEDBACK_PATH@", str(trust_feedback)),
-            (r"BRPL_MODE=\d", "BRPL_MODE=1"),
-            (r"TRUST_ENABLED=\d", f"TRUST_ENABLED={combo['trust']}"),
-            (r"ATTACK_DROP_PCT=\d+", f"ATTACK_DROP_PCT={combo['attack_rate']}"),
-            (r"SEND_INTERVAL_SECONDS=\d+", f"SEND_INTERVAL_SECONDS={args.send_interval}"),
-            (r"WARMUP_SECONDS=\d+", f"WARMUP_SECONDS={args.warmup}"),
-            (r",PROJECT_CONF_PATH=[^,< ]+", ""),
-            (r",PROJECT_CONF_PATH=\"[^\"]+\"", ""),
-        ],
-    )
-    trust_lambda = combo["lambda"] if combo["lambda"] is not None else 0
-    trust_gamma = combo["gamma"] if combo["gamma"] is not None else 1
-    contents = update_trust_defines(contents, trust_lambda, trust_gamma)
-    contents = remove_serial_socket_plugin(contents)
+    bridge = None
+    if args.feedback_channel == "socket":
+        bridge = feedback_bridge.start()
+        if bridge is None:
+            print(f"[WARN] {run_name}: no feedback socket; falling back to file polling", file=sys.stderr)
+    meta["feedback_channel"] = "socket" if bridge else "file"
+    write_run_meta(log_dir, meta)
+
+    contents = render_config(args, combo, trust_feedback, bridge["cooja"] if bridge else "")
+    if args.firmware_cache:
+        try:
+            contents = use_cached_firmware(contents)
+        except FirmwareBuildError as exc:
+            print(f"[ERROR] {run_name}: {exc}", file=sys.stderr)
+            if bridge:
+                feedback_bridge.stop(bridge)
+            run_manifest.write_manifest(run_dir, "build_failed", input_key, str(exc))
+            return run_name, "build_failed"
     temp_config.write_text(contents)
 
     if args.clean_build:
         shutil.rmtree(PROJECT_DIR / "motes" / "build", ignore_errors=True)
 
     trust_feedback.touch(exist_ok=True)
-    (log_dir / "COOJA.testlog").touch(exist_ok=True)
+    # Truncate leftovers from an interrupted attempt so a resumed run starts clean.
+    (log_dir / "COOJA.testlog").write_text("")
 
     trust_engine_cmd = [
-        str(trust_engine),
+        str(TRUST_ENGINE),
         "--input",
         str(log_dir / "COOJA.testlog"),
         "--output",
@@ -172,23 +378,13 @@ def run_simulation(args, combo, results_dir):
         str(run_dir / "parent_switch.csv"),
         "--stats-out",
         str(run_dir / "stats.csv"),
-        "--stats-interval",
-        "200",
-        "--metric",
-        "ewma",
-        "--alpha",
-        "0.2",
-        "--ewma-min",
-        "0.7",
-        "--miss-threshold",
-        "5",
-        "--forwarders-only",
-        "--fwd-drop-threshold",
-        "0.2",
-        "--attacker-id",
-        "2",
+        "--latency-out",
+        str(run_dir / "feedback_timing.csv"),
+        *trust_engine_options(combo),
         "--follow",
     ]
+    if bridge:
+        trust_engine_cmd += ["--feed-socket", bridge["engine"]]
     trust_engine_log = (run_dir / "trust_engine.log").open("w")
     trust_proc = subprocess.Popen(trust_engine_cmd, stdout=trust_engine_log, stderr=subprocess.STDOUT)
 
@@ -211,21 +407,24 @@ def run_simulation(args, combo, results_dir):
         str(temp_config),
     ]
 
-    status = "completed"
     try:
         with (run_dir / "cooja_output.log").open("w") as handle:
-            subprocess.run(
-                cooja_cmd,
-                stdout=handle,
-                stderr=subprocess.STDOUT,
-                env=env,
-                timeout=args.timeout,
-                check=True,
-            )
-    except subprocess.TimeoutExpired:
-        status = "timeout"
-    except subprocess.CalledProcessError:
-        status = "failed"
+            cooja_proc = subprocess.Popen(cooja_cmd, stdout=handle, stderr=subprocess.STDOUT, env=env)
+            try:
+                status, reason = watch_cooja(args, cooja_proc, log_dir / "COOJA.testlog", cancelled)
+            finally:
+                if cooja_proc.poll() is None:
+                    cooja_proc.terminate()
+                    try:
+                        cooja_proc.wait(timeout=10)
+                    except subprocess.TimeoutExpired:
+                        cooja_proc.kill()
+                        cooja_proc.wait()
+        meta["status"] = status
+        if reason:
+            meta["reason"] = reason
+            print(f"[WARN] {run_name}: {status}: {reason}", file=sys.stderr, flush=True)
+        write_run_meta(log_dir, meta)
     finally:
         trust_proc.terminate()
         try:
@@ -234,17 +433,350 @@ def run_simulation(args, combo, results_dir):
             trust_proc.kill()
         trust_engine_log.close()
         temp_config.unlink(missing_ok=True)
+        if bridge:
+            meta["feedback_forwarded"] = feedback_bridge.stop(bridge)
+            write_run_meta(log_dir, meta)
+
+    # trust_engine has exited, so its CSVs hold their final rows.
+    run_manifest.write_manifest(run_dir, status, input_key, meta.get("reason"))
+
+    if status == "completed" and run_is_complete(run_dir):
+        result_store.store(input_key, run_dir, meta, replace=not args.result_cache)
 
     return run_name, status
 
 
-def generate_combos(args, topologies):
+def journal_append(journal_path, entry):
+    entry = {"time": time.strftime("%Y-%m-%dT%H:%M:%S"), **entry}
+    with journal_path.open("a") as handle:
+        handle.write(json.dumps(entry, sort_keys=True) + "\n")
+        handle.flush()
+        os.fsync(handle.fileno())
+
+
+def load_journal(journal_path):
+    settings = {}
+    combos = {}
+    states = {}
+    with journal_path.open(errors="ignore") as handle:
+        for line in handle:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                # Torn write from a crash; every earlier entry is still valid.
+                continue
+            if entry.get("state") == "sweep":
+                settings = entry.get("settings", {})
+                continue
+            run_name = entry.get("run")
+            if not run_name:
+                continue
+            if "combo" in entry:
+                combos.setdefault(run_name, entry["combo"])
+            states[run_name] = entry.get("state")
+    return settings, list(combos.values()), states
+
+
+def read_file_tail(path, size=4096):
+    with open(path, "rb") as handle:
+        handle.seek(0, os.SEEK_END)
+        end = handle.tell()
+        handle.seek(max(0, end - size))
+        return handle.read()
+
+
+def run_is_complete(run_dir):
+    log_path = run_dir / "logs" / "COOJA.testlog"
+    if not log_path.exists() or log_path.stat().st_size == 0:
+        return False
+    tail = read_file_tail(log_path)
+    if b"SIMULATION_FINISHED" not in tail and b"TEST OK" not in tail:
+        return False
+    for name in TRUST_OUTPUTS:
+        if not (run_dir / name).exists():
+            return False
+    return True
+
+
+def parse_mem_mb(value):
+    match = re.fullmatch(r"\s*(\d+(?:\.\d+)?)\s*([kKmMgGtT]?)[bB]?\s*", str(value))
+    if not match:
+        raise ValueError(f"invalid memory size: {value}")
+    # Bare numbers are gigabytes, matching how budgets are usually quoted.
+    scale = {"k": 1 / 1024, "m": 1, "g": 1024, "": 1024, "t": 1024 * 1024}
+    return int(float(match.group(1)) * scale[match.group(2).lower()])
+
+
+def parse_xmx_mb(value):
+    """-Xmx size in MB with JVM semantics: a bare number is bytes."""
+    match = re.fullmatch(r"(\d+)([kKmMgGtT]?)", value)
+    if not match:
+        raise ValueError(f"invalid -Xmx size: {value}")
+    scale = {"": 1 / (1024 * 1024), "k": 1 / 1024, "m": 1, "g": 1024, "t": 1024 * 1024}
+    return int(int(match.group(1)) * scale[match.group(2).lower()])
+
+
+def estimate_run_mem_mb(java_opts):
+    heap_mb = 1024
+    for opt in java_opts.split():
+        if opt.startswith("-Xmx"):
+            heap_mb = parse_xmx_mb(opt[4:])
+    return heap_mb + RUN_MEM_OVERHEAD_MB
+
+
+def read_mem_available_mb():
+    try:
+        with open("/proc/meminfo") as handle:
+            for line in handle:
+                if line.startswith("MemAvailable:"):
+                    return int(line.split()[1]) // 1024
+    except OSError:
+        pass
+    return None
+
+
+def read_load_average():
+    try:
+        return os.getloadavg()[0]
+    except (AttributeError, OSError):
+        return None
+
+
+def can_admit(args, running_count, run_mem_mb):
+    if running_count == 0:
+        # Always make progress, even on a host that is busy with other work.
+        return True
+    if running_count >= args.jobs:
+        return False
+    if args.max_mem is not None and (running_count + 1) * run_mem_mb > args.max_mem:
+        return False
+    available_mb = read_mem_available_mb()
+    if available_mb is not None and available_mb < run_mem_mb:
+        return False
+    cpu_count = os.cpu_count() or 1
+    load = read_load_average()
+    # The load average lags freshly started JVMs, so count them explicitly.
+    busy = max(load if load is not None else 0.0, float(running_count))
+    if busy + 1 > cpu_count:
+        return False
+    return True
+
+
+def run_combos(args, combos, results_dir, journal_path):
+    statuses = {}
+    total = len(combos)
+
+    def start(combo):
+        if not args.dry_run:
+            journal_append(journal_path, {"run": combo_run_name(combo), "state": "running"})
+
+    def finish(run_name, status):
+        statuses[run_name] = status
+        if not args.dry_run:
+            journal_append(journal_path, {"run": run_name, "state": status})
+
+    def result(combo, future=None):
+        try:
+            if future is None:
+                return run_simulation(args, combo, results_dir)
+            return future.result()
+        except (OSError, RuntimeError) as exc:
+            # One broken run must not abort the sweep or stay journaled as running.
+            print(f"[ERROR] {combo_run_name(combo)}: {exc}", file=sys.stderr, flush=True)
+            return combo_run_name(combo), "failed"
+
+    if args.jobs <= 1 or args.dry_run:
+        for combo in combos:
+            start(combo)
+            finish(*result(combo))
+        return statuses
+
+    run_mem_mb = estimate_run_mem_mb(args.java_opts)
+    pending = list(combos)
+    running = {}
+    with ThreadPoolExecutor(max_workers=args.jobs) as pool:
+        while pending or running:
+            while pending and can_admit(args, len(running), run_mem_mb):
+                combo = pending.pop(0)
+                start(combo)
+                running[pool.submit(run_simulation, args, combo, results_dir)] = combo
+                if pending:
+                    # Let the new JVM claim its heap before the next admission check.
+                    time.sleep(ADMIT_POLL_SECONDS)
+            done, _ = wait(list(running), timeout=ADMIT_POLL_SECONDS, return_when=FIRST_COMPLETED)
+            for future in done:
+                run_name, status = result(running.pop(future), future)
+                finish(run_name, status)
+                print(f"[{len(statuses)}/{total}] {run_name}: {status}", flush=True)
+    return statuses
+
+
+def prebuild_firmware(args, combos, results_dir):
+    variants = {}
+    combo_keys = {}
+    for combo in combos:
+        run_name = combo_run_name(combo)
+        contents = render_config(args, combo, results_dir / run_name / "trust_feedback.txt")
+        keys = []
+        for key, spec in config_variants(contents):
+            variants.setdefault(key, spec)
+            keys.append(key)
+        combo_keys[run_name] = keys
+
+    print(f"Prebuilding {len(variants)} firmware variants for {len(combos)} runs", flush=True)
+    errors = {}
+    with ThreadPoolExecutor(max_workers=args.build_jobs) as pool:
+        futures = {pool.submit(build_variant, key, spec): key for key, spec in variants.items()}
+        for future in as_completed(futures):
+            key = futures[future]
+            try:
+                future.result()
+            except FirmwareBuildError as exc:
+                errors[key] = str(exc)
+                print(f"[ERROR] {exc}", file=sys.stderr, flush=True)
+
+    failed = {}
+    for run_name, keys in combo_keys.items():
+        reasons = [errors[key] for key in keys if key in errors]
+        if reasons:
+            failed[run_name] = reasons
+    return failed
+
+
+def execute_runs(args, combos, results_dir, journal_path):
+    if args.firmware_cache and not args.dry_run and combos:
+        to_build = combos
+        if args.result_cache:
+            # Runs served from the result store never start Cooja.
+            to_build = [combo for combo in combos if not result_store.lookup(run_input_key(args, combo))]
+        # Build every firmware variant up front so broken builds fail their
+        # combos now instead of minutes into a Cooja run.
+        build_failures = prebuild_firmware(args, to_build, results_dir)
+        for run_name, reasons in build_failures.items():
+            journal_append(journal_path, {"run": run_name, "state": "build_failed", "reason": "; ".join(reasons)})
+        combos = [combo for combo in combos if combo_run_name(combo) not in build_failures]
+        if build_failures:
+            print(f"[WARN] {len(build_failures)} runs skipped after firmware build failures", file=sys.stderr)
+
+    return run_combos(args, combos, results_dir, journal_path)
+
+
+def dispatch_runs(args, combos, results_dir, journal_path):
+    if args.coordinator:
+        return distribute_runs(args, combos, results_dir, journal_path)
+    return execute_runs(args, combos, results_dir, journal_path)
+
+
+def distribute_runs(args, combos, results_dir, journal_path):
+    queue_dir = results_dir / work_queue.QUEUE_DIR_NAME
+    _, _, done_dir = work_queue.queue_paths(queue_dir)
+    items = []
+    for combo in combos:
+        run_name = combo_run_name(combo)
+        # A rerun (resume) must not be mistaken for its earlier outcome.
+        (done_dir / f"{run_name}.json").unlink(missing_ok=True)
+        items.append((run_name, combo))
+    work_queue.enqueue(queue_dir, items)
+    print(
+        f"Queued {len(items)} runs; start workers with: "
+        f"python3 scripts/run_trust_sweep.py --worker {results_dir}",
+        flush=True,
+    )
+
+    statuses = {}
+    while len(statuses) < len(items):
+        _, _, done = work_queue.queue_status(queue_dir)
+        for run_name, _ in items:
+            if run_name in statuses or run_name not in done:
+                continue
+            statuses[run_name] = done[run_name]
+            if not args.dry_run:
+                journal_append(journal_path, {"run": run_name, "state": done[run_name]})
+            print(f"[{len(statuses)}/{len(items)}] {run_name}: {done[run_name]}", flush=True)
+        if len(statuses) < len(items):
+            time.sleep(QUEUE_POLL_SECONDS)
+    return statuses
+
+
+def run_worker(args, results_dir):
+    queue_dir = results_dir / work_queue.QUEUE_DIR_NAME
+    if not queue_dir.is_dir():
+        raise SystemExit(f"No work queue in {results_dir}")
+    settings, _, _ = load_journal(results_dir / JOURNAL_NAME)
+    for key in RESUME_SETTINGS:
+        if key in settings:
+            setattr(args, key, settings[key])
+
+    worker = work_queue.worker_name()
+    run_mem_mb = estimate_run_mem_mb(args.java_opts)
+    # Claimed items -> claim token, and the items whose claim was reclaimed.
+    active = {}
+    lost = set()
+    lock = threading.Lock()
+    stop = threading.Event()
+
+    def keep_leases():
+        while not stop.wait(args.lease / 3):
+            for name, token in list(active.items()):
+                if not work_queue.renew_claim(queue_dir, name, token) and name not in lost:
+                    print(f"[WARN] {worker} lost the claim on {name}; aborting it", file=sys.stderr, flush=True)
+                    lost.add(name)
+
+    def work():
+        while True:
+            with lock:
+                item = None
+                if can_admit(args, len(active), run_mem_mb):
+                    item = work_queue.claim_next(queue_dir, worker, args.lease)
+                    if item is not None:
+                        active[item[0]] = item[2]
+            if item is None:
+                items, _, done = work_queue.queue_status(queue_dir)
+                if items <= set(done):
+                    return
+                # Wait for a free slot, or for a stale claim to expire.
+                time.sleep(QUEUE_POLL_SECONDS)
+                continue
+            name, combo, token = item
+            topology = Path(combo["topology"])
+            if not topology.exists():
+                # The coordinator's checkout may live at another path.
+                combo["topology"] = str(PROJECT_DIR / "configs" / "topologies" / topology.name)
+            # The run is staged per claim so a worker that loses its lease
+            # never writes into the run directory of the new owner.
+            staging = work_queue.staging_dir(queue_dir, token)
+            try:
+                _, status = run_simulation(args, combo, staging, lambda: name in lost)
+            except (OSError, RuntimeError) as exc:
+                print(f"[ERROR] {name}: {exc}", file=sys.stderr, flush=True)
+                status = "failed"
+            finally:
+                active.pop(name, None)
+            if name in lost:
+                lost.discard(name)
+                work_queue.discard_claim(queue_dir, name, token)
+                print(f"{worker} {name}: discarded (claim lost)", flush=True)
+                continue
+            if not work_queue.complete_item(queue_dir, name, worker, status, token, results_dir):
+                print(f"[WARN] {worker} {name}: claim lost before completion; run discarded", file=sys.stderr, flush=True)
+                continue
+            print(f"{worker} {name}: {status}", flush=True)
+
+    threading.Thread(target=keep_leases, daemon=True).start()
+    try:
+        with ThreadPoolExecutor(max_workers=args.jobs) as pool:
+            for future in [pool.submit(work) for _ in range(args.jobs)]:
+                future.result()
+    finally:
+        stop.set()
+
+
+def generate_combos(args, topologies, seeds=None):
     attack_rates = [30, 50]
     if args.include_attack_extremes:
         attack_rates = [0, 30, 50, 70]
-    seeds = args.seeds
-    lambda_set = [0, 1, 3, 10]
-    gamma_set = [1, 2, 4]
+    if seeds is None:
+        seeds = args.seeds
     combos = []
 
     for topo in topologies:
@@ -281,8 +813,8 @@ def generate_combos(args, topologies):
                                 }
                             )
                 continue
-            for lam in lambda_set:
-                for gam in gamma_set:
+            for lam in LAMBDA_SET:
+                for gam in GAMMA_SET:
                     for seed in seeds:
                         combos.append(
                             {
@@ -300,53 +832,188 @@ def generate_combos(args, topologies):
     return combos
 
 
-def main():
-    parser = argparse.ArgumentParser()
-    parser.add_argument("--dry-run", action="store_true", help="Only create sweep matrix")
-    parser.add_argument("--include-attack-extremes", action="store_true", help="Add 0/70 attack rates")
-    parser.add_argument("--include-control-topology", action="store_true", help="Include T2_random_15_seed1")
-    parser.add_argument("--include-normal-sanity", action="store_true", help="Run trust-on sanity for attack=0")
-    parser.add_argument("--seeds", nargs="+", type=int, default=[111111, 222222, 333333, 444444, 555555])
-    parser.add_argument("--sim-time", type=int, default=600)
-    parser.add_argument("--timeout", type=int, default=900)
-    parser.add_argument("--send-interval", type=int, default=30)
-    parser.add_argument("--warmup", type=int, default=120)
-    parser.add_argument("--clean-build", action="store_true")
-    parser.add_argument("--contiki-path", default=str(PROJECT_DIR / "contiki-ng-brpl"))
-    parser.add_argument("--cooja-path", default="/home/dev/contiki-ng")
-    parser.add_argument("--java-opts", default="-Xmx4G -Xms2G")
-    args = parser.parse_args()
+def seed_pool(args):
+    seeds = list(args.seeds)
+    while len(seeds) < args.max_seeds:
+        seeds.append(max(seeds) + 111111)
+    return seeds[: args.max_seeds]
 
-    topologies = [
-        str(PROJECT_DIR / "configs" / "topologies" / "T3.csc"),
-        str(PROJECT_DIR / "configs" / "topologies" / "T1_S.csc"),
-    ]
-    if args.include_control_topology:
-        topologies.append(str(PROJECT_DIR / "configs" / "topologies" / "T2_random_15_seed1.csc"))
 
-    combos = generate_combos(args, topologies)
+def cell_key(combo):
+    return (combo["topology"], combo["attack_rate"], combo["trust"], combo["lambda"], combo["gamma"])
 
-    timestamp = time.strftime("%Y%m%d-%H%M%S")
-    results_dir = PROJECT_DIR / "results" / f"experiments-{timestamp}"
-    results_dir.mkdir(parents=True, exist_ok=True)
 
-    matrix_path = results_dir / "sweep_matrix.csv"
-    matrix_rows = []
+def cell_samples(results_dir, cell):
+    pdr_values = []
+    e1_values = []
+    for combo in cell:
+        result = experiment_summary.summarize_run(str(results_dir), combo_run_name(combo))
+        if not result or result[0] != "summary":
+            continue
+        row = result[1]
+        pdr_values.append(float(row["pdr"]))
+        if row["e1"]:
+            e1_values.append(float(row["e1"]))
+    return pdr_values, e1_values
+
+
+def cell_converged(args, pdr_values, e1_values):
+    if len(pdr_values) < args.min_seeds:
+        return False
+    if experiment_summary.ci95(pdr_values) > args.ci_pdr:
+        return False
+    if args.ci_e1 is not None and experiment_summary.ci95(e1_values) > args.ci_e1:
+        return False
+    return True
+
+
+def schedule_more_seeds(args, combos, results_dir):
+    cells = {}
     for combo in combos:
-        topo_name = Path(combo["topology"]).stem
-        run_name = build_run_name(
-            topo_name,
-            combo["scenario"],
-            combo["attack_rate"],
-            combo["trust"],
-            combo["lambda"],
-            combo["gamma"],
-            combo["seed"],
+        cells.setdefault(cell_key(combo), []).append(combo)
+    pool = seed_pool(args)
+    extra = []
+    for cell in cells.values():
+        scheduled = {combo["seed"] for combo in cell}
+        remaining = [seed for seed in pool if seed not in scheduled]
+        if not remaining:
+            continue
+        pdr_values, e1_values = cell_samples(results_dir, cell)
+        if cell_converged(args, pdr_values, e1_values):
+            continue
+        for seed in remaining[: args.seed_batch]:
+            extra.append({**cell[0], "seed": seed})
+    return extra
+
+
+def search_configs(args):
+    engines = [None]
+    if args.search_sink:
+        engines = [{"trust_alpha": 1.0}]
+        names = sorted(SINK_SEARCH_SPACE)
+        for values in itertools.product(*(SINK_SEARCH_SPACE[name] for name in names)):
+            engines.append({"trust_alpha": 0.5, **dict(zip(names, values))})
+    configs = []
+    for lam in LAMBDA_SET:
+        for gam in GAMMA_SET:
+            for idx, engine in enumerate(engines):
+                configs.append(
+                    {
+                        "lambda": lam,
+                        "gamma": gam,
+                        "variant": None if engine is None else idx,
+                        "engine": engine or {},
+                    }
+                )
+    return configs
+
+
+def config_combos(config, topologies, attack_rate, seeds):
+    combos = []
+    for topo in topologies:
+        for seed in seeds:
+            combos.append(
+                {
+                    "topology": topo,
+                    "topo_name": Path(topo).stem,
+                    "scenario": "normal" if attack_rate == 0 else "attack",
+                    "attack_rate": attack_rate,
+                    "trust": 1,
+                    "lambda": config["lambda"],
+                    "gamma": config["gamma"],
+                    "seed": seed,
+                    "variant": config["variant"],
+                    "engine": config["engine"],
+                }
+            )
+    return combos
+
+
+def score_config(args, results_dir, combos):
+    pdr_values, e1_values = cell_samples(results_dir, combos)
+    if not pdr_values or not e1_values:
+        return None, None, None
+    mean_pdr = experiment_summary.mean(pdr_values)
+    mean_e1 = experiment_summary.mean(e1_values)
+    # Lower is better: attacker exposure plus weighted delivery loss.
+    return mean_e1 + args.pdr_weight * (100.0 - mean_pdr), mean_pdr, mean_e1
+
+
+def run_search(args, topologies, search_dir):
+    configs = search_configs(args)
+    rows = []
+    for rung in range(args.rungs):
+        rung_args = argparse.Namespace(**vars(args))
+        rung_args.sim_time = max(args.search_min_time, args.sim_time // args.eta ** (args.rungs - 1 - rung))
+        seeds = args.seeds[: max(1, len(args.seeds) * (rung + 1) // args.rungs)]
+        rung_dir = search_dir / f"rung{rung}"
+        rung_dir.mkdir(parents=True, exist_ok=True)
+        journal_path = rung_dir / JOURNAL_NAME
+        journal_append(
+            journal_path,
+            {"state": "sweep", "settings": {key: getattr(rung_args, key) for key in RESUME_SETTINGS}},
+        )
+        config_runs = [config_combos(config, topologies, args.search_attack, seeds) for config in configs]
+        combos = [combo for runs in config_runs for combo in runs]
+        for combo in combos:
+            journal_append(journal_path, {"run": combo_run_name(combo), "state": "planned", "combo": combo})
+        write_sweep_matrix(rung_dir / "sweep_matrix.csv", combos)
+        print(
+            f"Search rung {rung}: {len(configs)} configs x {len(combos) // len(configs)} runs, "
+            f"sim_time={rung_args.sim_time}s",
+            flush=True,
         )
+        execute_runs(rung_args, combos, rung_dir, journal_path)
+        if args.dry_run:
+            break
+
+        scored = []
+        for config, runs in zip(configs, config_runs):
+            score, mean_pdr, mean_e1 = score_config(args, rung_dir, runs)
+            scored.append((math.inf if score is None else score, config, mean_pdr, mean_e1))
+        scored.sort(key=lambda item: item[0])
+        keep = len(scored)
+        if rung < args.rungs - 1:
+            keep = max(1, math.ceil(len(scored) / args.eta))
+        for rank, (score, config, mean_pdr, mean_e1) in enumerate(scored):
+            rows.append(
+                {
+                    "rung": rung,
+                    "sim_time": rung_args.sim_time,
+                    "seeds": len(seeds),
+                    "lambda": config["lambda"],
+                    "gamma": config["gamma"],
+                    "variant": "" if config["variant"] is None else config["variant"],
+                    "engine": ";".join(f"{k}={v}" for k, v in config["engine"].items()),
+                    "mean_pdr": f"{mean_pdr:.2f}" if mean_pdr is not None else "",
+                    "mean_e1": f"{mean_e1:.4f}" if mean_e1 is not None else "",
+                    "score": f"{score:.4f}" if score != math.inf else "",
+                    "promoted": int(rank < keep and rung < args.rungs - 1),
+                }
+            )
+        configs = [config for score, config, _, _ in scored[:keep] if score != math.inf]
+        if not configs:
+            print("[WARN] no configuration produced valid runs; stopping search", file=sys.stderr)
+            break
+
+    if rows:
+        experiment_summary.write_csv(search_dir / "search_results.csv", list(rows[0].keys()), rows)
+        final = [row for row in rows if row["rung"] == rows[-1]["rung"] and row["score"]]
+        if final:
+            best = final[0]
+            print(
+                f"Best configuration: lambda={best['lambda']} gamma={best['gamma']} "
+                f"engine={best['engine'] or 'default'} (mean_e1={best['mean_e1']}, mean_pdr={best['mean_pdr']})"
+            )
+
+
+def write_sweep_matrix(matrix_path, combos):
+    matrix_rows = []
+    for combo in combos:
         matrix_rows.append(
             {
-                "run": run_name,
-                "topology": topo_name,
+                "run": combo_run_name(combo),
+                "topology": Path(combo["topology"]).stem,
                 "scenario": combo["scenario"],
                 "attack_rate": combo["attack_rate"],
                 "trust": combo["trust"],
@@ -374,19 +1041,232 @@ def main():
         writer.writeheader()
         writer.writerows(matrix_rows)
 
-    statuses = {}
-    for combo in combos:
-        run_name, status = run_simulation(args, combo, results_dir)
-        statuses[run_name] = status
-        if args.dry_run:
-            continue
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--dry-run", action="store_true", help="Only create sweep matrix")
+    parser.add_argument("--include-attack-extremes", action="store_true", help="Add 0/70 attack rates")
+    parser.add_argument("--include-control-topology", action="store_true", help="Include T2_random_15_seed1")
+    parser.add_argument("--include-normal-sanity", action="store_true", help="Run trust-on sanity for attack=0")
+    parser.add_argument("--seeds", nargs="+", type=int, default=[111111, 222222, 333333, 444444, 555555])
+    parser.add_argument("--sim-time", type=int, default=600)
+    parser.add_argument("--timeout", type=int, default=900)
+    parser.add_argument("--send-interval", type=int, default=30)
+    parser.add_argument("--warmup", type=int, default=120)
+    parser.add_argument(
+        "--feedback-channel",
+        choices=("file", "socket"),
+        default="file",
+        help="Deliver trust updates to Cooja by polling trust_feedback.txt or through a Unix socket bridge",
+    )
+    parser.add_argument(
+        "--trust-inject-targets",
+        choices=("all", "neighbors"),
+        default="all",
+        help="Inject each trust update into every mote or only motes within radio range of the node",
+    )
+    parser.add_argument(
+        "--trust-inject-batch",
+        type=int,
+        default=1,
+        help="Trust updates packed into one serial command (motes built from older sources read only the first)",
+    )
+    parser.add_argument("--clean-build", action="store_true")
+    parser.add_argument(
+        "--no-firmware-cache",
+        dest="firmware_cache",
+        action="store_false",
+        help="Let Cooja compile firmware per run instead of using build-cache/firmware",
+    )
+    parser.add_argument(
+        "--build-jobs",
+        type=int,
+        default=os.cpu_count() or 1,
+        help="Concurrent firmware builds in the prebuild stage",
+    )
+    parser.add_argument("--contiki-path", default=str(PROJECT_DIR / "contiki-ng-brpl"))
+    parser.add_argument("--cooja-path", default="/home/dev/contiki-ng")
+    parser.add_argument("--java-opts", default="-Xmx4G -Xms2G")
+    parser.add_argument("--jobs", type=int, default=1, help="Maximum concurrent Cooja runs")
+    parser.add_argument(
+        "--max-mem",
+        type=parse_mem_mb,
+        default=None,
+        help="Memory budget for concurrent runs (e.g. 48G); -Xmx plus overhead is reserved per run",
+    )
+    parser.add_argument(
+        "--resume",
+        metavar="RESULTS_DIR",
+        help="Continue an interrupted sweep from its run journal; completed runs are skipped",
+    )
+    parser.add_argument(
+        "--adaptive-seeds",
+        action="store_true",
+        help="Run seeds in rounds and stop a cell once its PDR (and E1) ci95 half-width meets the target",
+    )
+    parser.add_argument("--min-seeds", type=int, default=3, help="Seeds per cell in the first adaptive round")
+    parser.add_argument("--max-seeds", type=int, default=15, help="Upper bound on seeds per cell")
+    parser.add_argument("--seed-batch", type=int, default=2, help="Seeds added per unconverged cell each round")
+    parser.add_argument("--ci-pdr", type=float, default=2.0, help="Target ci95 half-width of PDR (%%)")
+    parser.add_argument("--ci-e1", type=float, default=None, help="Target ci95 half-width of E1 (off by default)")
+    parser.add_argument(
+        "--search",
+        action="store_true",
+        help="Successive halving over lambda x gamma: short runs first, promote the best 1/eta",
+    )
+    parser.add_argument("--rungs", type=int, default=3, help="Search rounds; the last one runs --sim-time")
+    parser.add_argument("--eta", type=int, default=3, help="Keep 1/eta of the configurations per rung")
+    parser.add_argument("--search-min-time", type=int, default=240, help="Shortest simulation time of a rung (s)")
+    parser.add_argument("--search-attack", type=int, default=50, help="Attack rate the search is scored on")
+    parser.add_argument("--search-sink", action="store_true", help="Also search trust_alpha and sink_* knobs")
+    parser.add_argument("--pdr-weight", type=float, default=1.0, help="Score = mean E1 + weight * (100 - mean PDR)")
+    parser.add_argument(
+        "--stall-timeout",
+        type=int,
+        default=180,
+        help="Abort a run whose COOJA.testlog stops growing for this many seconds (0 disables)",
+    )
+    parser.add_argument(
+        "--doomed-grace",
+        type=int,
+        default=120,
+        help="Abort a run with no RX this many simulated seconds after ROUTING_WAIT_TIMEOUT (0 disables)",
+    )
+    parser.add_argument(
+        "--no-watchdog",
+        dest="watchdog",
+        action="store_false",
+        help="Only enforce --timeout; do not tail COOJA.testlog for progress",
+    )
+    parser.add_argument(
+        "--coordinator",
+        action="store_true",
+        help="Queue runs in RESULTS_DIR/queue for --worker processes instead of running them here",
+    )
+    parser.add_argument(
+        "--worker",
+        metavar="RESULTS_DIR",
+        help="Claim and run queued items of a coordinator's sweep (any host sharing the results tree)",
+    )
+    parser.add_argument(
+        "--lease",
+        type=int,
+        default=work_queue.DEFAULT_LEASE_SECONDS,
+        help="Seconds without a lease renewal before a worker's claim is reclaimed",
+    )
+    parser.add_argument(
+        "--no-cache",
+        dest="result_cache",
+        action="store_false",
+        help="Rerun every combo instead of reusing identical runs from build-cache/results",
+    )
+    args = parser.parse_args()
+    if args.jobs < 1:
+        parser.error("--jobs must be >= 1")
+    if args.jobs > 1 and args.clean_build:
+        parser.error("--clean-build wipes motes/build under running simulations; use --jobs 1")
+    if args.adaptive_seeds and not 2 <= args.min_seeds <= args.max_seeds:
+        parser.error("--adaptive-seeds needs 2 <= --min-seeds <= --max-seeds")
+    if args.seed_batch < 1:
+        parser.error("--seed-batch must be >= 1")
+    if args.trust_inject_batch < 1:
+        parser.error("--trust-inject-batch must be >= 1")
+    if args.search and (args.resume or args.adaptive_seeds):
+        parser.error("--search cannot be combined with --resume or --adaptive-seeds")
+    if args.worker and (args.coordinator or args.search or args.resume):
+        parser.error("--worker cannot be combined with --coordinator, --search or --resume")
+    if args.coordinator and args.search:
+        parser.error("--coordinator does not support --search")
+    try:
+        estimate_run_mem_mb(args.java_opts)
+    except ValueError as exc:
+        parser.error(f"--java-opts: {exc}")
+    if args.jobs > 1 and not args.firmware_cache:
+        parser.error("--no-firmware-cache builds in the shared motes/build under running simulations; use --jobs 1")
+    if args.rungs < 1 or args.eta < 2:
+        parser.error("--search needs --rungs >= 1 and --eta >= 2")
+
+    topologies = [
+        str(PROJECT_DIR / "configs" / "topologies" / "T3.csc"),
+        str(PROJECT_DIR / "configs" / "topologies" / "T1_S.csc"),
+    ]
+    if args.include_control_topology:
+        topologies.append(str(PROJECT_DIR / "configs" / "topologies" / "T2_random_15_seed1.csc"))
+
+    if args.worker:
+        run_worker(args, Path(args.worker).resolve())
+        return
+
+    if args.search:
+        search_dir = PROJECT_DIR / "results" / f"search-{time.strftime('%Y%m%d-%H%M%S')}"
+        search_dir.mkdir(parents=True, exist_ok=True)
+        run_search(args, topologies, search_dir)
+        print(str(search_dir))
+        return
+
+    if args.resume:
+        results_dir = Path(args.resume).resolve()
+        journal_path = results_dir / JOURNAL_NAME
+        if not journal_path.exists():
+            parser.error(f"no {JOURNAL_NAME} in {results_dir}; cannot resume")
+        settings, combos, states = load_journal(journal_path)
+        for key in RESUME_SETTINGS + ADAPTIVE_SETTINGS:
+            if key in settings:
+                setattr(args, key, settings[key])
+        matrix_path = results_dir / "sweep_matrix.csv"
+        if not matrix_path.exists() or args.adaptive_seeds:
+            write_sweep_matrix(matrix_path, combos)
+        pending = []
+        for combo in combos:
+            run_name = combo_run_name(combo)
+            if states.get(run_name) == "completed" and run_is_complete(results_dir / run_name):
+                continue
+            pending.append(combo)
+        print(f"Resuming {results_dir}: {len(combos) - len(pending)} done, {len(pending)} to run")
+    else:
+        if args.adaptive_seeds:
+            combos = generate_combos(args, topologies, seeds=seed_pool(args)[: args.min_seeds])
+        else:
+            combos = generate_combos(args, topologies)
+        timestamp = time.strftime("%Y%m%d-%H%M%S")
+        results_dir = PROJECT_DIR / "results" / f"experiments-{timestamp}"
+        results_dir.mkdir(parents=True, exist_ok=True)
+        matrix_path = results_dir / "sweep_matrix.csv"
+        write_sweep_matrix(matrix_path, combos)
+        journal_path = results_dir / JOURNAL_NAME
+        journal_append(
+            journal_path,
+            {"state": "sweep", "settings": {key: getattr(args, key) for key in RESUME_SETTINGS + ADAPTIVE_SETTINGS}},
+        )
+        for combo in combos:
+            journal_append(journal_path, {"run": combo_run_name(combo), "state": "planned", "combo": combo})
+        pending = combos
+
+    dispatch_runs(args, pending, results_dir, journal_path)
+
+    if args.adaptive_seeds and not args.dry_run:
+        # Keep adding seeds to cells whose PDR/E1 confidence interval is still
+        # wider than the target, until every cell converges or hits --max-seeds.
+        while True:
+            extra = schedule_more_seeds(args, combos, results_dir)
+            if not extra:
+                break
+            print(f"Adaptive seeds: scheduling {len(extra)} more runs", flush=True)
+            for combo in extra:
+                journal_append(journal_path, {"run": combo_run_name(combo), "state": "planned", "combo": combo})
+            combos = combos + extra
+            write_sweep_matrix(matrix_path, combos)
+            dispatch_runs(args, extra, results_dir, journal_path)
 
     if not args.dry_run:
         with matrix_path.open(errors="ignore") as handle:
             reader = csv.DictReader(handle)
             rows = []
+            # The journal holds the final state of every run, including those
+            # finished by earlier attempts of a resumed sweep.
+            _, _, states = load_journal(journal_path)
             for row in reader:
-                row["status"] = statuses.get(row["run"], row["status"])
+                row["status"] = states.get(row["run"], row["status"])
                 rows.append(row)
         with matrix_path.open("w", newline="") as handle:
             writer = csv.DictWriter(handle, fieldnames=rows[0].keys())
@@ -399,8 +1279,18 @@ def main():
             str(results_dir),
             "--matrix",
             str(matrix_path),
+            "--jobs",
+            str(max(1, args.jobs)),
         ]
         subprocess.run(summary_cmd, check=False)
+        latency_cmd = [
+            sys.executable,
+            str(PROJECT_DIR / "tools" / "feedback_latency.py"),
+            str(results_dir),
+            "--report",
+            str(results_dir / "feedback_latency_report.csv"),
+        ]
+        subprocess.run(latency_cmd, check=False)
 
     print(str(results_dir))
 
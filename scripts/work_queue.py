@@ -0,0 +1,227 @@
+#!/usr/bin/env python3
+"""
+Shared-directory work queue for spreading a sweep over several hosts.
+
+The queue lives in <results_dir>/queue/ on a filesystem every host can
+see (e.g. NFS):
+
+  items/<name>.json    work item written by the coordinator
+  claims/<name>.claim  created with O_EXCL by the worker running the item;
+                       its mtime is the lease and is refreshed while running
+  staging/<token>/     where the claim's run is written; moved into the
+                       results directory only if the claim is still held
+  done/<name>.json     final status, published atomically with a rename
+
+A claim whose mtime is older than the lease belongs to a dead worker and
+is reclaimed by renaming it away, which only one worker can win. Lease
+ages are measured against the shared filesystem's clock, not the local
+one, so hosts with skewed clocks agree on staleness.
+
+Each claim carries a random token. Renewing and completing check it, so a
+worker whose claim was reclaimed while it stalled neither extends the new
+owner's lease nor publishes or overwrites its run.
+"""
+
+import argparse
+import json
+import os
+import secrets
+import shutil
+import socket
+import sys
+import time
+from pathlib import Path
+
+
+QUEUE_DIR_NAME = "queue"
+DEFAULT_LEASE_SECONDS = 300
+
+
+def queue_paths(queue_dir):
+    return queue_dir / "items", queue_dir / "claims", queue_dir / "done"
+
+
+def staging_dir(queue_dir, token):
+    return queue_dir / "staging" / token
+
+
+def worker_name():
+    return f"{socket.gethostname()}-{os.getpid()}"
+
+
+def write_json_atomic(path, payload):
+    tmp_path = path.with_name(f".{path.name}.{worker_name()}.tmp")
+    with tmp_path.open("w") as handle:
+        json.dump(payload, handle, indent=2, sort_keys=True)
+        handle.flush()
+        os.fsync(handle.fileno())
+    os.replace(tmp_path, path)
+
+
+def enqueue(queue_dir, items):
+    items_dir, claims_dir, done_dir = queue_paths(queue_dir)
+    for path in (items_dir, claims_dir, done_dir):
+        path.mkdir(parents=True, exist_ok=True)
+    for name, payload in items:
+        write_json_atomic(items_dir / f"{name}.json", payload)
+
+
+def shared_now(queue_dir):
+    # mtime of a freshly touched file is the file server's notion of "now".
+    clock = queue_dir / f".clock-{worker_name()}"
+    clock.touch()
+    os.utime(clock)
+    return clock.stat().st_mtime
+
+
+def try_create_claim(claim_path, worker, token):
+    try:
+        fd = os.open(claim_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY, 0o644)
+    except FileExistsError:
+        return False
+    with os.fdopen(fd, "w") as handle:
+        json.dump({"worker": worker, "token": token, "claimed": time.strftime("%Y-%m-%dT%H:%M:%S")}, handle)
+        handle.flush()
+        os.fsync(handle.fileno())
+    return True
+
+
+def holds_claim(claim_path, token):
+    try:
+        return json.loads(claim_path.read_text()).get("token") == token
+    except (OSError, ValueError):
+        return False
+
+
+def reclaim_if_stale(queue_dir, claim_path, lease):
+    try:
+        age = shared_now(queue_dir) - claim_path.stat().st_mtime
+    except FileNotFoundError:
+        return True
+    if age <= lease:
+        return False
+    tombstone = claim_path.with_name(f".{claim_path.name}.stale-{worker_name()}")
+    try:
+        os.rename(claim_path, tombstone)
+    except FileNotFoundError:
+        # Another worker won the reclaim (or the owner finished).
+        return False
+    if shared_now(queue_dir) - tombstone.stat().st_mtime <= lease:
+        # The owner renewed between our check and the rename; hand it back.
+        try:
+            os.link(tombstone, claim_path)
+        except FileExistsError:
+            pass
+        tombstone.unlink(missing_ok=True)
+        return False
+    tombstone.unlink(missing_ok=True)
+    print(f"[WARN] reclaimed stale claim {claim_path.stem} (idle {int(age)}s)", file=sys.stderr, flush=True)
+    return True
+
+
+def claim_next(queue_dir, worker, lease=DEFAULT_LEASE_SECONDS):
+    """(name, item, token) of a newly claimed item, or None."""
+    items_dir, claims_dir, done_dir = queue_paths(queue_dir)
+    for item_path in sorted(items_dir.glob("*.json")):
+        name = item_path.stem
+        if (done_dir / f"{name}.json").exists():
+            continue
+        claim_path = claims_dir / f"{name}.claim"
+        if claim_path.exists() and not reclaim_if_stale(queue_dir, claim_path, lease):
+            continue
+        token = secrets.token_hex(8)
+        if not try_create_claim(claim_path, worker, token):
+            continue
+        if (done_dir / f"{name}.json").exists():
+            # Finished by a worker that raced us between the checks above.
+            claim_path.unlink(missing_ok=True)
+            continue
+        return name, json.loads(item_path.read_text()), token
+    return None
+
+
+def renew_claim(queue_dir, name, token):
+    """Refresh the lease; False once the claim was reclaimed by another worker."""
+    _, claims_dir, _ = queue_paths(queue_dir)
+    claim_path = claims_dir / f"{name}.claim"
+    if not holds_claim(claim_path, token):
+        return False
+    try:
+        os.utime(claim_path)
+    except FileNotFoundError:
+        return False
+    return True
+
+
+def complete_item(queue_dir, name, worker, status, token, results_dir):
+    """Move the staged run into results_dir and publish its status.
+
+    Returns False, discarding the staged run, when the claim is no longer
+    held under token.
+    """
+    _, claims_dir, done_dir = queue_paths(queue_dir)
+    claim_path = claims_dir / f"{name}.claim"
+    staged = staging_dir(queue_dir, token)
+    if not holds_claim(claim_path, token) or (done_dir / f"{name}.json").exists():
+        shutil.rmtree(staged, ignore_errors=True)
+        return False
+    staged_run = staged / name
+    if staged_run.is_dir():
+        run_dir = Path(results_dir) / name
+        shutil.rmtree(run_dir, ignore_errors=True)
+        os.rename(staged_run, run_dir)
+    shutil.rmtree(staged, ignore_errors=True)
+    write_json_atomic(
+        done_dir / f"{name}.json",
+        {"run": name, "status": status, "worker": worker, "time": time.strftime("%Y-%m-%dT%H:%M:%S")},
+    )
+    claim_path.unlink(missing_ok=True)
+    return True
+
+
+def discard_claim(queue_dir, name, token):
+    """Drop a run that was not finished; the item goes back to the queue."""
+    _, claims_dir, _ = queue_paths(queue_dir)
+    shutil.rmtree(staging_dir(queue_dir, token), ignore_errors=True)
+    claim_path = claims_dir / f"{name}.claim"
+    if holds_claim(claim_path, token):
+        claim_path.unlink(missing_ok=True)
+
+
+def queue_status(queue_dir):
+    items_dir, claims_dir, done_dir = queue_paths(queue_dir)
+    items = {path.stem for path in items_dir.glob("*.json")}
+    done = {}
+    for path in done_dir.glob("*.json"):
+        try:
+            done[path.stem] = json.loads(path.read_text()).get("status")
+        except ValueError:
+            continue
+    claimed = {path.stem for path in claims_dir.glob("*.claim")} - set(done)
+    return items, claimed, done
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Show the state of a sweep work queue")
+    ap.add_argument("results_dir", help="results/experiments-... with a queue/ directory")
+    args = ap.parse_args()
+
+    queue_dir = Path(args.results_dir) / QUEUE_DIR_NAME
+    if not queue_dir.is_dir():
+        print(f"No work queue in {args.results_dir}", file=sys.stderr)
+        sys.exit(1)
+    items, claimed, done = queue_status(queue_dir)
+    _, claims_dir, _ = queue_paths(queue_dir)
+    now = shared_now(queue_dir)
+    print(f"items={len(items)} done={len(done)} running={len(claimed)} queued={len(items) - len(done) - len(claimed)}")
+    for name in sorted(claimed):
+        try:
+            claim = json.loads((claims_dir / f"{name}.claim").read_text())
+            age = now - (claims_dir / f"{name}.claim").stat().st_mtime
+        except (OSError, ValueError):
+            continue
+        print(f"  {name}: {claim.get('worker')} (lease renewed {int(age)}s ago)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+Benchmark the cooja_log scanners on real run logs.
+
+Reports lines/sec and MB/s, relative to the first row, for:
+  baseline   the original line-by-line experiment_summary.parse_log
+  text       cooja_log line-by-line decode of the whole log
+  mmap       bytes-level search for candidate lines
+  auto       the scanner pick_scanner() chooses for each log
+  parse_log  experiment_summary.parse_log end to end, without the event cache
+
+mmap only pays off when candidate lines are sparse; the density column
+shows the share of lines pick_scanner() samples as candidates.
+
+Usage: python3 tools/bench_log_scan.py results/experiments-*/*/logs/COOJA.testlog
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import cooja_log
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "scripts"))
+import experiment_summary
+
+# The kinds experiment_summary.parse_log asks for.
+SUMMARY_KINDS = ("TX", "RX", "DELAY", "ROUTING_WAIT")
+
+
+def baseline_parse_log(log_path):
+    """experiment_summary.parse_log as it was before cooja_log (TX/RX sets only)."""
+    tx = set()
+    rx = set()
+    delays = []
+    routing_timeout = False
+    routing_wait = False
+    with open(log_path, errors="ignore") as handle:
+        for line in handle:
+            line = line.strip()
+            if line.startswith("CSV,TX,"):
+                parts = line.split(",")
+                if len(parts) >= 4:
+                    try:
+                        tx.add((int(parts[2]), int(parts[3])))
+                    except ValueError:
+                        pass
+            elif line.startswith("CSV,RX,"):
+                parts = line.split(",")
+                if "node=1" in parts:
+                    try:
+                        node_index = parts.index("node=1")
+                        rx.add((parts[node_index + 1], int(parts[node_index + 2])))
+                    except (ValueError, IndexError):
+                        pass
+                elif len(parts) >= 4:
+                    try:
+                        rx.add((parts[2], int(parts[3])))
+                    except ValueError:
+                        pass
+            elif line.startswith("CSV,DELAY,"):
+                parts = line.split(",")
+                if len(parts) >= 3:
+                    try:
+                        delays.append(int(parts[2]))
+                    except ValueError:
+                        pass
+            elif "ROUTING_WAIT_TIMEOUT" in line:
+                routing_timeout = True
+            elif "ROUTING_WAIT joined=0 reachable=0" in line:
+                routing_wait = True
+    return len(tx), len(rx), delays, routing_timeout, routing_wait
+
+
+def count_lines(path):
+    lines = 0
+    with open(path, "rb") as handle:
+        for block in iter(lambda: handle.read(1 << 20), b""):
+            lines += block.count(b"\n")
+    return lines
+
+
+def best_of(repeat, func):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Benchmark Cooja log scanners")
+    ap.add_argument("logs", nargs="+", help="COOJA.testlog files")
+    ap.add_argument("--kinds", default=",".join(SUMMARY_KINDS),
+                    help="Comma-separated event kinds for the text/mmap runs (default: parse_log's)")
+    ap.add_argument("--repeat", type=int, default=3, help="Take the best of this many runs")
+    args = ap.parse_args()
+
+    kinds = tuple(kind for kind in args.kinds.split(",") if kind)
+    total_lines = sum(count_lines(path) for path in args.logs)
+    total_mb = sum(os.path.getsize(path) for path in args.logs) / 1e6
+
+    for path in args.logs:
+        if cooja_log.collect(path, kinds, "text") != cooja_log.collect(path, kinds, "mmap"):
+            print(f"[ERROR] text and mmap scanners disagree on {path}", file=sys.stderr)
+            sys.exit(1)
+
+    runs = [
+        ("baseline", lambda: [baseline_parse_log(path) for path in args.logs]),
+        ("text", lambda: [cooja_log.collect(path, kinds, "text") for path in args.logs]),
+        ("mmap", lambda: [cooja_log.collect(path, kinds, "mmap") for path in args.logs]),
+        ("auto", lambda: [cooja_log.collect(path, kinds, "auto") for path in args.logs]),
+        ("parse_log", lambda: [experiment_summary.parse_log(path, use_cache=False) for path in args.logs]),
+    ]
+    print(f"{len(args.logs)} log(s), {total_lines} lines, {total_mb:.1f} MB, kinds={','.join(kinds)}")
+    for path in args.logs:
+        print(f"  {path}: density {cooja_log.sample_density(path, kinds):.3f} -> {cooja_log.pick_scanner(path, kinds)}")
+    baseline = None
+    for name, func in runs:
+        elapsed = best_of(args.repeat, func)
+        baseline = baseline or elapsed
+        print(f"{name:10s} {elapsed:8.3f}s {total_lines / elapsed:12.0f} lines/s "
+              f"{total_mb / elapsed:8.1f} MB/s  x{baseline / elapsed:.2f}")
+
+
+if __name__ == "__main__":
+    main()
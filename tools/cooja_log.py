@@ -0,0 +1,428 @@
+#!/usr/bin/env python3
+"""
+Single-pass COOJA.testlog parser shared by the analysis tools.
+
+iter_events() scans a log once and yields (kind, event) pairs, where each
+event is a namedtuple carrying the 1-based line number and the simulation
+time in ms of the last CSV,SIMTIME marker (None before the first one).
+collect() gathers the requested kinds into lists in the same single pass.
+
+Only the requested kinds are built, so a summary that needs TX/RX/DELAY
+does not pay for tokenizing every FWD or DIO line. The mmap scanner only
+decodes lines containing a marker for those kinds (CSV,, ROUTING_WAIT, ...)
+and skips the Contiki LOG_INFO noise in between at the bytes level. That
+wins on noisy logs but loses to plain line-by-line decoding once roughly
+a fifth of the lines are candidates, so by default the scanner is picked
+from a sample of the log (see pick_scanner). tools/bench_log_scan.py
+compares the scanners.
+"""
+
+import ipaddress
+import mmap
+import os
+import re
+import sys
+from collections import namedtuple
+
+import seq_sets
+
+
+TX = namedtuple("TX", "line sim_ms node seq t0 joined")
+# node is the sender id derived from src; tagged is True for the
+# "CSV,RX,node=1,..." form printed by the root.
+RX = namedtuple("RX", "line sim_ms node seq src t_recv t0 length tagged")
+RTT = namedtuple("RTT", "line sim_ms seq t0 t_ack rtt length")
+DELAY = namedtuple("DELAY", "line sim_ms seq delay")
+FWD = namedtuple("FWD", "line sim_ms node fwd_total udp_to_root dropped")
+FWD_PKT = namedtuple("FWD_PKT", "line sim_ms node src seq failed")
+# parent is the parent's node id, or None when the node logged "none".
+PARENT = namedtuple("PARENT", "line sim_ms node parent ip")
+ROUTING = namedtuple("ROUTING", "line sim_ms node joined parent ip rank")
+DIO = namedtuple("DIO", "line sim_ms node src dio_rank self_rank")
+TRUST_IN = namedtuple("TRUST_IN", "line sim_ms self_id node trust")
+TRUST_SET = namedtuple("TRUST_SET", "line sim_ms self_id node trust")
+# Legacy in-mote trust line: CSV,TRUST,<node>,<seq>,<missed>,<trust>
+TRUST = namedtuple("TRUST", "line sim_ms node seq missed trust")
+BLACKLIST = namedtuple("BLACKLIST", "line sim_ms action node count")
+PKT_DROP = namedtuple("PKT_DROP", "line sim_ms direction node")
+# Trust update written to the motes by the ScriptRunner: index is the line of
+# trust_feedback.txt, sim_us/wall_ms the exact simulated and wall-clock time.
+INJECT = namedtuple("INJECT", "line sim_ms index node trust sim_us wall_ms")
+# Exact simulated/wall-clock time of the line before it (CSV,FWD, CSV,TRUST_IN).
+STAMP = namedtuple("STAMP", "line sim_ms sim_us wall_ms")
+# state is "wait", "timeout" or "ready".
+ROUTING_WAIT = namedtuple("ROUTING_WAIT", "line sim_ms state")
+# "[INFO: SENDER] TX id=<n> seq=<n>" / legacy "TX seq=<n>"; node may be None.
+TX_INFO = namedtuple("TX_INFO", "line sim_ms node seq")
+# Any line mentioning RPL control traffic (RPL:, DIO, DAO).
+CONTROL = namedtuple("CONTROL", "line sim_ms")
+SIMTIME = namedtuple("SIMTIME", "line sim_ms")
+FINISHED = namedtuple("FINISHED", "line sim_ms")
+
+KINDS = (
+    "TX", "RX", "RTT", "DELAY", "FWD", "FWD_PKT", "PARENT", "ROUTING", "DIO",
+    "TRUST_IN", "TRUST_SET", "TRUST", "BLACKLIST", "PKT_DROP", "INJECT", "STAMP", "ROUTING_WAIT",
+    "TX_INFO", "CONTROL", "SIMTIME", "FINISHED",
+)
+
+# pick_scanner(): candidate lines per log line above which decoding every
+# line beats searching the mmap for markers (tools/bench_log_scan.py puts
+# the crossover near 0.2), and how much of the log it samples.
+MMAP_MAX_DENSITY = 0.2
+SAMPLE_BYTES = 1 << 20
+
+TX_INFO_RE = re.compile(r"\bTX (?:id=(\d+) )?seq=(\d+)")
+GUI_ID_RE = re.compile(r"ID:(\d+)")
+
+
+def node_from_ip(text):
+    """Node id encoded in the last hextet of a mote address, or None."""
+    try:
+        return int(ipaddress.ip_address(text)) & 0xFFFF
+    except ValueError:
+        return None
+
+
+def _tx(n, t, p):
+    return TX(n, t, int(p[2]), int(p[3]), int(p[4]) if len(p) > 4 else None,
+              int(p[5]) if len(p) > 5 else None)
+
+
+def _rx(n, t, p):
+    tagged = p[2] == "node=1"
+    i = 3 if tagged else 2
+    src = p[i]
+    node = node_from_ip(src)
+    if node is None:
+        return None
+    rest = [int(v) for v in p[i + 2:i + 5]] + [None, None, None]
+    return RX(n, t, node, int(p[i + 1]), src, rest[0], rest[1], rest[2], tagged)
+
+
+def _rtt(n, t, p):
+    return RTT(n, t, int(p[2]), int(p[3]), int(p[4]), int(p[5]), int(p[6]) if len(p) > 6 else None)
+
+
+def _delay(n, t, p):
+    return DELAY(n, t, int(p[2]), int(p[3]))
+
+
+def _fwd(n, t, p):
+    return FWD(n, t, int(p[2]), int(p[3]), int(p[4]), int(p[5]))
+
+
+def _fwd_pkt(n, t, p):
+    return FWD_PKT(n, t, int(p[2]), int(p[3]), int(p[4]) if len(p) > 4 else None, p[1] == "FWD_PKT_FAIL")
+
+
+def _parent(n, t, p):
+    ip = p[3]
+    return PARENT(n, t, int(p[2]), None if ip == "none" else node_from_ip(ip), ip)
+
+
+def _routing(n, t, p):
+    ip = p[4]
+    return ROUTING(n, t, int(p[2]), int(p[3]), None if ip == "none" else node_from_ip(ip), ip, int(p[5]))
+
+
+def _dio(n, t, p):
+    return DIO(n, t, int(p[2]), int(p[3]), int(p[4]), int(p[5]))
+
+
+def _trust_in(n, t, p):
+    return TRUST_IN(n, t, int(p[2]), int(p[3]), int(p[4]))
+
+
+def _trust_set(n, t, p):
+    return TRUST_SET(n, t, int(p[2]), int(p[3]), int(p[4]))
+
+
+def _trust(n, t, p):
+    return TRUST(n, t, int(p[2]), int(p[3]), int(p[4]), int(p[5]))
+
+
+def _blacklist(n, t, p):
+    return BLACKLIST(n, t, p[1][len("BLACKLIST_"):], int(p[2]), int(p[3]))
+
+
+def _pkt_drop(n, t, p):
+    return PKT_DROP(n, t, p[1][len("PKT_DROP_"):], int(p[2]))
+
+
+def _inject(n, t, p):
+    return INJECT(n, t, int(p[2]), int(p[3]), int(p[4]), int(p[5]), int(p[6]))
+
+
+def _stamp(n, t, p):
+    return STAMP(n, t, int(p[2]), int(p[3]))
+
+
+# CSV tag -> (kind, builder). Builders may raise on malformed lines.
+CSV_PARSERS = {
+    "TX": ("TX", _tx),
+    "RX": ("RX", _rx),
+    "RTT": ("RTT", _rtt),
+    "DELAY": ("DELAY", _delay),
+    "FWD": ("FWD", _fwd),
+    "FWD_PKT": ("FWD_PKT", _fwd_pkt),
+    "FWD_PKT_FAIL": ("FWD_PKT", _fwd_pkt),
+    "PARENT": ("PARENT", _parent),
+    "ROUTING": ("ROUTING", _routing),
+    "DIO": ("DIO", _dio),
+    "TRUST_IN": ("TRUST_IN", _trust_in),
+    "TRUST_SET": ("TRUST_SET", _trust_set),
+    "TRUST": ("TRUST", _trust),
+    "BLACKLIST_ADD": ("BLACKLIST", _blacklist),
+    "BLACKLIST_REMOVE": ("BLACKLIST", _blacklist),
+    "PKT_DROP_DEST": ("PKT_DROP", _pkt_drop),
+    "PKT_DROP_SRC": ("PKT_DROP", _pkt_drop),
+    "INJECT": ("INJECT", _inject),
+    "STAMP": ("STAMP", _stamp),
+}
+
+
+def _wanted(kinds):
+    wanted = set(KINDS if kinds is None else kinds)
+    unknown = wanted - set(KINDS)
+    if unknown:
+        raise ValueError(f"unknown event kinds: {sorted(unknown)}")
+    return wanted
+
+
+def parse_lines(records, kinds=None, sim_ms=None):
+    """Turn (line_no, text) records into (kind, event) pairs.
+
+    records may skip lines that cannot produce a requested event (the mmap
+    scanner does); line numbers must still be those of the original log.
+    sim_ms is the simulation time in effect before the first record, for
+    callers resuming in the middle of a log.
+    """
+    wanted = _wanted(kinds)
+    csv_parsers = {tag: entry for tag, entry in CSV_PARSERS.items() if entry[0] in wanted}
+    want_wait = "ROUTING_WAIT" in wanted
+    want_info = "TX_INFO" in wanted
+    want_control = "CONTROL" in wanted
+    want_simtime = "SIMTIME" in wanted
+    want_finished = "FINISHED" in wanted
+
+    for line_no, line in records:
+        if want_control and ("RPL:" in line or "DIO" in line or "DAO" in line):
+            yield "CONTROL", CONTROL(line_no, sim_ms)
+        start = line.find("CSV,")
+        if start >= 0:
+            parts = line[start:].rstrip().split(",")
+            tag = parts[1] if len(parts) > 1 else ""
+            if tag == "SIMTIME":
+                try:
+                    sim_ms = int(parts[2])
+                except (ValueError, IndexError):
+                    continue
+                if want_simtime:
+                    yield "SIMTIME", SIMTIME(line_no, sim_ms)
+                continue
+            entry = csv_parsers.get(tag)
+            if entry is None:
+                continue
+            kind, build = entry
+            try:
+                event = build(line_no, sim_ms, parts)
+            except (ValueError, IndexError):
+                continue
+            if event is not None:
+                yield kind, event
+            continue
+        if want_wait and "ROUTING_" in line:
+            if "ROUTING_WAIT_TIMEOUT" in line:
+                yield "ROUTING_WAIT", ROUTING_WAIT(line_no, sim_ms, "timeout")
+            elif "ROUTING_WAIT joined=0 reachable=0" in line:
+                yield "ROUTING_WAIT", ROUTING_WAIT(line_no, sim_ms, "wait")
+            elif "ROUTING_READY" in line:
+                yield "ROUTING_WAIT", ROUTING_WAIT(line_no, sim_ms, "ready")
+        elif want_info and "TX " in line and "seq=" in line:
+            match = TX_INFO_RE.search(line)
+            if match:
+                node = match.group(1)
+                if node is None:
+                    gui = GUI_ID_RE.search(line)
+                    node = gui.group(1) if gui else None
+                yield "TX_INFO", TX_INFO(line_no, sim_ms, int(node) if node else None, int(match.group(2)))
+        elif want_finished and ("SIMULATION_FINISHED" in line or line.startswith("TEST OK")):
+            yield "FINISHED", FINISHED(line_no, sim_ms)
+
+
+def text_records(path):
+    with open(path, errors="ignore") as handle:
+        yield from enumerate(handle, 1)
+
+
+def candidate_markers(kinds=None):
+    """Byte strings found in every line that can yield one of kinds.
+
+    b"CSV," is always included because CSV,SIMTIME drives sim_ms. The
+    markers may over-select; parse_lines() applies the exact checks.
+    """
+    wanted = _wanted(kinds)
+    markers = [b"CSV,"]
+    if "ROUTING_WAIT" in wanted:
+        markers += [b"ROUTING_WAIT", b"ROUTING_READY"]
+    if "TX_INFO" in wanted:
+        markers.append(b"TX ")
+    if "CONTROL" in wanted:
+        markers += [b"RPL:", b"DIO", b"DAO"]
+    if "FINISHED" in wanted:
+        markers += [b"SIMULATION_FINISHED", b"TEST OK"]
+    return markers
+
+
+def sample_density(path, kinds=None):
+    """Candidate marker hits per line in SAMPLE_BYTES from the middle of path.
+
+    The middle skips the boot output, which is denser in noise than the run.
+    """
+    markers = candidate_markers(kinds)
+    with open(path, "rb") as handle:
+        size = os.fstat(handle.fileno()).st_size
+        handle.seek(max(0, size // 2 - SAMPLE_BYTES // 2))
+        sample = handle.read(SAMPLE_BYTES)
+    lines = sample.count(b"\n")
+    return sum(sample.count(marker) for marker in markers) / lines if lines else 0.0
+
+
+def pick_scanner(path, kinds=None):
+    """"mmap" when candidate lines are sparse in path, else "text".
+
+    Pipes and other non-regular files always get "text".
+    """
+    if not os.path.isfile(path):
+        return "text"
+    return "text" if sample_density(path, kinds) > MMAP_MAX_DENSITY else "mmap"
+
+
+def mmap_batches(path, kinds=None, batch_size=4096, start=0, end=None, first_line=1):
+    """Yield lists of (line_no, text) for candidate lines only.
+
+    The log is memory-mapped and searched at the bytes level for each
+    marker; noise lines are never decoded, only counted to keep line
+    numbers right. start/end limit the scan to a byte range; start must be
+    at a line start, which is numbered first_line.
+    """
+    others = candidate_markers(kinds)[1:]
+    with open(path, "rb") as handle:
+        try:
+            mm = mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            # Empty file: nothing to map.
+            return
+        with mm:
+            size = len(mm) if end is None else min(end, len(mm))
+
+            def next_at(marker, pos):
+                hit = mm.find(marker, pos, size)
+                return size if hit < 0 else hit
+
+            # CSV lines dominate the hits; the rarer markers keep their next
+            # position cached and are only searched again once passed.
+            csv_at = next_at(b"CSV,", start)
+            upcoming = {marker: next_at(marker, start) for marker in others}
+            other_at = min(upcoming.values(), default=size)
+            pos = start
+            line_no = first_line
+            counted = start
+            batch = []
+            while True:
+                hit = csv_at if csv_at < other_at else other_at
+                if hit >= size:
+                    break
+                # pos is always at a line start, so the line begins there or
+                # just after the last newline before the hit.
+                line_start = pos if hit == pos else mm.rfind(b"\n", pos, hit) + 1 or pos
+                stop = mm.find(b"\n", hit, size)
+                if stop < 0:
+                    stop = size
+                if line_start != counted:
+                    line_no += mm[counted:line_start].count(b"\n")
+                    counted = line_start
+                batch.append((line_no, mm[line_start:stop].decode("utf-8", "ignore")))
+                if len(batch) >= batch_size:
+                    yield batch
+                    batch = []
+                if stop >= size:
+                    break
+                pos = stop + 1
+                if csv_at < pos:
+                    csv_at = next_at(b"CSV,", pos)
+                if other_at < pos:
+                    for marker, at in upcoming.items():
+                        if at < pos:
+                            upcoming[marker] = next_at(marker, pos)
+                    other_at = min(upcoming.values())
+            if batch:
+                yield batch
+
+
+def mmap_records(path, kinds=None, start=0, end=None, first_line=1):
+    for batch in mmap_batches(path, kinds, start=start, end=end, first_line=first_line):
+        yield from batch
+
+
+def iter_events(path, kinds=None, scanner="auto", start=0, end=None, first_line=1, sim_ms=None):
+    """Yield (kind, event) for every recognised line of a Cooja log.
+
+    kinds restricts the output (and the parsing work) to a subset of KINDS.
+    scanner="mmap" skips non-candidate lines at the bytes level; "text"
+    decodes every line and also works on pipes; "auto" picks one per log
+    (see pick_scanner). start/end/first_line/sim_ms resume the mmap scanner
+    in the middle of a log (see mmap_batches). Malformed lines are skipped.
+    """
+    if scanner == "auto":
+        scanner = "mmap" if start or end is not None else pick_scanner(path, kinds)
+    if scanner == "mmap" and os.path.isfile(path):
+        records = mmap_records(path, kinds, start, end, first_line)
+    elif start or end is not None:
+        raise ValueError("byte ranges need the mmap scanner and a regular file")
+    else:
+        records = text_records(path)
+    return parse_lines(records, kinds, sim_ms)
+
+
+def collect(path, kinds, scanner="auto"):
+    """Read a log once and return {kind: [events]} for each requested kind."""
+    out = {kind: [] for kind in kinds}
+    for kind, event in iter_events(path, kinds, scanner):
+        out[kind].append(event)
+    return out
+
+
+def root_rx(rx_events):
+    """RX events counted as delivered: only root-tagged ones when any exist."""
+    if any(event.tagged for event in rx_events):
+        return [event for event in rx_events if event.tagged]
+    return list(rx_events)
+
+
+def delivery_sets(log):
+    """Per-node TX and delivered-RX seq sets (see seq_sets) from collected
+    TX/TX_INFO/RX lists.
+
+    Legacy TX_INFO lines without a node id are credited to the first node
+    seen at the root, matching the old single-sender logs.
+    """
+    return seq_sets.account(
+        (kind, event) for kind in ("TX", "TX_INFO", "RX") for event in log.get(kind, ())
+    )
+
+
+def main():
+    if len(sys.argv) < 2:
+        print("Usage: python3 tools/cooja_log.py <COOJA.testlog> [KIND ...]")
+        sys.exit(1)
+    kinds = sys.argv[2:] or KINDS
+    counts = {kind: 0 for kind in kinds}
+    for kind, _ in iter_events(sys.argv[1], kinds):
+        counts[kind] += 1
+    for kind in kinds:
+        print(f"{kind:13s} {counts[kind]}")
+
+
+if __name__ == "__main__":
+    main()
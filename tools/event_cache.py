@@ -0,0 +1,432 @@
+#!/usr/bin/env python3
+"""
+Columnar sidecar cache of parsed Cooja log events.
+
+Parsing logs/COOJA.testlog stores the requested event kinds next to it as
+logs/COOJA.events: one packed column per event field (int64 for numbers,
+int8 for flags, one JSON value per line for strings) followed by a JSON
+header. A kind is parsed and added to the sidecar the first time it is
+asked for, so a one-shot summary pays for its own kinds only. Later reads
+stream the columns back in fixed-size chunks instead of re-parsing the
+text log, and can skip fields they do not use.
+
+The header also records where parsing stopped: the byte offset after the
+last complete line, the line count and sim time at that point, the log's
+device/inode, and hashes of the first block and of the block ending at
+the offset. When the log has only grown since (a run still in flight),
+the next call parses just the appended bytes and extends the cache. A
+trailing line without its newline is parsed on every call but never
+cached. A truncated, rotated or rewritten log, or a cache written by a
+different parser (see parser_stamp), is rebuilt from scratch.
+"""
+
+import argparse
+import hashlib
+import heapq
+import json
+import os
+import sys
+from array import array
+from functools import lru_cache
+from itertools import repeat
+
+import cooja_log
+
+
+CACHE_MAGIC = b"COOJA-EVENTS\n"
+# Bump when the on-disk layout changes; parser edits are caught by parser_stamp().
+CACHE_VERSION = 3
+NONE_INT = -(1 << 63)
+SAMPLE_BYTES = 1 << 16
+# Values per column read at a time when streaming events back.
+READ_VALUES = 1 << 13
+
+
+def cache_path(log_path):
+    return os.path.splitext(log_path)[0] + ".events"
+
+
+@lru_cache(maxsize=None)
+def parser_stamp():
+    with open(cooja_log.__file__, "rb") as handle:
+        parser_digest = hashlib.sha256(handle.read()).hexdigest()[:16]
+    return f"{CACHE_VERSION}:{parser_digest}"
+
+
+def block_hash(handle, start, stop):
+    handle.seek(start)
+    return hashlib.blake2b(handle.read(stop - start), digest_size=16).hexdigest()
+
+
+def complete_end(handle, size):
+    """Offset just past the last newline before size (0 if there is none)."""
+    pos = size
+    while pos > 0:
+        start = max(0, pos - SAMPLE_BYTES)
+        handle.seek(start)
+        newline = handle.read(pos - start).rfind(b"\n")
+        if newline >= 0:
+            return start + newline + 1
+        pos = start
+    return 0
+
+
+def count_newlines(handle, start, stop):
+    handle.seek(start)
+    lines = 0
+    while start < stop:
+        block = handle.read(min(1 << 20, stop - start))
+        if not block:
+            break
+        lines += block.count(b"\n")
+        start += len(block)
+    return lines
+
+
+def log_state(handle, st, offset, lines, sim_ms):
+    return {
+        "dev": st.st_dev,
+        "ino": st.st_ino,
+        "size": st.st_size,
+        "mtime_ns": st.st_mtime_ns,
+        "offset": offset,
+        "lines": lines,
+        "sim_ms": sim_ms,
+        "head": block_hash(handle, 0, min(offset, SAMPLE_BYTES)),
+        "tail": block_hash(handle, max(0, offset - SAMPLE_BYTES), offset),
+    }
+
+
+def resumable(state, handle, st):
+    """True when the log still starts with the bytes the cache was built from."""
+    offset = state["offset"]
+    if (state["dev"], state["ino"]) != (st.st_dev, st.st_ino) or st.st_size < offset:
+        # Rotated (new inode) or truncated.
+        return False
+    if st.st_size == state["size"] and st.st_mtime_ns != state["mtime_ns"]:
+        # Same length but touched: rewritten in place.
+        return False
+    return (
+        state["head"] == block_hash(handle, 0, min(offset, SAMPLE_BYTES))
+        and state["tail"] == block_hash(handle, max(0, offset - SAMPLE_BYTES), offset)
+    )
+
+
+def new_column():
+    """[kind, values]: kind is fixed by the first value added."""
+    return [None, None]
+
+
+def column_add(column, value):
+    kind = column[0]
+    if kind == "int":
+        if value is None:
+            column[1].append(NONE_INT)
+            return
+        if type(value) is int and NONE_INT < value < -NONE_INT:
+            column[1].append(value)
+            return
+    elif kind == "bool":
+        if type(value) is bool:
+            column[1].append(value)
+            return
+    elif kind == "json":
+        # Node addresses repeat on every line; keep one copy of each.
+        column[1].append(sys.intern(value) if type(value) is str else value)
+        return
+    else:
+        if type(value) is bool:
+            column[:] = ["bool", array("b")]
+        elif value is None or type(value) is int:
+            column[:] = ["int", array("q")]
+        else:
+            column[:] = ["json", []]
+        column_add(column, value)
+        return
+    # A value the packed column cannot hold: keep the column as JSON.
+    column[:] = ["json", column_values(column[0], column[1])]
+    column_add(column, value)
+
+
+def column_values(kind, data):
+    if kind == "bool":
+        return [bool(value) for value in data]
+    if kind == "int":
+        values = data.tolist()
+        return [None if value == NONE_INT else value for value in values] if NONE_INT in values else values
+    return list(data)
+
+
+def write_values(out, kind, data):
+    if kind == "json":
+        for value in data:
+            out.write(json.dumps(value).encode() + b"\n")
+    elif data:
+        data.tofile(out)
+
+
+def parse_columns(log_path, kinds, start, end, first_line, sim_ms):
+    """({kind: [count, columns]}, sim time at end) for log bytes [start, end)."""
+    parsed = {kind: [0, [new_column() for _ in getattr(cooja_log, kind)._fields]] for kind in kinds}
+    for kind, event in cooja_log.iter_events(
+        log_path, tuple(kinds) + ("SIMTIME",), start=start, end=end, first_line=first_line, sim_ms=sim_ms
+    ):
+        if kind == "SIMTIME":
+            sim_ms = event.sim_ms
+        entry = parsed.get(kind)
+        if entry is not None:
+            entry[0] += 1
+            for column, value in zip(entry[1], event):
+                column_add(column, value)
+    return parsed, sim_ms
+
+
+def read_column(handle, spec, count):
+    """Lists of up to READ_VALUES values of one cached column, in order."""
+    kind, start, length = spec
+    stop = start + length
+    if kind == "json":
+        pending = []
+        rest = b""
+        while count > 0:
+            while len(pending) < min(READ_VALUES, count) and start < stop:
+                handle.seek(start)
+                block = handle.read(min(SAMPLE_BYTES, stop - start))
+                if not block:
+                    break
+                start += len(block)
+                lines = (rest + block).split(b"\n")
+                rest = lines.pop()
+                pending += lines
+            chunk = pending[:READ_VALUES]
+            if not chunk:
+                raise ValueError("truncated event cache")
+            del pending[:READ_VALUES]
+            count -= len(chunk)
+            yield [json.loads(line) for line in chunk]
+        return
+    code, size = ("b", 1) if kind == "bool" else ("q", 8)
+    while count > 0:
+        want = min(READ_VALUES, count)
+        handle.seek(start)
+        block = handle.read(want * size)
+        if len(block) != want * size or start + len(block) > stop:
+            raise ValueError("truncated event cache")
+        start += len(block)
+        count -= want
+        yield column_values(kind, array(code, block))
+
+
+def cached_events(handle, header, kind, fields):
+    """(kind, event) pairs of one cached kind; fields not in fields are None."""
+    entry = header["kinds"][kind]
+    event_type = getattr(cooja_log, kind)
+    readers = []
+    for name in event_type._fields[1:]:
+        if fields is None or name in fields:
+            readers.append(read_column(handle, entry["fields"][name], entry["count"]))
+        else:
+            readers.append(None)
+    for lines in read_column(handle, entry["fields"]["line"], entry["count"]):
+        columns = [lines] + [repeat(None, len(lines)) if reader is None else next(reader) for reader in readers]
+        for event in map(event_type._make, zip(*columns)):
+            yield kind, event
+
+
+def open_cache(log_path):
+    """(handle, header) of a readable cache written by this parser, or None."""
+    try:
+        handle = open(cache_path(log_path), "rb")
+    except OSError:
+        return None
+    try:
+        if handle.read(len(CACHE_MAGIC)) == CACHE_MAGIC:
+            handle.seek(int.from_bytes(handle.read(8), "little"))
+            header = json.loads(handle.read())
+            if header.get("stamp") == parser_stamp() and header.get("byteorder") == sys.byteorder:
+                return handle, header
+    except (OSError, ValueError):
+        pass
+    handle.close()
+    return None
+
+
+def write_cache(log_path, old, parsed, extra, state):
+    """Write old's columns followed by the rows in parsed.
+
+    old is the (handle, header) being extended or None; extra holds the
+    rows of kinds not in old that were parsed from its part of the log.
+    Returns False when the cache could not be written.
+    """
+    kinds = set(parsed) | set(extra) | (set(old[1]["kinds"]) if old else set())
+    layout = {}
+    path = cache_path(log_path)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(tmp_path, "wb") as out:
+            out.write(CACHE_MAGIC)
+            out.write(bytes(8))
+            for kind in cooja_log.KINDS:
+                if kind not in kinds:
+                    continue
+                parts = []
+                if old and kind in old[1]["kinds"]:
+                    entry = old[1]["kinds"][kind]
+                    parts.append(("cache", entry["count"], entry["fields"]))
+                for rows in (extra, parsed):
+                    if kind in rows:
+                        parts.append(("parsed", rows[kind][0], rows[kind][1]))
+                parts = [part for part in parts if part[1]]
+                fields = {}
+                for index, name in enumerate(getattr(cooja_log, kind)._fields):
+                    start = out.tell()
+                    fields[name] = [write_field(out, old, parts, index, name), start, out.tell() - start]
+                layout[kind] = {"count": sum(part[1] for part in parts), "fields": fields}
+            header_at = out.tell()
+            out.write(json.dumps(
+                {"stamp": parser_stamp(), "log": state, "byteorder": sys.byteorder, "kinds": layout},
+                sort_keys=True,
+            ).encode())
+            out.seek(len(CACHE_MAGIC))
+            out.write(header_at.to_bytes(8, "little"))
+        os.replace(tmp_path, path)
+    except OSError as exc:
+        # Read-only result trees still get parsed, just not cached.
+        print(f"[WARN] could not write event cache {path}: {exc}", file=sys.stderr)
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        return False
+    return True
+
+
+def write_field(out, old, parts, index, name):
+    """Append one field of every part to out; returns the column kind."""
+    kinds = {part[2][name][0] if part[0] == "cache" else part[2][index][0] for part in parts}
+    kind = kinds.pop() if len(kinds) == 1 else "json"
+    for source, count, columns in parts:
+        if source == "parsed":
+            column_kind, data = columns[index]
+            write_values(out, kind, data if column_kind == kind else column_values(column_kind, data))
+        elif columns[name][0] == kind:
+            # Same encoding: copy the bytes as they are.
+            _, start, length = columns[name]
+            while length > 0:
+                old[0].seek(start)
+                block = old[0].read(min(1 << 20, length))
+                if not block:
+                    raise OSError("truncated event cache")
+                out.write(block)
+                start += len(block)
+                length -= len(block)
+        else:
+            for values in read_column(old[0], columns[name], count):
+                write_values(out, kind, values)
+    return kind
+
+
+def iter_events(log_path, kinds, use_cache=True, fields=None):
+    """cooja_log.iter_events() backed by the sidecar cache.
+
+    Yields (kind, event) in log order without holding the events in
+    memory. On a miss the requested kinds are parsed and cached as they
+    stream past; kinds not cached yet are parsed once and added, and a log
+    that grew is only parsed from where the cache stopped. fields limits
+    the columns read from the cache: the others are None in the events
+    (events parsed from the log carry every field).
+    """
+    if not use_cache:
+        yield from cooja_log.iter_events(log_path, kinds)
+        return
+    wanted = set(kinds)
+    unknown = wanted - set(cooja_log.KINDS)
+    if unknown:
+        raise ValueError(f"unknown event kinds: {sorted(unknown)}")
+    # CONTROL shares lines with CSV events and comes first, as when parsing.
+    kinds = sorted((kind for kind in cooja_log.KINDS if kind in wanted), key=lambda kind: kind != "CONTROL")
+
+    with open(log_path, "rb") as handle:
+        st = os.fstat(handle.fileno())
+        end = complete_end(handle, st.st_size)
+        cache = open_cache(log_path)
+        try:
+            if cache is not None and not resumable(cache[1]["log"], handle, st):
+                cache[0].close()
+                cache = None
+            if cache is None:
+                # Miss: build the columns while the events stream past.
+                parsed = {kind: [0, [new_column() for _ in getattr(cooja_log, kind)._fields]] for kind in kinds}
+                sim_ms = None
+                for kind, event in cooja_log.iter_events(log_path, tuple(kinds) + ("SIMTIME",), end=end):
+                    if kind == "SIMTIME":
+                        sim_ms = event.sim_ms
+                        if "SIMTIME" not in wanted:
+                            continue
+                    entry = parsed[kind]
+                    entry[0] += 1
+                    for column, value in zip(entry[1], event):
+                        column_add(column, value)
+                    yield kind, event
+                state = log_state(handle, st, end, count_newlines(handle, 0, end), sim_ms)
+                write_cache(log_path, None, parsed, {}, state)
+            else:
+                state = cache[1]["log"]
+                missing = [kind for kind in kinds if kind not in cache[1]["kinds"]]
+                if missing or state["offset"] < end:
+                    offset = state["offset"]
+                    extra, _ = parse_columns(log_path, missing, 0, offset, 1, None) if missing else ({}, None)
+                    parsed, sim_ms = parse_columns(
+                        log_path, set(cache[1]["kinds"]) | set(kinds), offset, end, state["lines"] + 1, state["sim_ms"]
+                    )
+                    state = log_state(
+                        handle, st, end, state["lines"] + count_newlines(handle, offset, end), sim_ms
+                    )
+                    written = write_cache(log_path, cache, parsed, extra, state)
+                    cache[0].close()
+                    cache = open_cache(log_path) if written else None
+                if cache is None:
+                    yield from cooja_log.iter_events(log_path, kinds, end=end)
+                else:
+                    yield from heapq.merge(
+                        *(cached_events(cache[0], cache[1], kind, fields) for kind in kinds),
+                        key=lambda pair: pair[1].line,
+                    )
+        finally:
+            if cache is not None:
+                cache[0].close()
+
+        if end < st.st_size:
+            # Line still being written: parse it for this answer only.
+            yield from cooja_log.iter_events(
+                log_path, kinds, start=end, end=st.st_size, first_line=state["lines"] + 1, sim_ms=state["sim_ms"]
+            )
+
+
+def collect(log_path, kinds, use_cache=True):
+    """cooja_log.collect() backed by the sidecar cache (see iter_events)."""
+    out = {kind: [] for kind in kinds}
+    for kind, event in iter_events(log_path, kinds, use_cache):
+        out[kind].append(event)
+    return out
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Build or remove event caches for run logs")
+    ap.add_argument("logs", nargs="+", help="COOJA.testlog files")
+    ap.add_argument("--clear", action="store_true", help="Delete the caches instead of building them")
+    args = ap.parse_args()
+
+    for log_path in args.logs:
+        if args.clear:
+            try:
+                os.unlink(cache_path(log_path))
+            except FileNotFoundError:
+                pass
+            continue
+        events = sum(1 for _ in iter_events(log_path, cooja_log.KINDS))
+        print(f"{cache_path(log_path)} {events} events")
+
+
+if __name__ == "__main__":
+    main()
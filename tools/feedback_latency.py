@@ -0,0 +1,300 @@
+#!/usr/bin/env python3
+"""
+End-to-end latency of the trust feedback loop, per trust update.
+
+One update travels: mote prints CSV,FWD -> trust_engine --follow reads it
+and appends TRUST,<node>,<trust> to trust_feedback.txt -> the ScriptRunner
+polls the file and writes the command to every mote (CSV,INJECT) -> motes
+print CSV,TRUST_SET. The timestamps come from:
+
+  CSV,STAMP,<sim_us>,<wall_ms>   logged by the ScriptRunner after each
+                                 CSV,FWD and CSV,TRUST_SET line
+  feedback_timing.csv            trust_engine --latency-out: wall clock at
+                                 which each FWD line was read and its TRUST
+                                 line written
+  CSV,INJECT,<index>,...         sim and wall time of the injection
+
+The k-th update of the engine is the k-th CSV,FWD whose udp_to_root grew
+and the k-th line of trust_feedback.txt (the INJECT index). Stages:
+
+  engine_read_ms       wall   FWD logged -> read by trust_engine (poll lag)
+  engine_write_ms      wall   FWD read -> TRUST line written
+  inject_wait_ms       wall   TRUST line written -> injected (ScriptRunner poll)
+  fwd_to_inject_ms     wall   FWD logged -> injected
+  fwd_to_inject_sim_ms sim    the same in simulated time
+  delivery_sim_ms      sim    injected -> last mote printed CSV,TRUST_SET
+  end_to_end_sim_ms    sim    FWD logged -> last mote printed CSV,TRUST_SET
+
+Simulated-time stages grow with the simulation speed-up for the same wall
+clock lag, which is what limits detection at higher speeds; the report
+carries the measured speed (sim ms per wall ms) next to them.
+
+Each run gets <run_dir>/feedback_latency.json with a latency_sketch per
+stage; --report merges them into one CSV row per run plus an "all" row.
+
+Usage:
+  python3 tools/feedback_latency.py results/experiments-*/ --report feedback_latency_report.csv
+"""
+
+import argparse
+import csv
+import json
+import os
+import sys
+from pathlib import Path
+
+import event_cache
+import latency_sketch
+
+
+TIMING_NAME = "feedback_timing.csv"
+OUTPUT_NAME = "feedback_latency.json"
+STAGES = (
+    "engine_read_ms",
+    "engine_write_ms",
+    "inject_wait_ms",
+    "fwd_to_inject_ms",
+    "fwd_to_inject_sim_ms",
+    "delivery_sim_ms",
+    "end_to_end_sim_ms",
+)
+# TRUST_SET (one line per mote per update) is streamed by receipts() instead.
+KINDS = ("FWD", "INJECT", "STAMP", "FINISHED")
+
+
+def find_runs(paths):
+    """Run directories (containing logs/COOJA.testlog) under the given paths."""
+    runs = []
+    for path in paths:
+        path = Path(path)
+        if (path / "logs" / "COOJA.testlog").is_file():
+            runs.append(path)
+            continue
+        for log_path in sorted(path.rglob("logs/COOJA.testlog")):
+            runs.append(log_path.parent.parent)
+    return sorted(set(runs))
+
+
+def read_timing(path):
+    """{update: (node, read_wall_ms, write_wall_ms)} from trust_engine --latency-out."""
+    timing = {}
+    try:
+        with open(path, errors="ignore") as handle:
+            for row in csv.DictReader(handle):
+                try:
+                    timing[int(row["update"])] = (
+                        int(row["node_id"]), float(row["read_wall_ms"]), float(row["write_wall_ms"])
+                    )
+                except (KeyError, TypeError, ValueError):
+                    continue
+    except OSError:
+        pass
+    return timing
+
+
+def emitted_fwd(fwd_events, stop):
+    """CSV,FWD events that make trust_engine write a TRUST line, in order."""
+    last = {}
+    emitted = []
+    for event in fwd_events:
+        if event.line > stop:
+            break
+        previous = last.get(event.node, 0)
+        last[event.node] = event.udp_to_root
+        if event.udp_to_root > previous:
+            emitted.append(event)
+    return emitted
+
+
+def receipts(log_path, stamps):
+    """{inject index: (motes, last TRUST_SET sim_ms)} of the CSV,TRUST_SET lines
+    that echo each injection before the next injection for the same node.
+
+    Every mote that applies an injected value prints CSV,TRUST_SET
+    (brpl-trust.c); CSV,TRUST_IN comes from the attacker only, so it would
+    time the attacker's receipt rather than the last mote's. Streams
+    INJECT/TRUST_SET from the log; stamps maps a line number to the
+    CSV,STAMP logged right after it.
+    """
+    pending = {}
+    out = {}
+    for kind, event in event_cache.iter_events(log_path, ("INJECT", "TRUST_SET")):
+        if kind == "INJECT":
+            pending[event.node] = event
+            out[event.index] = (set(), None)
+            continue
+        inject = pending.get(event.node)
+        if inject is None or inject.trust != event.trust:
+            continue
+        stamp = stamps.get(event.line)
+        at_ms = stamp.sim_us / 1000.0 if stamp is not None else event.sim_ms
+        motes, last_ms = out[inject.index]
+        motes.add(event.self_id)
+        if at_ms is not None and (last_ms is None or at_ms > last_ms):
+            last_ms = at_ms
+        out[inject.index] = (motes, last_ms)
+    return out
+
+
+def update_rows(run_dir):
+    """One dict per trust update with the stage latencies that could be measured."""
+    log_path = str(run_dir / "logs" / "COOJA.testlog")
+    log = event_cache.collect(log_path, KINDS)
+    stop = log["FINISHED"][0].line if log["FINISHED"] else float("inf")
+    stamps = {stamp.line - 1: stamp for stamp in log["STAMP"]}
+    timing = read_timing(run_dir / TIMING_NAME)
+    injects = {event.index: event for event in log["INJECT"]}
+    received = receipts(log_path, stamps)
+
+    rows = []
+    for index, fwd in enumerate(emitted_fwd(log["FWD"], stop)):
+        row = {"update": index, "node": fwd.node, "fwd_line": fwd.line}
+        stamp = stamps.get(fwd.line)
+        fwd_sim = stamp.sim_us / 1000.0 if stamp is not None else None
+        fwd_wall = stamp.wall_ms if stamp is not None else None
+        engine = timing.get(index)
+        if engine is not None and engine[0] != fwd.node:
+            # The engine did not read this log from its first line.
+            engine = None
+        inject = injects.get(index)
+        if inject is not None and inject.node != fwd.node:
+            inject = None
+        motes, trust_in_ms = received.get(index, ((), None))
+        inject_sim = inject.sim_us / 1000.0 if inject is not None else None
+        row.update(
+            injected=int(inject is not None),
+            motes=len(motes),
+            engine_read_ms=engine[1] - fwd_wall if engine and fwd_wall is not None else None,
+            engine_write_ms=engine[2] - engine[1] if engine else None,
+            inject_wait_ms=inject.wall_ms - engine[2] if engine and inject else None,
+            fwd_to_inject_ms=inject.wall_ms - fwd_wall if inject and fwd_wall is not None else None,
+            fwd_to_inject_sim_ms=inject_sim - fwd_sim if inject and fwd_sim is not None else None,
+            delivery_sim_ms=trust_in_ms - inject_sim if inject and trust_in_ms is not None else None,
+            end_to_end_sim_ms=trust_in_ms - fwd_sim if trust_in_ms is not None and fwd_sim is not None else None,
+        )
+        for stage in STAGES:
+            if row[stage] is not None:
+                row[stage] = round(row[stage], 3)
+        rows.append(row)
+    return rows, sim_speed(log["STAMP"])
+
+
+def sim_speed(stamps):
+    """Simulated ms per wall-clock ms over the stamped part of the run."""
+    if len(stamps) < 2:
+        return None
+    wall = stamps[-1].wall_ms - stamps[0].wall_ms
+    if wall <= 0:
+        return None
+    return (stamps[-1].sim_us - stamps[0].sim_us) / 1000.0 / wall
+
+
+def analyze_run(run_dir, write=True):
+    """Per-stage sketches of one run; stored as <run_dir>/feedback_latency.json."""
+    rows, speed = update_rows(run_dir)
+    stages = {stage: latency_sketch.sketch() for stage in STAGES}
+    for row in rows:
+        for stage in STAGES:
+            if row[stage] is not None:
+                latency_sketch.sketch_add(stages[stage], row[stage])
+    result = {
+        "updates": len(rows),
+        "injected": sum(row["injected"] for row in rows),
+        "delivered": sum(1 for row in rows if row["motes"]),
+        "sim_speed": speed,
+        "stages": stages,
+    }
+    if write:
+        path = run_dir / OUTPUT_NAME
+        payload = {**result, "stages": {stage: latency_sketch.to_json(s) for stage, s in stages.items()}}
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp_path, "w") as handle:
+                json.dump(payload, handle, sort_keys=True)
+            os.replace(tmp_path, path)
+        except OSError as exc:
+            print(f"[WARN] could not write {path}: {exc}", file=sys.stderr)
+            try:
+                os.unlink(tmp_path)
+            except OSError:
+                pass
+    return result, rows
+
+
+def report_fields():
+    fields = ["run", "updates", "injected", "delivered", "sim_speed"]
+    for stage in STAGES:
+        name = stage[:-len("_ms")]
+        fields += [f"{name}_p50_ms", f"{name}_p95_ms", f"{name}_p99_ms", f"{name}_max_ms"]
+    return fields
+
+
+def report_row(run, result):
+    row = {
+        "run": run,
+        "updates": result["updates"],
+        "injected": result["injected"],
+        "delivered": result["delivered"],
+        "sim_speed": "" if result["sim_speed"] is None else f"{result['sim_speed']:.3f}",
+    }
+    for stage in STAGES:
+        name = stage[:-len("_ms")]
+        summary = latency_sketch.sketch_summary(result["stages"][stage])
+        for key in ("p50", "p95", "p99", "max"):
+            row[f"{name}_{key}_ms"] = latency_sketch.fmt_ms(summary[key])
+    return row
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Measure trust feedback latency per update, stage by stage")
+    ap.add_argument("paths", nargs="+", help="Run directories or trees containing them")
+    ap.add_argument("--report", help="Write one CSV row per run plus an 'all' row here")
+    ap.add_argument("--updates-out", help="Write every update of every run to this CSV")
+    args = ap.parse_args()
+
+    runs = find_runs(args.paths)
+    if not runs:
+        print("[ERROR] no run directories with logs/COOJA.testlog found", file=sys.stderr)
+        sys.exit(1)
+
+    report = []
+    updates = []
+    merged = {"updates": 0, "injected": 0, "delivered": 0, "sim_speed": None,
+              "stages": {stage: latency_sketch.sketch() for stage in STAGES}}
+    for run_dir in runs:
+        result, rows = analyze_run(run_dir)
+        if result["updates"] and not result["stages"]["fwd_to_inject_sim_ms"]["count"]:
+            print(f"[WARN] {run_dir.name}: no CSV,STAMP/CSV,INJECT lines; "
+                  f"regenerate the .csc to record feedback timing", file=sys.stderr)
+        report.append(report_row(run_dir.name, result))
+        updates += [{"run": run_dir.name, **row} for row in rows]
+        for key in ("updates", "injected", "delivered"):
+            merged[key] += result[key]
+        for stage in STAGES:
+            latency_sketch.sketch_merge(merged["stages"][stage], result["stages"][stage])
+    report.append(report_row("all", merged))
+
+    print(f"{'run':<40} {'updates':>7} {'speed':>7} {'e2e p50':>9} {'e2e p95':>9} {'wait p95':>9}")
+    for row in report:
+        print(f"{row['run']:<40} {row['updates']:>7} {row['sim_speed'] or '-':>7} "
+              f"{row['end_to_end_sim_p50_ms'] or '-':>9} {row['end_to_end_sim_p95_ms'] or '-':>9} "
+              f"{row['inject_wait_p95_ms'] or '-':>9}")
+
+    if args.report:
+        with open(args.report, "w", newline="") as handle:
+            writer = csv.DictWriter(handle, fieldnames=report_fields())
+            writer.writeheader()
+            writer.writerows(report)
+        print(args.report)
+    if args.updates_out:
+        fields = ["run", "update", "node", "fwd_line", "injected", "motes", *STAGES]
+        with open(args.updates_out, "w", newline="") as handle:
+            writer = csv.DictWriter(handle, fieldnames=fields)
+            writer.writeheader()
+            for row in updates:
+                writer.writerow({key: "" if row.get(key) is None else row[key] for key in fields})
+        print(args.updates_out)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,232 @@
+#!/usr/bin/env python3
+"""
+Mergeable latency quantile sketch (log-bucketed histogram).
+
+A sketch counts samples in buckets whose bounds grow geometrically by
+gamma = (1 + rel_err) / (1 - rel_err), so any quantile is answered within
+rel_err of the true sample value, however many samples were added.
+Sketches with the same rel_err merge by adding bucket counts, which is
+exact: merging per-seed sketches gives the same quantiles as one sketch
+over every sample. count/sum/min/max are kept exactly.
+
+Summaries build one sketch per node and one per run while parsing the log
+and write them to <run_dir>/latency_sketch.json; sweep-level tails are
+merged from those files without touching the raw logs.
+
+Usage: python3 tools/latency_sketch.py <latency_sketch.json> [...] [--nodes]
+"""
+
+import argparse
+import json
+import math
+import os
+import sys
+
+
+REL_ERR = 0.01
+SKETCH_FILE = "latency_sketch.json"
+QUANTILES = (0.5, 0.95, 0.99)
+
+
+def sketch(rel_err=REL_ERR):
+    return {"rel_err": rel_err, "count": 0, "sum": 0.0, "min": None, "max": None, "zero": 0, "bins": {}}
+
+
+def _log_gamma(s):
+    return math.log((1 + s["rel_err"]) / (1 - s["rel_err"]))
+
+
+def sketch_add(s, value, count=1):
+    s["count"] += count
+    s["sum"] += value * count
+    if s["min"] is None or value < s["min"]:
+        s["min"] = value
+    if s["max"] is None or value > s["max"]:
+        s["max"] = value
+    if value <= 0:
+        s["zero"] += count
+        return
+    index = math.ceil(math.log(value) / _log_gamma(s))
+    s["bins"][index] = s["bins"].get(index, 0) + count
+
+
+def sketch_merge(s, other):
+    """Add other's samples to s; both must use the same rel_err."""
+    if other["rel_err"] != s["rel_err"]:
+        raise ValueError(f"cannot merge sketches with rel_err {s['rel_err']} and {other['rel_err']}")
+    if not other["count"]:
+        return s
+    s["count"] += other["count"]
+    s["sum"] += other["sum"]
+    s["zero"] += other["zero"]
+    s["min"] = other["min"] if s["min"] is None else min(s["min"], other["min"])
+    s["max"] = other["max"] if s["max"] is None else max(s["max"], other["max"])
+    bins = s["bins"]
+    for index, count in other["bins"].items():
+        bins[index] = bins.get(index, 0) + count
+    return s
+
+
+def sketch_quantile(s, q):
+    if not s["count"]:
+        return None
+    rank = q * (s["count"] - 1)
+    seen = s["zero"]
+    if rank < seen:
+        return max(s["min"], 0)
+    gamma = (1 + s["rel_err"]) / (1 - s["rel_err"])
+    for index in sorted(s["bins"]):
+        seen += s["bins"][index]
+        if rank < seen:
+            # Midpoint (in relative terms) of (gamma^(i-1), gamma^i].
+            value = 2 * gamma ** index / (gamma + 1)
+            return min(max(value, s["min"]), s["max"])
+    return s["max"]
+
+
+def sketch_mean(s):
+    return s["sum"] / s["count"] if s["count"] else None
+
+
+def sketch_summary(s):
+    """count, mean, min, max and p50/p95/p99 of a sketch (None when empty)."""
+    out = {"count": s["count"], "mean": sketch_mean(s), "min": s["min"], "max": s["max"]}
+    for q in QUANTILES:
+        out[f"p{round(q * 100)}"] = sketch_quantile(s, q)
+    return out
+
+
+def to_json(s):
+    return {**s, "bins": {str(index): count for index, count in sorted(s["bins"].items())}}
+
+
+def from_json(data):
+    return {**data, "bins": {int(index): count for index, count in data["bins"].items()}}
+
+
+def write_run(run_dir, run_sketch, node_sketches, source):
+    """Store the run and per-node sketches as <run_dir>/latency_sketch.json."""
+    path = os.path.join(run_dir, SKETCH_FILE)
+    payload = {
+        "source": source,
+        "run": to_json(run_sketch),
+        "nodes": {str(node): to_json(s) for node, s in sorted(node_sketches.items())},
+    }
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(tmp_path, "w") as handle:
+            json.dump(payload, handle, sort_keys=True)
+        os.replace(tmp_path, path)
+    except OSError as exc:
+        print(f"[WARN] could not write latency sketch {path}: {exc}", file=sys.stderr)
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+
+
+def read_run(path):
+    """(run sketch, {node: sketch}) from a latency_sketch.json."""
+    with open(path) as handle:
+        data = json.load(handle)
+    return from_json(data["run"]), {int(node): from_json(s) for node, s in data["nodes"].items()}
+
+
+def delay_tracker(rel_err=REL_ERR):
+    """State for building the root's CSV,DELAY sketches in one pass.
+
+    Feed the log's RX and DELAY events in order to track_rx()/track_delay()
+    and read the result with tracked_delays(). receiver_root.c prints
+    CSV,DELAY right after the CSV,RX it belongs to, so each DELAY takes its
+    node from the latest RX with the same seq. Root-tagged RX and plain RX
+    are tracked apart because only the tagged ones count when the log has
+    any (cooja_log.root_rx()), which is only known at the end.
+    """
+    return {
+        "rel_err": rel_err,
+        "run": sketch(rel_err),
+        True: ({}, {}),
+        False: ({}, {}),
+    }
+
+
+def track_rx(tracker, event):
+    tracker[bool(event.tagged)][0][event.seq] = event.node
+
+
+def track_delay(tracker, event):
+    sketch_add(tracker["run"], event.delay)
+    for tagged in (True, False):
+        last_node, nodes = tracker[tagged]
+        node = last_node.get(event.seq)
+        if node is not None:
+            if node not in nodes:
+                nodes[node] = sketch(tracker["rel_err"])
+            sketch_add(nodes[node], event.delay)
+
+
+def tracked_delays(tracker):
+    """Run and per-node sketches; DELAY lines with no RX only go into the run sketch."""
+    tagged = tracker[True]
+    return tracker["run"], tagged[1] if tagged[0] else tracker[False][1]
+
+
+def rtt_sketches(tx_events, rtt_events, rel_err=REL_ERR):
+    """Run and per-node sketches of one-way delay estimated as RTT / 2.
+
+    CSV,RTT has no node id; it is matched to the sender through the
+    (seq, t0) of that sender's CSV,TX line.
+    """
+    owner = {(event.seq, event.t0): event.node for event in tx_events}
+    run = sketch(rel_err)
+    nodes = {}
+    for event in rtt_events:
+        delay = event.rtt / 2.0
+        sketch_add(run, delay)
+        node = owner.get((event.seq, event.t0))
+        if node is not None:
+            if node not in nodes:
+                nodes[node] = sketch(rel_err)
+            sketch_add(nodes[node], delay)
+    return run, nodes
+
+
+def fmt_ms(value):
+    return "" if value is None else f"{value:.2f}"
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Merge latency sketches and print quantiles")
+    ap.add_argument("paths", nargs="+", help=f"{SKETCH_FILE} files or run directories")
+    ap.add_argument("--nodes", action="store_true", help="Also print merged quantiles per node")
+    args = ap.parse_args()
+
+    merged = None
+    merged_nodes = {}
+    for path in args.paths:
+        if os.path.isdir(path):
+            path = os.path.join(path, SKETCH_FILE)
+        try:
+            run, nodes = read_run(path)
+        except (OSError, ValueError, KeyError) as exc:
+            print(f"[WARN] skipping {path}: {exc}", file=sys.stderr)
+            continue
+        merged = sketch_merge(merged or sketch(run["rel_err"]), run)
+        for node, s in nodes.items():
+            sketch_merge(merged_nodes.setdefault(node, sketch(s["rel_err"])), s)
+    if merged is None:
+        print("[ERROR] no sketches read", file=sys.stderr)
+        sys.exit(1)
+
+    print("scope,count,mean_ms,min_ms,max_ms,p50_ms,p95_ms,p99_ms")
+    rows = [("all", merged)]
+    if args.nodes:
+        rows += [(f"node{node}", s) for node, s in sorted(merged_nodes.items())]
+    for scope, s in rows:
+        summary = sketch_summary(s)
+        print(",".join([scope, str(summary["count"])] + [fmt_ms(summary[key]) for key in
+                                                         ("mean", "min", "max", "p50", "p95", "p99")]))
+
+
+if __name__ == "__main__":
+    main()
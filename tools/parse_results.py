@@ -7,118 +7,34 @@ CSV 로그 파서: Cooja 로그에서 성능 지표 추출
 """
 
 import sys
-import re
-import ipaddress
-from collections import defaultdict
+
+import cooja_log
+import latency_sketch
+import seq_sets
 
 def parse_cooja_log(filename):
     """Cooja 로그 파일에서 CSV 라인 추출 및 분석"""
     
-    # 데이터 저장소
-    tx_packets = defaultdict(set)  # {node_id: {seq1, seq2, ...}}
-    rx_packets = defaultdict(set)  # {node_id: {seq1, seq2, ...}}
-    delays = []  # [(seq, delay_ms), ...]
-    pending_tx_seqs = []  # seqs without node id
-    inferred_sender_id = None
-    rx_candidates = []  # [(src_ip, seq, has_root_tag)]
-    seen_root_tagged_rx = False
-    
-    # 제어 패킷 카운터
-    rpl_packets = 0
-    
     try:
-        with open(filename, 'r') as f:
-            for line in f:
-                line = line.strip()
-                
-                # CSV 라인 파싱
-                if 'CSV,RX,' in line:
-                    # CSV,RX,node=1,<src_ip>,<seq>,<t_recv>,<t0>,<len>
-                    # or CSV,RX,<src_ip>,<seq>,<t_recv>,<t0>,<len>
-                    parts = line.split('CSV,RX,')[1].split(',')
-                    if len(parts) >= 2:
-                        has_root_tag = (parts[0].strip() == "node=1")
-                        if has_root_tag and len(parts) >= 3:
-                            src_ip = parts[1]
-                            seq = int(parts[2])
-                        else:
-                            src_ip = parts[0]
-                            seq = int(parts[1])
-                        if has_root_tag:
-                            seen_root_tagged_rx = True
-                        rx_candidates.append((src_ip, seq, has_root_tag))
-                    # Do not compute delay from RX timestamps (different mote clocks).
-                    pass
-                
-                elif 'CSV,RTT,' in line:
-                    # CSV,RTT,<seq>,<t0>,<t_ack>,<rtt_ticks>,<len>
-                    parts = line.split('CSV,RTT,')[1].split(',')
-                    if len(parts) >= 4:
-                        seq = int(parts[0])
-                        rtt_ticks = int(parts[3])
-                        # Cooja clock: 1 tick = 1ms (일반적)
-                        delay_ms = rtt_ticks / 2.0  # RTT의 절반이 one-way delay
-                        delays.append((seq, delay_ms))
-                
-                elif 'CSV,DELAY,' in line:
-                    # Legacy delay line (kept for compatibility)
-                    parts = line.split('CSV,DELAY,')[1].split(',')
-                    if len(parts) >= 2:
-                        seq = int(parts[0])
-                        delay_ticks = int(parts[1])
-                        delay_ms = delay_ticks  # 1 tick ~= 1ms in Cooja
-                        delays.append((seq, delay_ms))
-                
-                # TX 로그 추출 (sender.c에서 출력)
-                elif 'CSV,TX,' in line:
-                    # CSV,TX,<node_id>,<seq>,<t0>,<joined>
-                    parts = line.split('CSV,TX,')[1].split(',')
-                    if len(parts) >= 2:
-                        node_id = int(parts[0])
-                        seq = int(parts[1])
-                        tx_packets[node_id].add(seq)
-
-                elif 'TX seq=' in line:
-                    # [INFO: SENDER   ] TX id=<n> seq=<n> ...
-                    match = re.search(r'TX seq=(\d+)', line)
-                    if match:
-                        seq = int(match.group(1))
-                        node_match = re.search(r'TX id=(\d+)', line)
-                        if node_match:
-                            node_id = int(node_match.group(1))
-                            tx_packets[node_id].add(seq)
-                        elif inferred_sender_id is not None:
-                            tx_packets[inferred_sender_id].add(seq)
-                        else:
-                            pending_tx_seqs.append(seq)
-                
-                # RPL 제어 패킷 카운터
-                if 'RPL:' in line or 'DIO' in line or 'DAO' in line:
-                    rpl_packets += 1
-    
+        log = cooja_log.collect(filename, ("TX", "TX_INFO", "RX", "RTT", "DELAY", "CONTROL"))
     except FileNotFoundError:
         print(f"Error: File '{filename}' not found.")
         sys.exit(1)
 
-    if inferred_sender_id is not None and pending_tx_seqs:
-        for seq in pending_tx_seqs:
-            tx_packets[inferred_sender_id].add(seq)
+    # {node_id: seq set (seq_sets)}; RX only from root (node=1) when available
+    tx_packets, rx_packets = cooja_log.delivery_sets(log)
+
+    # 노드별/전체 지연 sketch (latency_sketch)
+    # Cooja clock: 1 tick = 1ms (일반적); RTT의 절반이 one-way delay
+    delays, node_delays = latency_sketch.rtt_sketches(log["TX"], log["RTT"])
+    # Legacy delay line (kept for compatibility)
+    for event in log["DELAY"]:
+        latency_sketch.sketch_add(delays, event.delay)
 
-    # Apply Rule 1: RX only from root (node=1) when available
-    if rx_candidates:
-        for src_ip, seq, has_root_tag in rx_candidates:
-            if seen_root_tagged_rx and not has_root_tag:
-                continue
-            try:
-                ip_obj = ipaddress.ip_address(src_ip)
-                node_id = int(ip_obj) & 0xffff
-                rx_packets[node_id].add(seq)
-                if inferred_sender_id is None:
-                    inferred_sender_id = node_id
-            except ValueError:
-                pass
+    # RPL 제어 패킷 카운터
+    rpl_packets = len(log["CONTROL"])
 
-    return tx_packets, rx_packets, delays, rpl_packets
+    return tx_packets, rx_packets, (delays, node_delays), rpl_packets
 
 
 def calculate_metrics(tx_packets, rx_packets, delays, rpl_packets):
@@ -136,15 +52,17 @@ def calculate_metrics(tx_packets, rx_packets, delays, rpl_packets):
     total_rx = 0
     
     for node_id in sorted(set(list(tx_packets.keys()) + list(rx_packets.keys()))):
-        tx_count = len(tx_packets.get(node_id, []))
-        rx_count = len(rx_packets.get(node_id, []))
+        stats = seq_sets.node_delivery(tx_packets.get(node_id), rx_packets.get(node_id))
+        tx_count = stats["tx"]
+        rx_count = stats["rx"]
         
         total_tx += tx_count
         total_rx += rx_count
         
         if tx_count > 0:
             pdr = (rx_count / tx_count) * 100
-            print(f"Node {node_id:2d}: TX={tx_count:4d}, RX={rx_count:4d}, PDR={pdr:6.2f}%")
+            print(f"Node {node_id:2d}: TX={tx_count:4d}, RX={rx_count:4d}, PDR={pdr:6.2f}%, "
+                  f"loss bursts={len(stats['bursts'])}, longest={stats['max_burst']}")
         else:
             print(f"Node {node_id:2d}: No TX packets")
     
@@ -158,16 +76,19 @@ def calculate_metrics(tx_packets, rx_packets, delays, rpl_packets):
     print("\n[2] End-to-End Delay (based on RTT)")
     print("-" * 60)
     
-    if delays:
-        delay_values = [d for _, d in delays]
-        avg_delay = sum(delay_values) / len(delay_values)
-        min_delay = min(delay_values)
-        max_delay = max(delay_values)
+    delays, node_delays = delays
+    if delays["count"]:
+        summary = latency_sketch.sketch_summary(delays)
         
-        print(f"Sample count: {len(delays)}")
-        print(f"Average:      {avg_delay:.2f} ms")
-        print(f"Min:          {min_delay:.2f} ms")
-        print(f"Max:          {max_delay:.2f} ms")
+        print(f"Sample count: {summary['count']}")
+        print(f"Average:      {summary['mean']:.2f} ms")
+        print(f"Min:          {summary['min']:.2f} ms")
+        print(f"Max:          {summary['max']:.2f} ms")
+        print(f"p50/p95/p99:  {summary['p50']:.2f} / {summary['p95']:.2f} / {summary['p99']:.2f} ms")
+        for node_id, node_sketch in sorted(node_delays.items()):
+            node_summary = latency_sketch.sketch_summary(node_sketch)
+            print(f"Node {node_id:2d}: n={node_summary['count']:4d}, p50={node_summary['p50']:.2f}, "
+                  f"p95={node_summary['p95']:.2f}, p99={node_summary['p99']:.2f} ms")
     else:
         print("No RTT data available")
     
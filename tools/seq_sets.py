@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+"""
+Compact per-node sequence sets for TX/RX accounting.
+
+sender.c numbers its packets 1, 2, 3, ... per node, so the seqs seen for a
+node fit in a bitmap that starts at the lowest seq (rounded down to a
+byte). A set is a small list [base, bits, count, lo, hi]: adding a seq sets
+one bit in place, duplicates are detected by the bit already being set,
+and a 10k-packet node costs ~1.3 KB instead of 10k tuples.
+
+account() builds per-node TX and RX sets from a stream of cooja_log
+events in one pass; node_delivery() derives PDR and loss bursts from a
+TX/RX pair.
+"""
+
+import re
+
+
+BASE, BITS, COUNT, LO, HI = range(5)
+RUN_RE = re.compile("1+")
+
+
+def seqset():
+    return [None, bytearray(), 0, None, None]
+
+
+def seq_add(entry, seq):
+    """Add seq; return False if it was already present."""
+    base = entry[BASE]
+    if base is None:
+        base = entry[BASE] = seq & ~7
+    elif seq < base:
+        # Out-of-order or reset sequence below the bitmap: grow downwards.
+        new_base = seq & ~7
+        entry[BITS][:0] = bytes((base - new_base) >> 3)
+        base = entry[BASE] = new_base
+    offset = seq - base
+    index = offset >> 3
+    bits = entry[BITS]
+    if index >= len(bits):
+        bits.extend(bytes(index - len(bits) + 1 + (len(bits) >> 1)))
+    mask = 1 << (offset & 7)
+    if bits[index] & mask:
+        return False
+    bits[index] |= mask
+    entry[COUNT] += 1
+    if entry[LO] is None or seq < entry[LO]:
+        entry[LO] = seq
+    if entry[HI] is None or seq > entry[HI]:
+        entry[HI] = seq
+    return True
+
+
+def seq_contains(entry, seq):
+    base = entry[BASE]
+    if base is None or seq < base:
+        return False
+    offset = seq - base
+    index = offset >> 3
+    return index < len(entry[BITS]) and bool(entry[BITS][index] & (1 << (offset & 7)))
+
+
+def seq_count(entry):
+    return entry[COUNT]
+
+
+def seq_bits(entry, base):
+    """The set as an int with bit (seq - base) set per member; base <= entry base."""
+    if entry[BASE] is None:
+        return 0
+    return int.from_bytes(entry[BITS], "little") << (entry[BASE] - base)
+
+
+def seq_update(entry, other):
+    """Add every member of other to entry."""
+    if other[BASE] is None:
+        return
+    bits = int.from_bytes(other[BITS], "little")
+    for match in RUN_RE.finditer(bin(bits)[:1:-1]):
+        for offset in range(match.start(), match.end()):
+            seq_add(entry, other[BASE] + offset)
+
+
+def node_delivery(tx, rx):
+    """Delivery stats for one node from its TX and RX sets.
+
+    delivered counts RX seqs that were also logged as TX; bursts lists
+    (first_seq, length) for each run of consecutive TX seqs never received.
+    """
+    tx = tx or seqset()
+    rx = rx or seqset()
+    bases = [entry[BASE] for entry in (tx, rx) if entry[BASE] is not None]
+    base = min(bases) if bases else 0
+    tx_bits = seq_bits(tx, base)
+    rx_bits = seq_bits(rx, base)
+    lost_bits = tx_bits & ~rx_bits
+    bursts = [(base + match.start(), match.end() - match.start()) for match in RUN_RE.finditer(bin(lost_bits)[:1:-1])]
+    tx_count = seq_count(tx)
+    delivered = bin(tx_bits & rx_bits).count("1")
+    return {
+        "tx": tx_count,
+        "rx": seq_count(rx),
+        "delivered": delivered,
+        "lost": tx_count - delivered,
+        "pdr": (delivered * 100 / tx_count) if tx_count else None,
+        "bursts": bursts,
+        "max_burst": max((length for _, length in bursts), default=0),
+    }
+
+
+def account(events):
+    """Per-node TX and delivered-RX sets from (kind, event) pairs.
+
+    Takes TX, TX_INFO and RX events in log order, e.g. straight from
+    cooja_log.iter_events(). Root-tagged RX wins when the log has any, and
+    legacy TX_INFO lines without a node id are credited to the first node
+    seen at the root, as in cooja_log.root_rx()/delivery_sets().
+    """
+    tx = {}
+    rx_tagged = {}
+    rx_plain = {}
+    first_rx = {}
+    pending = seqset()
+    for kind, event in events:
+        if kind == "TX" or (kind == "TX_INFO" and event.node is not None):
+            entry = tx.get(event.node)
+            if entry is None:
+                entry = tx[event.node] = seqset()
+            seq_add(entry, event.seq)
+        elif kind == "TX_INFO":
+            seq_add(pending, event.seq)
+        elif kind == "RX":
+            target = rx_tagged if event.tagged else rx_plain
+            first_rx.setdefault(event.tagged, event.node)
+            entry = target.get(event.node)
+            if entry is None:
+                entry = target[event.node] = seqset()
+            seq_add(entry, event.seq)
+    rx = rx_tagged if rx_tagged else rx_plain
+    if rx and seq_count(pending):
+        node = first_rx[bool(rx_tagged)]
+        seq_update(tx.setdefault(node, seqset()), pending)
+    return tx, rx
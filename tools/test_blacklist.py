@@ -5,9 +5,10 @@ Tests network-layer packet filtering based on trust values
 """
 
 import sys
-import re
 from collections import defaultdict
 
+import cooja_log
+
 def parse_blacklist_events(log_file):
     """Parse blacklist-related events from log"""
     events = {
@@ -17,44 +18,27 @@ def parse_blacklist_events(log_file):
         'trust_updates': []
     }
     
-    with open(log_file, 'r') as f:
-        for line_no, line in enumerate(f, 1):
-            # CSV,BLACKLIST_ADD,<node>,<count>
-            match = re.search(r'CSV,BLACKLIST_ADD,(\d+),(\d+)', line)
-            if match:
-                events['blacklist_adds'].append({
-                    'line': line_no,
-                    'node_id': int(match.group(1)),
-                    'count': int(match.group(2))
-                })
-            
-            # CSV,BLACKLIST_REMOVE,<node>,<count>
-            match = re.search(r'CSV,BLACKLIST_REMOVE,(\d+),(\d+)', line)
-            if match:
-                events['blacklist_removes'].append({
-                    'line': line_no,
-                    'node_id': int(match.group(1)),
-                    'count': int(match.group(2))
-                })
-            
-            # CSV,PKT_DROP_DEST or CSV,PKT_DROP_SRC
-            match = re.search(r'CSV,PKT_DROP_(DEST|SRC),(\d+)', line)
-            if match:
-                events['packet_drops'].append({
-                    'line': line_no,
-                    'type': match.group(1),
-                    'node_id': int(match.group(2))
-                })
-            
-            # CSV,TRUST_IN,<self>,<node>,<trust>
-            match = re.search(r'CSV,TRUST_IN,(\d+),(\d+),(\d+)', line)
-            if match:
-                events['trust_updates'].append({
-                    'line': line_no,
-                    'self_id': int(match.group(1)),
-                    'node_id': int(match.group(2)),
-                    'trust': int(match.group(3))
-                })
+    for kind, event in cooja_log.iter_events(log_file, ("BLACKLIST", "PKT_DROP", "TRUST_IN")):
+        if kind == "BLACKLIST":
+            key = 'blacklist_adds' if event.action == "ADD" else 'blacklist_removes'
+            events[key].append({
+                'line': event.line,
+                'node_id': event.node,
+                'count': event.count
+            })
+        elif kind == "PKT_DROP":
+            events['packet_drops'].append({
+                'line': event.line,
+                'type': event.direction,
+                'node_id': event.node
+            })
+        else:
+            events['trust_updates'].append({
+                'line': event.line,
+                'self_id': event.self_id,
+                'node_id': event.node,
+                'trust': event.trust
+            })
     
     return events
 
@@ -0,0 +1,286 @@
+#!/usr/bin/env python3
+"""
+Per-node metrics timeline of a run, bucketed by simulated time.
+
+Events are placed in fixed windows by the CSV,SIMTIME time in effect when
+they were logged. Events before the first marker have no simulated time
+and are skipped (and counted in a warning). For every window and node the
+timeline holds:
+
+  tx, rx          first-seen CSV,TX / root-delivered CSV,RX
+  pdr             rx / tx in the window (%)
+  throughput_pps  delivered packets per simulated second
+  rtt_ms          mean CSV,RTT of the node's packets (matched by seq, t0)
+  e1              % of delivered packets that passed the attacker (FWD_PKT)
+  e3              % of joined CSV,ROUTING samples with the attacker as parent
+  parent          last parent id seen (carried forward)
+  trust           last trust injected for the node, as applied by any mote
+                  (CSV,TRUST_SET, carried forward); CSV,TRUST_IN is the
+                  attacker's copy only
+
+Writes <run_dir>/timeline.csv and, when NumPy is installed, timeline.npz
+with one array per column. Without NumPy the same CSV is produced by plain
+Python group-bys.
+
+Usage: python3 tools/timeline.py <run_dir> [<run_dir> ...] [--window 10]
+"""
+
+import argparse
+import csv
+import math
+import os
+import sys
+
+import cooja_log
+import event_cache
+import seq_sets
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+KINDS = ("TX", "RX", "RTT", "FWD_PKT", "ROUTING", "PARENT", "TRUST_SET")
+COLUMNS = ("window_start_s", "node", "tx", "rx", "pdr", "throughput_pps", "rtt_ms", "e1", "e3", "parent", "trust")
+
+
+def window_of(sim_ms, window_ms):
+    """Window index of a sim time, or None before the first CSV,SIMTIME."""
+    return None if sim_ms is None else sim_ms // window_ms
+
+
+def extract_samples(log, window_ms, attacker_id):
+    """Per-metric (window, node, value) samples from one pass over the events.
+
+    Returns (samples, dropped): dropped counts the samples skipped because
+    they were logged before the first CSV,SIMTIME marker.
+    """
+    samples = {name: [] for name in ("tx", "rx", "rtt", "e1", "e3", "parent", "trust")}
+    dropped = 0
+
+    def add(name, sim_ms, node, value):
+        nonlocal dropped
+        window = window_of(sim_ms, window_ms)
+        if window is None:
+            dropped += 1
+        else:
+            samples[name].append((window, node, value))
+
+    tx_seen = {}
+    owner = {}
+    for event in log["TX"]:
+        entry = tx_seen.setdefault(event.node, seq_sets.seqset())
+        if seq_sets.seq_add(entry, event.seq):
+            add("tx", event.sim_ms, event.node, 1)
+            owner[(event.seq, event.t0)] = event.node
+
+    passed = {}
+    for event in log["FWD_PKT"]:
+        if event.node == attacker_id and not event.failed and event.seq is not None:
+            seq_sets.seq_add(passed.setdefault(event.src, seq_sets.seqset()), event.seq)
+
+    rx_seen = {}
+    for event in cooja_log.root_rx(log["RX"]):
+        entry = rx_seen.setdefault(event.node, seq_sets.seqset())
+        if not seq_sets.seq_add(entry, event.seq):
+            continue
+        add("rx", event.sim_ms, event.node, 1)
+        via_attacker = event.node in passed and seq_sets.seq_contains(passed[event.node], event.seq)
+        add("e1", event.sim_ms, event.node, 100.0 if via_attacker else 0.0)
+
+    for event in log["RTT"]:
+        node = owner.get((event.seq, event.t0))
+        if node is not None:
+            add("rtt", event.sim_ms, node, event.rtt)
+    for event in log["ROUTING"]:
+        if event.joined == 1:
+            add("e3", event.sim_ms, event.node, 100.0 if event.parent == attacker_id else 0.0)
+    for event in log["PARENT"]:
+        if event.parent is not None:
+            add("parent", event.sim_ms, event.node, event.parent)
+    for event in log["TRUST_SET"]:
+        add("trust", event.sim_ms, event.node, event.trust)
+    return samples, dropped
+
+
+def group_numpy(samples, windows, nodes):
+    index = {node: i for i, node in enumerate(nodes)}
+    size = windows * len(nodes)
+
+    def keyed(name):
+        rows = samples[name]
+        keys = np.fromiter((w * len(nodes) + index[n] for w, n, _ in rows), dtype=np.int64, count=len(rows))
+        values = np.fromiter((v for _, _, v in rows), dtype=np.float64, count=len(rows))
+        return keys, values
+
+    def total(name):
+        keys, values = keyed(name)
+        return np.bincount(keys, weights=values, minlength=size)
+
+    def mean(name):
+        keys, values = keyed(name)
+        count = np.bincount(keys, minlength=size)
+        sums = np.bincount(keys, weights=values, minlength=size)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return np.where(count > 0, sums / np.maximum(count, 1), np.nan)
+
+    def last_carried(name):
+        keys, values = keyed(name)
+        out = np.full(size, np.nan)
+        if len(keys):
+            # Last occurrence per key: unique over the reversed samples.
+            _, first_rev = np.unique(keys[::-1], return_index=True)
+            picked = len(keys) - 1 - first_rev
+            out[keys[picked]] = values[picked]
+        grid = out.reshape(windows, len(nodes))
+        # Forward-fill along time per node.
+        valid = ~np.isnan(grid)
+        fill_idx = np.where(valid, np.arange(windows)[:, None], 0)
+        np.maximum.accumulate(fill_idx, axis=0, out=fill_idx)
+        filled = grid[fill_idx, np.arange(len(nodes))]
+        filled[~np.maximum.accumulate(valid, axis=0)] = np.nan
+        return filled.reshape(size)
+
+    tx = total("tx")
+    rx = total("rx")
+    with np.errstate(invalid="ignore", divide="ignore"):
+        pdr = np.where(tx > 0, rx * 100.0 / np.maximum(tx, 1), np.nan)
+    return {
+        "tx": tx,
+        "rx": rx,
+        "pdr": pdr,
+        "rtt_ms": mean("rtt"),
+        "e1": mean("e1"),
+        "e3": mean("e3"),
+        "parent": last_carried("parent"),
+        "trust": last_carried("trust"),
+    }
+
+
+def group_python(samples, windows, nodes):
+    index = {node: i for i, node in enumerate(nodes)}
+    size = windows * len(nodes)
+    nan = float("nan")
+
+    def sums_counts(name):
+        sums = [0.0] * size
+        counts = [0] * size
+        for window, node, value in samples[name]:
+            key = window * len(nodes) + index[node]
+            sums[key] += value
+            counts[key] += 1
+        return sums, counts
+
+    def mean(name):
+        sums, counts = sums_counts(name)
+        return [s / c if c else nan for s, c in zip(sums, counts)]
+
+    def last_carried(name):
+        out = [nan] * size
+        for window, node, value in samples[name]:
+            out[window * len(nodes) + index[node]] = float(value)
+        for i in range(len(nodes)):
+            carried = nan
+            for window in range(windows):
+                key = window * len(nodes) + i
+                if math.isnan(out[key]):
+                    out[key] = carried
+                else:
+                    carried = out[key]
+        return out
+
+    tx = sums_counts("tx")[0]
+    rx = sums_counts("rx")[0]
+    return {
+        "tx": tx,
+        "rx": rx,
+        "pdr": [r * 100.0 / t if t else nan for t, r in zip(tx, rx)],
+        "rtt_ms": mean("rtt"),
+        "e1": mean("e1"),
+        "e3": mean("e3"),
+        "parent": last_carried("parent"),
+        "trust": last_carried("trust"),
+    }
+
+
+def build_timeline(log_path, window_s=10.0, attacker_id=2, use_cache=True):
+    """Return (columns dict, windows, nodes, dropped) for one run log.
+
+    dropped is the number of samples logged before the first CSV,SIMTIME.
+    """
+    if not window_s >= 0.001:
+        raise ValueError(f"window must be at least 1 ms, got {window_s} s")
+    window_ms = int(window_s * 1000)
+    log = event_cache.collect(log_path, KINDS, use_cache)
+    samples, dropped = extract_samples(log, window_ms, attacker_id)
+    nodes = sorted({node for rows in samples.values() for _, node, _ in rows})
+    windows = 1 + max((window for rows in samples.values() for window, _, _ in rows), default=-1)
+    if not nodes or windows == 0:
+        return None, 0, nodes, dropped
+    grouped = (group_numpy if np is not None else group_python)(samples, windows, nodes)
+    starts = [window * window_s for window in range(windows) for _ in nodes]
+    grouped["window_start_s"] = starts
+    grouped["node"] = [node for _ in range(windows) for node in nodes]
+    grouped["throughput_pps"] = [value / window_s for value in grouped["rx"]]
+    return grouped, windows, nodes, dropped
+
+
+def fmt(value, digits=2):
+    value = float(value)
+    if math.isnan(value):
+        return ""
+    if value.is_integer():
+        return str(int(value))
+    return f"{value:.{digits}f}"
+
+
+def write_timeline(run_dir, grouped):
+    csv_path = os.path.join(run_dir, "timeline.csv")
+    rows = len(grouped["node"])
+    with open(csv_path, "w", newline="") as handle:
+        writer = csv.writer(handle)
+        writer.writerow(COLUMNS)
+        for i in range(rows):
+            writer.writerow([fmt(grouped[name][i]) for name in COLUMNS])
+    if np is not None:
+        np.savez_compressed(
+            os.path.join(run_dir, "timeline.npz"),
+            **{name: np.asarray(grouped[name], dtype=np.float64) for name in COLUMNS},
+        )
+    return csv_path
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Write a per-node metrics timeline for each run")
+    ap.add_argument("run_dirs", nargs="+", help="Run directories containing logs/COOJA.testlog")
+    ap.add_argument("--window", type=float, default=10.0, help="Window length in simulated seconds")
+    ap.add_argument("--attacker-id", type=int, default=2, help="Attacker node id for E1/E3")
+    ap.add_argument("--no-event-cache", dest="event_cache", action="store_false",
+                    help="Re-parse logs instead of using logs/COOJA.events")
+    args = ap.parse_args()
+    # Windows are whole simulated milliseconds; also rejects nan.
+    if not args.window >= 0.001:
+        ap.error("--window must be at least 0.001 s (1 ms)")
+
+    if np is None:
+        print("[WARN] numpy not available; writing timeline.csv only", file=sys.stderr)
+    for run_dir in args.run_dirs:
+        log_path = os.path.join(run_dir, "logs", "COOJA.testlog")
+        if not os.path.exists(log_path):
+            print(f"[WARN] no log in {run_dir}", file=sys.stderr)
+            continue
+        grouped, windows, nodes, dropped = build_timeline(log_path, args.window, args.attacker_id, args.event_cache)
+        if grouped is None:
+            if dropped:
+                print(f"[WARN] no CSV,SIMTIME markers in {log_path}; skipped {dropped} events", file=sys.stderr)
+            else:
+                print(f"[WARN] no events in {log_path}", file=sys.stderr)
+            continue
+        if dropped:
+            print(f"[WARN] skipped {dropped} events logged before the first CSV,SIMTIME in {log_path}", file=sys.stderr)
+        print(f"{write_timeline(run_dir, grouped)} ({windows} windows x {len(nodes)} nodes)")
+
+
+if __name__ == "__main__":
+    main()
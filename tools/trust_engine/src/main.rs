@@ -3,7 +3,7 @@ use std::env;
 use std::fs::{File, OpenOptions};
 use std::io::{self, BufRead, BufReader, Write};
 use std::thread;
-use std::time::Duration;
+use std::time::{Duration, SystemTime, UNIX_EPOCH};
 
 const TRUST_SCALE: f64 = 1000.0;
 
@@ -17,6 +17,9 @@ struct Config {
     parent_out: String,
     stats_out: String,
     final_out: String,
+    latency_out: String,
+    feed_socket: Option<String>,
+    inotify: bool,
     stats_interval: u64,
     metric: String,
     alpha: f64,
@@ -75,6 +78,7 @@ fn usage() {
     eprintln!("                  [--forwarders-only] [--fwd-drop-threshold <0..1>]");
     eprintln!("                  [--follow] [--poll-ms <ms>] [--from-start] [--serial-socket <host:port>]");
     eprintln!("                  [--attacker-id <id>] [--exposure-out <csv>] [--parent-out <csv>] [--stats-out <csv>] [--stats-interval <n>]");
+    eprintln!("                  [--latency-out <csv>] [--feed-socket <unix_socket>] [--no-inotify]");
     eprintln!("                  [--sink-min-hop <v>] [--sink-tau <v>] [--sink-lambda-adv <v>] [--sink-lambda-stab <v>]");
     eprintln!("                  [--sink-beta <v>] [--sink-kappa <v>] [--sink-w1 <v>] [--sink-w2 <v>] [--trust-alpha <v>]");
 }
@@ -89,6 +93,9 @@ fn parse_args() -> Config {
         parent_out: "".to_string(),
         stats_out: "".to_string(),
         final_out: "".to_string(),
+        latency_out: "".to_string(),
+        feed_socket: None,
+        inotify: true,
         stats_interval: 200,
         metric: "ewma".to_string(),
         alpha: 0.2,
@@ -140,6 +147,13 @@ fn parse_args() -> Config {
             "--final-out" => {
                 if let Some(v) = args.next() { cfg.final_out = v; }
             }
+            "--latency-out" => {
+                if let Some(v) = args.next() { cfg.latency_out = v; }
+            }
+            "--feed-socket" => {
+                if let Some(v) = args.next() { cfg.feed_socket = Some(v); }
+            }
+            "--no-inotify" => cfg.inotify = false,
             "--stats-interval" => {
                 if let Some(v) = args.next() { cfg.stats_interval = v.parse().unwrap_or(cfg.stats_interval); }
             }
@@ -223,6 +237,106 @@ fn parse_args() -> Config {
     cfg
 }
 
+// Wall clock in ms since the epoch, comparable with java.lang.System.currentTimeMillis().
+fn wall_ms() -> f64 {
+    SystemTime::now()
+        .duration_since(UNIX_EPOCH)
+        .map(|d| d.as_secs_f64() * 1000.0)
+        .unwrap_or(0.0)
+}
+
+// Wakes the --follow loop when the input file changes instead of sleeping
+// poll_ms; poll_ms stays as the upper bound of a wait.
+#[cfg(target_os = "linux")]
+mod input_watch {
+    use std::ffi::CString;
+    use std::os::raw::{c_char, c_int, c_ulong, c_void};
+
+    #[repr(C)]
+    struct PollFd {
+        fd: c_int,
+        events: i16,
+        revents: i16,
+    }
+
+    extern "C" {
+        fn inotify_init1(flags: c_int) -> c_int;
+        fn inotify_add_watch(fd: c_int, path: *const c_char, mask: u32) -> c_int;
+        fn poll(fds: *mut PollFd, nfds: c_ulong, timeout: c_int) -> c_int;
+        fn read(fd: c_int, buf: *mut c_void, count: usize) -> isize;
+        fn close(fd: c_int) -> c_int;
+    }
+
+    const IN_NONBLOCK: c_int = 0o4000;
+    const IN_CLOEXEC: c_int = 0o2000000;
+    const IN_MODIFY: u32 = 0x2;
+    const IN_ATTRIB: u32 = 0x4;
+    const IN_CLOSE_WRITE: u32 = 0x8;
+    const POLLIN: i16 = 0x1;
+
+    pub struct Watcher {
+        fd: c_int,
+    }
+
+    impl Watcher {
+        pub fn new(path: &str) -> Option<Watcher> {
+            let cpath = CString::new(path).ok()?;
+            let fd = unsafe { inotify_init1(IN_NONBLOCK | IN_CLOEXEC) };
+            if fd < 0 {
+                return None;
+            }
+            let wd = unsafe { inotify_add_watch(fd, cpath.as_ptr(), IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE) };
+            if wd < 0 {
+                unsafe { close(fd) };
+                return None;
+            }
+            Some(Watcher { fd })
+        }
+
+        /// Returns once the file has changed or after timeout_ms.
+        pub fn wait(&self, timeout_ms: u64) {
+            let mut pfd = PollFd { fd: self.fd, events: POLLIN, revents: 0 };
+            unsafe { poll(&mut pfd, 1, timeout_ms.min(i32::MAX as u64) as c_int) };
+            let mut buf = [0u8; 4096];
+            while unsafe { read(self.fd, buf.as_mut_ptr() as *mut c_void, buf.len()) } > 0 {}
+        }
+    }
+
+    impl Drop for Watcher {
+        fn drop(&mut self) {
+            unsafe { close(self.fd) };
+        }
+    }
+}
+
+#[cfg(not(target_os = "linux"))]
+mod input_watch {
+    pub struct Watcher;
+
+    impl Watcher {
+        pub fn new(_path: &str) -> Option<Watcher> {
+            None
+        }
+
+        pub fn wait(&self, timeout_ms: u64) {
+            std::thread::sleep(std::time::Duration::from_millis(timeout_ms));
+        }
+    }
+}
+
+// TRUST lines are also pushed to this stream (the sweep's feedback bridge)
+// as soon as they are written to --output.
+#[cfg(unix)]
+fn connect_feed(path: &str) -> io::Result<Box<dyn Write>> {
+    let stream = std::os::unix::net::UnixStream::connect(path)?;
+    Ok(Box::new(stream))
+}
+
+#[cfg(not(unix))]
+fn connect_feed(_path: &str) -> io::Result<Box<dyn Write>> {
+    Err(io::Error::new(io::ErrorKind::Unsupported, "unix sockets not available"))
+}
+
 fn parse_node_id(ip: &str) -> Option<u16> {
     let last = ip.split(':').filter(|s| !s.is_empty()).last()?;
     u16::from_str_radix(last, 16).ok().or_else(|| last.parse::<u16>().ok())
@@ -239,6 +353,8 @@ fn process_reader<R: BufRead>(
     parent_out: &mut Option<File>,
     stats_out: &mut Option<File>,
     final_out: &mut Option<File>,
+    latency_out: &mut Option<File>,
+    feed: &mut Option<Box<dyn Write>>,
 ) -> io::Result<()> {
     let mut states: HashMap<u16, TrustState> = HashMap::new();
     let mut forwarders: HashMap<u16, bool> = HashMap::new();
@@ -257,12 +373,21 @@ fn process_reader<R: BufRead>(
     let mut line_idx: u64 = 0;
     let mut attacker_udp_total: u64 = 0;
     let mut attacker_udp_dropped: u64 = 0;
+    let mut update_idx: u64 = 0;
+    let watcher = if cfg.follow && cfg.serial_socket.is_none() && cfg.inotify {
+        input_watch::Watcher::new(&cfg.input)
+    } else {
+        None
+    };
     loop {
         let mut line = String::new();
         let n = reader.read_line(&mut line)?;
         if n == 0 {
             if cfg.follow && cfg.serial_socket.is_none() {
-                thread::sleep(Duration::from_millis(cfg.poll_ms));
+                match &watcher {
+                    Some(w) => w.wait(cfg.poll_ms),
+                    None => thread::sleep(Duration::from_millis(cfg.poll_ms)),
+                }
                 continue;
             } else {
                 break;
@@ -325,6 +450,7 @@ fn process_reader<R: BufRead>(
             continue;
         }
         if trimmed.starts_with("CSV,FWD,") {
+            let read_ms = if latency_out.is_some() { wall_ms() } else { 0.0 };
             let parts: Vec<&str> = trimmed.split(',').collect();
             if parts.len() < 5 {
                 continue;
@@ -433,8 +559,30 @@ fn process_reader<R: BufRead>(
                 let _ = blacklist_out.flush();
             }
 
-            let _ = writeln!(out, "TRUST,{},{}", node_id, trust_val);
+            let trust_line = format!("TRUST,{},{}\n", node_id, trust_val);
+            let _ = out.write_all(trust_line.as_bytes());
             let _ = out.flush();
+            if let Some(stream) = feed.as_mut() {
+                if stream.write_all(trust_line.as_bytes()).is_err() {
+                    eprintln!("[WARN] feed socket closed; trust updates go to {} only", cfg.output);
+                    *feed = None;
+                }
+            }
+            if let Some(file) = latency_out.as_mut() {
+                // update = 0-based line of this TRUST line in the feedback file.
+                let _ = writeln!(
+                    file,
+                    "{},{},{},{:.3},{:.3},{}",
+                    update_idx,
+                    node_id,
+                    line_idx,
+                    read_ms,
+                    wall_ms(),
+                    trust_val
+                );
+                let _ = file.flush();
+            }
+            update_idx += 1;
 
             let _ = writeln!(
                 metrics,
@@ -740,6 +888,29 @@ fn main() -> io::Result<()> {
         Some(f)
     };
 
+    let mut latency_out = if cfg.latency_out.is_empty() {
+        None
+    } else {
+        let mut f = OpenOptions::new()
+            .create(true)
+            .write(true)
+            .truncate(true)
+            .open(&cfg.latency_out)?;
+        writeln!(f, "update,node_id,line,read_wall_ms,write_wall_ms,trust_raw")?;
+        Some(f)
+    };
+
+    let mut feed = match &cfg.feed_socket {
+        Some(path) => match connect_feed(path) {
+            Ok(stream) => Some(stream),
+            Err(e) => {
+                eprintln!("[WARN] cannot connect feed socket {}: {}; using {} only", path, e, cfg.output);
+                None
+            }
+        },
+        None => None,
+    };
+
     if let Some(sock) = &cfg.serial_socket {
         let mut parts = sock.split(':');
         let host = parts.next().unwrap_or("127.0.0.1");
@@ -760,6 +931,8 @@ fn main() -> io::Result<()> {
             &mut parent_out,
             &mut stats_out,
             &mut final_out,
+            &mut latency_out,
+            &mut feed,
         )?;
     } else {
         let file = File::open(&cfg.input)?;
@@ -782,6 +955,8 @@ fn main() -> io::Result<()> {
             &mut parent_out,
             &mut stats_out,
             &mut final_out,
+            &mut latency_out,
+            &mut feed,
         )?;
     }
 
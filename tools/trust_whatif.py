@@ -0,0 +1,383 @@
+#!/usr/bin/env python3
+"""
+Vectorized what-if evaluation of trust_engine settings with NumPy.
+
+The per-forwarder CSV,FWD delta series (and the DIO/ROUTING samples that
+drive sink_adv/sink_stab) are extracted from a run's log once. The EWMA,
+Bayes and Beta recurrences, the blacklist rule and the gray/sink trust
+combination of tools/trust_engine are then evaluated for every parameter
+vector at once: arrays are shaped (updates, vectors) and the recurrences
+step through time with one array operation per update, so thousands of
+vectors cost about as much as a handful of trust_engine runs.
+
+For each run and vector the output has the attacker's blacklist line and
+sim time, its final trust and the number of other nodes blacklisted
+(false positives). --check first re-evaluates the run's own settings and
+compares every update with trust_metrics.csv and blacklist.csv written by
+the engine.
+
+Usage:
+  python3 tools/trust_whatif.py results/experiments-*/* --check \\
+      --grid alpha=0.1,0.2,0.5 --grid ewma_min=0.5,0.6,0.7 --out whatif.csv
+"""
+
+import argparse
+import csv
+import itertools
+import json
+import os
+import sys
+
+import event_cache
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+# trust_engine defaults (see parse_args in tools/trust_engine/src/main.rs);
+# the sweep passes the same values for alpha, ewma_min and fwd_drop_threshold.
+DEFAULTS = {
+    "metric": "ewma",
+    "alpha": 0.2,
+    "beta_a": 1.0,
+    "beta_b": 1.0,
+    "ewma_min": 0.7,
+    "bayes_min": 0.7,
+    "beta_min": 0.7,
+    "fwd_drop_threshold": 0.2,
+    "trust_alpha": 0.5,
+    "sink_w1": 0.5,
+    "sink_w2": 0.5,
+    "sink_min_hop": 256.0,
+    "sink_tau": 0.0,
+    "sink_lambda_adv": 0.01,
+    "sink_lambda_stab": 0.01,
+    "sink_beta": 0.1,
+    "sink_kappa": 0.0,
+}
+METRICS = ("ewma", "bayes", "beta")
+TRUST_SCALE = 1000.0
+# Parameter vectors evaluated together; bounds the (updates, vectors) arrays.
+CHUNK = 256
+OUT_FIELDS = [
+    "run",
+    "attacker_blacklisted",
+    "attacker_blacklist_line",
+    "attacker_blacklist_ms",
+    "attacker_final_trust",
+    "false_positives",
+]
+
+
+def extract_series(log_path):
+    """Param-independent inputs of trust_engine from one log.
+
+    updates: {node: dict of arrays line, sim_ms, succ, fail} with one entry
+             per CSV,FWD that makes the engine emit a trust update
+    adv:     {src: (lines, dio_rank, self_rank)} DIO samples with self_rank > 0
+    stab:    {parent: (lines, rank_delta)} joined ROUTING samples whose child
+             had a previous rank
+    """
+    log = event_cache.collect(log_path, ("FWD", "DIO", "ROUTING", "FINISHED"))
+    stop = log["FINISHED"][0].line if log["FINISHED"] else float("inf")
+
+    last = {}
+    updates = {}
+    for event in log["FWD"]:
+        if event.line > stop:
+            break
+        udp, dropped = last.get(event.node, (0, 0))
+        last[event.node] = (event.udp_to_root, event.dropped)
+        delta_udp = max(0, event.udp_to_root - udp)
+        if delta_udp == 0:
+            continue
+        delta_dropped = max(0, event.dropped - dropped)
+        rows = updates.setdefault(event.node, ([], [], [], []))
+        rows[0].append(event.line)
+        rows[1].append(-1 if event.sim_ms is None else event.sim_ms)
+        rows[2].append(max(0, delta_udp - delta_dropped))
+        rows[3].append(delta_dropped)
+
+    adv = {}
+    for event in log["DIO"]:
+        if event.line < stop and event.self_rank > 0:
+            rows = adv.setdefault(event.src, ([], [], []))
+            rows[0].append(event.line)
+            rows[1].append(event.dio_rank)
+            rows[2].append(event.self_rank)
+
+    stab = {}
+    last_rank = {}
+    for event in log["ROUTING"]:
+        if event.line > stop or event.joined != 1 or event.parent is None:
+            continue
+        previous = last_rank.get(event.node, 0)
+        if previous > 0:
+            rows = stab.setdefault(event.parent, ([], []))
+            rows[0].append(event.line)
+            rows[1].append(event.rank - previous)
+        last_rank[event.node] = event.rank
+
+    return {
+        "updates": {
+            node: {
+                "line": np.array(rows[0], dtype=np.int64),
+                "sim_ms": np.array(rows[1], dtype=np.int64),
+                "succ": np.array(rows[2], dtype=np.float64),
+                "fail": np.array(rows[3], dtype=np.float64),
+            }
+            for node, rows in updates.items()
+        },
+        "adv": {node: tuple(np.array(col, dtype=np.float64) for col in rows) for node, rows in adv.items()},
+        "stab": {node: tuple(np.array(col, dtype=np.float64) for col in rows) for node, rows in stab.items()},
+    }
+
+
+def param_arrays(vectors):
+    """{name: (P,) array} from a list of parameter dicts (metric as codes)."""
+    arrays = {}
+    for name, default in DEFAULTS.items():
+        values = [vector.get(name, default) for vector in vectors]
+        if name == "metric":
+            arrays[name] = np.array([METRICS.index(value) if value in METRICS else 0 for value in values])
+        else:
+            arrays[name] = np.array([float(value) for value in values])
+    return arrays
+
+
+def sink_at(samples, query_lines, weight, vectors):
+    """Sink EWMA in effect at each query line, for every vector.
+
+    samples is (lines, step) where step(k) gives the (P,) value of the
+    k-th sample; x starts at 1.0 and becomes (1 - weight) x + weight * step(k)
+    after each sample line. Only the (queries, P) result is materialized.
+    """
+    out = np.empty((len(query_lines), vectors))
+    if samples is None:
+        out[:] = 1.0
+        return out
+    lines, step = samples
+    cut = np.searchsorted(lines, query_lines, side="left")
+    x = np.ones(vectors)
+    q = 0
+    for k in range(len(lines) + 1):
+        while q < len(cut) and cut[q] == k:
+            out[q] = x
+            q += 1
+        if q == len(cut):
+            break
+        x = (1.0 - weight) * x + weight * step(k)
+    return out
+
+
+def evaluate(series, vectors, history=False):
+    """Blacklist decisions and trust for every vector.
+
+    Returns {"blacklist": {node: (P,) index of the blacklisting update or -1},
+    "final": {node: (P,) last trust_raw}} and, with history=True, the
+    per-update rows of the first vector in log order.
+    """
+    p = param_arrays(vectors)
+    vectors_n = len(vectors)
+    adv = {}
+    for node, (lines, dio_rank, self_rank) in series["adv"].items():
+        def step(k, dio_rank=dio_rank, self_rank=self_rank):
+            delta = dio_rank[k] + p["sink_min_hop"] - self_rank[k]
+            return np.exp(-p["sink_lambda_adv"] * np.maximum(-delta - p["sink_tau"], 0.0))
+        adv[node] = (lines, step)
+    stab = {}
+    for node, (lines, rank_delta) in series["stab"].items():
+        def step(k, rank_delta=rank_delta):
+            return np.exp(-p["sink_lambda_stab"] * np.maximum(rank_delta[k] - p["sink_kappa"], 0.0))
+        stab[node] = (lines, step)
+
+    blacklist = {}
+    final = {}
+    rows = []
+    for node, upd in series["updates"].items():
+        succ = np.cumsum(upd["succ"])[:, None]
+        fail = np.cumsum(upd["fail"])[:, None]
+        beta = (p["beta_a"] + succ) / (p["beta_a"] + p["beta_b"] + succ + fail)
+        bayes = np.broadcast_to((1.0 + succ) / (2.0 + succ + fail), beta.shape)
+        ewma = np.empty_like(beta)
+        ewma[0] = beta[0]
+        alpha = p["alpha"]
+        for t in range(1, len(beta)):
+            ewma[t] = alpha * ewma[t - 1] + (1.0 - alpha) * beta[t]
+
+        flags = (
+            (beta <= 1.0 - p["fwd_drop_threshold"])
+            | (ewma < p["ewma_min"])
+            | (bayes < p["bayes_min"])
+            | (beta < p["beta_min"])
+        )
+        hit = flags.any(axis=0)
+        first = np.where(hit, flags.argmax(axis=0), -1)
+        blacklisted = hit[None, :] & (np.arange(len(beta))[:, None] >= first[None, :])
+
+        gray = np.choose(p["metric"][None, :], [ewma, bayes, beta])
+        gray = np.where(blacklisted, 0.0, gray)
+        sink = (
+            sink_at(adv.get(node), upd["line"], p["sink_beta"], vectors_n) ** p["sink_w1"]
+            * sink_at(stab.get(node), upd["line"], p["sink_beta"], vectors_n) ** p["sink_w2"]
+        )
+        total = gray ** p["trust_alpha"] * sink ** (1.0 - p["trust_alpha"])
+        # Rust f64::round() rounds halves away from zero, then `as u16` saturates.
+        raw = np.clip(np.floor(total * TRUST_SCALE + 0.5), 0, 65535).astype(np.int64)
+
+        blacklist[node] = first
+        final[node] = raw[-1]
+        if history:
+            for t in range(len(beta)):
+                rows.append((int(upd["line"][t]), node, float(ewma[t, 0]), float(bayes[t, 0]),
+                             float(beta[t, 0]), float(total[t, 0]), int(raw[t, 0]),
+                             bool(t == first[0]), int(succ[t, 0]), int(fail[t, 0])))
+    rows.sort()
+    return {"blacklist": blacklist, "final": final, "rows": rows}
+
+
+def summarize(series, result, vectors, attacker_id):
+    """One output dict per vector."""
+    out = []
+    attacker = series["updates"].get(attacker_id)
+    first = result["blacklist"].get(attacker_id)
+    for i in range(len(vectors)):
+        index = int(first[i]) if first is not None else -1
+        sim_ms = int(attacker["sim_ms"][index]) if index >= 0 else -1
+        out.append({
+            "attacker_blacklisted": int(index >= 0),
+            "attacker_blacklist_line": int(attacker["line"][index]) if index >= 0 else "",
+            "attacker_blacklist_ms": sim_ms if sim_ms >= 0 else "",
+            "attacker_final_trust": int(result["final"][attacker_id][i]) if attacker is not None else "",
+            "false_positives": sum(
+                1 for node, node_first in result["blacklist"].items()
+                if node != attacker_id and node_first[i] >= 0
+            ),
+        })
+    return out
+
+
+def run_vector(run_dir):
+    """The run's own engine settings: DEFAULTS plus run_meta.json overrides."""
+    vector = dict(DEFAULTS)
+    try:
+        with open(os.path.join(run_dir, "logs", "run_meta.json")) as handle:
+            engine = json.load(handle).get("engine") or {}
+    except (OSError, ValueError):
+        engine = {}
+    for name, value in engine.items():
+        name = name.replace("-", "_")
+        if name in vector:
+            vector[name] = value
+    return vector
+
+
+def read_csv_rows(path):
+    with open(path, errors="ignore") as handle:
+        return list(csv.DictReader(handle))
+
+
+def check_agreement(series, run_dir):
+    """(rows compared, list of mismatch descriptions) against the engine's CSVs."""
+    result = evaluate(series, [run_vector(run_dir)], history=True)
+    rows = result["rows"]
+    engine_rows = read_csv_rows(os.path.join(run_dir, "trust_metrics.csv"))
+    problems = []
+    if len(engine_rows) != len(rows):
+        problems.append(f"{len(rows)} updates evaluated, {len(engine_rows)} in trust_metrics.csv")
+    for ours, theirs in zip(rows, engine_rows):
+        line, node, ewma, bayes, beta, total, raw = ours[:7]
+        mismatch = int(theirs["node_id"]) != node or abs(int(theirs["trust_raw"]) - raw) > 1 or any(
+            abs(float(theirs[name]) - value) > 6e-5
+            for name, value in (("ewma", ewma), ("bayes", bayes), ("beta", beta), ("trust_value", total))
+        )
+        if mismatch:
+            problems.append(f"line {line} node {node}: engine {dict(theirs)} vs "
+                            f"ewma={ewma:.4f} bayes={bayes:.4f} beta={beta:.4f} trust={raw}")
+    ours_bl = [(row[1], row[8], row[9]) for row in rows if row[7]]
+    theirs_bl = [(int(r["node_id"]), int(r["success"]), int(r["failed"]))
+                 for r in read_csv_rows(os.path.join(run_dir, "blacklist.csv"))]
+    if sorted(ours_bl) != sorted(theirs_bl):
+        problems.append(f"blacklist {sorted(ours_bl)} vs engine {sorted(theirs_bl)}")
+    return len(rows), problems
+
+
+def parse_grid(entries):
+    axes = []
+    for entry in entries:
+        name, sep, values = entry.partition("=")
+        name = name.strip().lstrip("-").replace("-", "_")
+        if not sep or name not in DEFAULTS:
+            raise ValueError(f"bad --grid entry {entry!r}; known parameters: {', '.join(DEFAULTS)}")
+        axes.append([(name, value if name == "metric" else float(value)) for value in values.split(",") if value])
+    return [dict(combo) for combo in itertools.product(*axes)]
+
+
+def read_vectors(path):
+    vectors = []
+    for row in read_csv_rows(path):
+        vector = {}
+        for name, value in row.items():
+            name = (name or "").strip().replace("-", "_")
+            if name in DEFAULTS and value not in (None, ""):
+                vector[name] = value if name == "metric" else float(value)
+        vectors.append(vector)
+    return vectors
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Evaluate trust_engine settings for many parameter vectors at once")
+    ap.add_argument("run_dirs", nargs="+", help="Run directories with logs/COOJA.testlog")
+    ap.add_argument("--grid", action="append", default=[], help="name=v1,v2 (repeatable; cartesian product)")
+    ap.add_argument("--params", help="CSV with one parameter vector per row (columns named as in --grid)")
+    ap.add_argument("--attacker-id", type=int, default=2)
+    ap.add_argument("--check", action="store_true",
+                    help="Compare the run's own settings against trust_metrics.csv/blacklist.csv first")
+    ap.add_argument("--out", default="whatif.csv")
+    args = ap.parse_args()
+
+    if np is None:
+        print("[ERROR] numpy is required for tools/trust_whatif.py", file=sys.stderr)
+        sys.exit(1)
+    try:
+        vectors = read_vectors(args.params) if args.params else parse_grid(args.grid)
+    except (OSError, ValueError) as exc:
+        print(f"[ERROR] {exc}", file=sys.stderr)
+        sys.exit(1)
+    names = [name for name in DEFAULTS if any(name in vector for vector in vectors)]
+    vectors = [{**DEFAULTS, **vector} for vector in vectors]
+
+    failed = False
+    with open(args.out, "w", newline="") as handle:
+        writer = csv.DictWriter(handle, fieldnames=OUT_FIELDS[:1] + names + OUT_FIELDS[1:], extrasaction="ignore")
+        writer.writeheader()
+        for run_dir in args.run_dirs:
+            log_path = os.path.join(run_dir, "logs", "COOJA.testlog")
+            if not os.path.exists(log_path):
+                print(f"[WARN] no log in {run_dir}", file=sys.stderr)
+                continue
+            series = extract_series(log_path)
+            run = os.path.basename(os.path.normpath(run_dir))
+            if args.check:
+                if os.path.exists(os.path.join(run_dir, "trust_metrics.csv")):
+                    checked, problems = check_agreement(series, run_dir)
+                    status = "agrees" if not problems else f"{len(problems)} mismatch(es)"
+                    print(f"{run}: {checked} updates, {status} with trust_engine")
+                    for problem in problems[:5]:
+                        print(f"  [ERROR] {problem}", file=sys.stderr)
+                    failed = failed or bool(problems)
+                else:
+                    print(f"[WARN] {run}: no trust_metrics.csv to check against", file=sys.stderr)
+            for start in range(0, len(vectors), CHUNK):
+                chunk = vectors[start:start + CHUNK]
+                result = evaluate(series, chunk)
+                for vector, summary in zip(chunk, summarize(series, result, chunk, args.attacker_id)):
+                    writer.writerow({"run": run, **vector, **summary})
+    print(f"{args.out} ({len(vectors)} vector(s))")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
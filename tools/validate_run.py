@@ -0,0 +1,253 @@
+#!/usr/bin/env python3
+"""
+Single-pass trust/parent/blacklist validation of a Cooja log.
+
+Streams TRUST_IN/TRUST_SET/TRUST, PARENT, BLACKLIST_* and PKT_DROP_*
+events once, in log order, keeping per-node trust state, so every check
+is made against the trust in effect at the moment of the event:
+
+  violations   intervals during which a child had a parent whose trust
+               (as seen by that child, else as logged by the legacy
+               CSV,TRUST line) was below --trust-min. cause=selected when
+               the low-trust parent was picked, cause=retained when trust
+               fell after the parent had been picked.
+  blacklist    per-node intervals from the first BLACKLIST_ADD to the
+               matching last BLACKLIST_REMOVE across motes, with the
+               packets dropped for that node and the delay from trust
+               going low to the node being blacklisted.
+
+Only cause=selected intervals fail the validation (exit status 1);
+retained intervals measure how long a stale parent was kept.
+
+Usage: python3 tools/validate_run.py <COOJA.testlog> [--trust-min 700] [--out-dir DIR]
+"""
+
+import argparse
+import csv
+import os
+import sys
+
+import cooja_log
+
+
+KINDS = ("TRUST", "TRUST_IN", "TRUST_SET", "PARENT", "BLACKLIST", "PKT_DROP")
+VIOLATION_FIELDS = (
+    "child", "parent", "cause", "start_line", "start_ms", "end_line", "end_ms",
+    "end_reason", "min_trust", "selections",
+)
+BLACKLIST_FIELDS = (
+    "node", "start_line", "start_ms", "end_line", "end_ms", "max_listers",
+    "drops", "low_trust_ms", "reaction_ms",
+)
+
+
+def close_violation(open_violations, child, event, reason, out):
+    violation = open_violations.pop(child, None)
+    if violation is not None:
+        violation["end_line"] = event.line if event is not None else None
+        violation["end_ms"] = event.sim_ms if event is not None else None
+        violation["end_reason"] = reason
+        out.append(violation)
+
+
+def validate_events(events, trust_min=700):
+    """Run every check over (kind, event) pairs given in log order.
+
+    Returns a dict with violation intervals, blacklist intervals, drops
+    seen while the node was not blacklisted, and event counts.
+    """
+    # (observer, node) -> trust; observer None for the legacy CSV,TRUST line.
+    trust = {}
+    parent_of = {}
+    children_of = {}
+    open_violations = {}
+    violations = []
+    listers = {}
+    open_blacklist = {}
+    blacklist = []
+    low_since = {}
+    low_observers = {}
+    stray_drops = {}
+    counts = dict.fromkeys(("trust", "parent", "blacklist", "drop"), 0)
+
+    def trust_seen(child, node):
+        value = trust.get((child, node))
+        return trust.get((None, node)) if value is None else value
+
+    def recheck(child, event, cause):
+        parent = parent_of.get(child)
+        value = None if parent is None else trust_seen(child, parent)
+        low = value is not None and value < trust_min
+        violation = open_violations.get(child)
+        if violation is not None and (violation["parent"] != parent or not low):
+            reason = "parent_change" if violation["parent"] != parent else "trust_recovered"
+            close_violation(open_violations, child, event, reason, violations)
+            violation = None
+        if low:
+            if violation is None:
+                open_violations[child] = {
+                    "child": child,
+                    "parent": parent,
+                    "cause": cause,
+                    "start_line": event.line,
+                    "start_ms": event.sim_ms,
+                    "min_trust": value,
+                    "selections": 0,
+                }
+            else:
+                violation["min_trust"] = min(violation["min_trust"], value)
+
+    last = None
+    for kind, event in events:
+        last = event
+        if kind in ("TRUST", "TRUST_IN", "TRUST_SET"):
+            counts["trust"] += 1
+            observer = None if kind == "TRUST" else event.self_id
+            trust[(observer, event.node)] = event.trust
+            observers = low_observers.setdefault(event.node, set())
+            if event.trust < trust_min:
+                observers.add(observer)
+                low_since.setdefault(event.node, event.sim_ms)
+            else:
+                observers.discard(observer)
+                if not observers:
+                    low_since.pop(event.node, None)
+            affected = children_of.get(event.node, ()) if observer is None else (
+                (observer,) if parent_of.get(observer) == event.node else ()
+            )
+            for child in list(affected):
+                recheck(child, event, "retained")
+        elif kind == "PARENT":
+            counts["parent"] += 1
+            previous = parent_of.get(event.node)
+            if previous != event.parent:
+                if previous is not None:
+                    children_of[previous].discard(event.node)
+                if event.parent is not None:
+                    children_of.setdefault(event.parent, set()).add(event.node)
+                parent_of[event.node] = event.parent
+            recheck(event.node, event, "selected")
+            if event.node in open_violations:
+                open_violations[event.node]["selections"] += 1
+        elif kind == "BLACKLIST":
+            counts["blacklist"] += 1
+            if event.action == "ADD":
+                listers[event.node] = listers.get(event.node, 0) + 1
+                entry = open_blacklist.get(event.node)
+                if entry is None:
+                    since = low_since.get(event.node)
+                    entry = open_blacklist[event.node] = {
+                        "node": event.node,
+                        "start_line": event.line,
+                        "start_ms": event.sim_ms,
+                        "max_listers": 0,
+                        "drops": 0,
+                        "low_trust_ms": since,
+                        "reaction_ms": (event.sim_ms - since) if since is not None and event.sim_ms is not None else None,
+                    }
+                entry["max_listers"] = max(entry["max_listers"], listers[event.node])
+            else:
+                listers[event.node] = max(0, listers.get(event.node, 0) - 1)
+                if not listers[event.node] and event.node in open_blacklist:
+                    entry = open_blacklist.pop(event.node)
+                    entry["end_line"] = event.line
+                    entry["end_ms"] = event.sim_ms
+                    blacklist.append(entry)
+        elif kind == "PKT_DROP":
+            counts["drop"] += 1
+            entry = open_blacklist.get(event.node)
+            if entry is not None:
+                entry["drops"] += 1
+            else:
+                stray_drops[event.node] = stray_drops.get(event.node, 0) + 1
+
+    for child in list(open_violations):
+        close_violation(open_violations, child, None, "end_of_log", violations)
+    for entry in open_blacklist.values():
+        entry["end_line"] = None
+        entry["end_ms"] = None
+        blacklist.append(entry)
+    violations.sort(key=lambda v: (v["start_line"], v["child"]))
+    blacklist.sort(key=lambda b: (b["start_line"], b["node"]))
+    return {
+        "violations": violations,
+        "blacklist": blacklist,
+        "stray_drops": stray_drops,
+        "counts": counts,
+        "last_line": last.line if last is not None else 0,
+        "last_ms": last.sim_ms if last is not None else None,
+    }
+
+
+def validate_log(log_file, trust_min=700):
+    return validate_events(cooja_log.iter_events(log_file, KINDS), trust_min)
+
+
+def interval_ms(row, last_ms):
+    end = row["end_ms"] if row["end_ms"] is not None else last_ms
+    if row["start_ms"] is None or end is None:
+        return None
+    return end - row["start_ms"]
+
+
+def write_rows(path, fields, rows):
+    with open(path, "w", newline="") as handle:
+        writer = csv.DictWriter(handle, fieldnames=fields, extrasaction="ignore")
+        writer.writeheader()
+        for row in rows:
+            writer.writerow({key: "" if row.get(key) is None else row[key] for key in fields})
+
+
+def print_report(result, trust_min):
+    counts = result["counts"]
+    print(f"[1] Events: trust={counts['trust']}, parent={counts['parent']}, "
+          f"blacklist={counts['blacklist']}, drops={counts['drop']}")
+
+    selected = [v for v in result["violations"] if v["cause"] == "selected"]
+    retained = [v for v in result["violations"] if v["cause"] == "retained"]
+    print(f"\n[2] Parent trust violations (trust < {trust_min} at the time):")
+    print(f"  - selected while low-trust: {len(selected)} interval(s)")
+    print(f"  - kept after trust dropped: {len(retained)} interval(s)")
+    for violation in result["violations"][:20]:
+        duration = interval_ms(violation, result["last_ms"])
+        print(f"  - child {violation['child']} -> parent {violation['parent']} ({violation['cause']}): "
+              f"line {violation['start_line']}..{violation['end_line'] or 'end'}, "
+              f"{'' if duration is None else f'{duration} ms, '}min trust={violation['min_trust']}, "
+              f"ended by {violation['end_reason']}")
+    if len(result["violations"]) > 20:
+        print(f"  ... ({len(result['violations']) - 20} more)")
+
+    print("\n[3] Blacklist timeline:")
+    if not result["blacklist"]:
+        print("  - no blacklist activity")
+    for entry in result["blacklist"]:
+        duration = interval_ms(entry, result["last_ms"])
+        reaction = "" if entry["reaction_ms"] is None else f", blacklisted {entry['reaction_ms']} ms after trust fell"
+        print(f"  - Node {entry['node']}: line {entry['start_line']}..{entry['end_line'] or 'end'}"
+              f"{'' if duration is None else f' ({duration} ms)'}, up to {entry['max_listers']} mote(s), "
+              f"{entry['drops']} drop(s){reaction}")
+    for node, drops in sorted(result["stray_drops"].items()):
+        print(f"  ⚠️  Node {node}: {drops} drop(s) while not blacklisted")
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Validate trust-aware parent selection and blacklisting in one pass")
+    ap.add_argument("log", help="COOJA.testlog")
+    ap.add_argument("--trust-min", type=int, default=700, help="TRUST_PARENT_MIN / BLACKLIST_TRUST_THRESHOLD")
+    ap.add_argument("--out-dir", help="Write violations.csv and blacklist_timeline.csv here")
+    args = ap.parse_args()
+
+    if not os.path.exists(args.log):
+        print(f"[ERROR] log not found: {args.log}", file=sys.stderr)
+        sys.exit(2)
+    result = validate_log(args.log, args.trust_min)
+    print_report(result, args.trust_min)
+    if args.out_dir:
+        os.makedirs(args.out_dir, exist_ok=True)
+        write_rows(os.path.join(args.out_dir, "violations.csv"), VIOLATION_FIELDS, result["violations"])
+        write_rows(os.path.join(args.out_dir, "blacklist_timeline.csv"), BLACKLIST_FIELDS, result["blacklist"])
+    sys.exit(1 if any(v["cause"] == "selected" for v in result["violations"]) else 0)
+
+
+if __name__ == "__main__":
+    main()
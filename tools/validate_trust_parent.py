@@ -2,51 +2,27 @@
 """
 Trust-based Parent Selection Validation Script
 Verifies that nodes with trust < TRUST_PARENT_MIN are not selected as parents
+(checked against the trust in effect when each parent was selected; see
+validate_run.py)
 """
 
 import sys
-import re
 from collections import defaultdict
 
-def parse_trust_log(log_file, trust_min=700):
-    """Parse trust values from log and identify low-trust nodes"""
-    trust_values = defaultdict(list)
-    low_trust_periods = defaultdict(list)
-    
-    with open(log_file, 'r') as f:
-        for line in f:
-            # Parse: CSV,TRUST,<node>,<seq>,<missed>,<trust>
-            match = re.search(r'CSV,TRUST,(\d+),(\d+),(\d+),(\d+)', line)
-            if match:
-                node_id = int(match.group(1))
-                seq = int(match.group(2))
-                trust = int(match.group(4))
-                trust_values[node_id].append((seq, trust))
-                
-                if trust < trust_min:
-                    low_trust_periods[node_id].append((seq, trust))
-    
-    return trust_values, low_trust_periods
+import cooja_log
+import validate_run
 
-def parse_parent_selection(log_file):
-    """Parse parent selection from log"""
-    parent_selections = []
-    
-    with open(log_file, 'r') as f:
-        for line in f:
-            # Parse: CSV,PARENT,<node>,<parent_ip>
-            match = re.search(r'CSV,PARENT,(\d+),(fe80::201:1:1:(\w+)|none)', line)
-            if match:
-                node_id = int(match.group(1))
-                parent_ip = match.group(2)
-                
-                if parent_ip != 'none':
-                    # Extract last byte of IPv6 address (node ID in hex)
-                    parent_hex = match.group(3)
-                    parent_node_id = int(parent_hex, 16)
-                    parent_selections.append((node_id, parent_node_id))
-    
-    return parent_selections
+def observed(events, trust_values, low_trust_periods, parent_selections, trust_min=700):
+    """Pass (kind, event) pairs through, collecting CSV,TRUST values, low-trust
+    nodes and (child, parent) pairs from CSV,PARENT on the way"""
+    for kind, event in events:
+        if kind == "TRUST":
+            trust_values[event.node].append((event.seq, event.trust))
+            if event.trust < trust_min:
+                low_trust_periods[event.node].append((event.seq, event.trust))
+        elif kind == "PARENT" and event.parent is not None:
+            parent_selections.append((event.node, event.parent))
+        yield kind, event
 
 def validate_trust_parent_exclusion(log_file, trust_min=700):
     """Validate that low-trust nodes are not selected as parents"""
@@ -56,8 +32,16 @@ def validate_trust_parent_exclusion(log_file, trust_min=700):
     print(f"TRUST_PARENT_MIN: {trust_min}")
     print(f"=" * 80)
     
-    # Parse trust values
-    trust_values, low_trust_periods = parse_trust_log(log_file, trust_min)
+    # One pass over the log: the statistics are gathered while the events
+    # stream into the time-aligned check (trust updates after a selection
+    # do not count against it)
+    trust_values = defaultdict(list)
+    low_trust_periods = defaultdict(list)
+    parent_selections = []
+    events = cooja_log.iter_events(log_file, ("TRUST", "TRUST_IN", "TRUST_SET", "PARENT"))
+    result = validate_run.validate_events(
+        observed(events, trust_values, low_trust_periods, parent_selections, trust_min), trust_min
+    )
     
     print(f"\n[1] Trust Statistics:")
     print(f"  - Total nodes with trust values: {len(trust_values)}")
@@ -80,34 +64,29 @@ def validate_trust_parent_exclusion(log_file, trust_min=700):
                 for seq, trust in periods[-2:]:
                     print(f"      seq {seq}: trust = {trust}")
     
-    # Parse parent selections
-    parent_selections = parse_parent_selection(log_file)
-    
     print(f"\n[3] Parent Selection Analysis:")
     print(f"  - Total parent selections logged: {len(parent_selections)}")
     
-    # Check if any low-trust node was selected as parent
-    violations = []
-    low_trust_nodes = set(low_trust_periods.keys())
-    
-    for child_node, parent_node in parent_selections:
-        if parent_node in low_trust_nodes:
-            violations.append((child_node, parent_node))
+    violations = [v for v in result["violations"] if v["cause"] == "selected"]
+    retained = [v for v in result["violations"] if v["cause"] == "retained"]
     
     if violations:
         print(f"\n[4] ⚠️  VIOLATIONS FOUND: {len(violations)}")
         print(f"  Low-trust nodes were selected as parents:")
-        violation_summary = defaultdict(int)
-        for child, parent in violations:
-            violation_summary[parent] += 1
+        violation_summary = defaultdict(lambda: [0, None])
+        for v in violations:
+            summary = violation_summary[v["parent"]]
+            summary[0] += v["selections"]
+            summary[1] = v["min_trust"] if summary[1] is None else min(summary[1], v["min_trust"])
         
         for parent_node in sorted(violation_summary.keys()):
-            count = violation_summary[parent_node]
-            min_trust = min(t for _, t in low_trust_periods[parent_node])
+            count, min_trust = violation_summary[parent_node]
             print(f"  - Node {parent_node} (min trust={min_trust}): selected {count} times")
     else:
         print(f"\n[4] ✅ VALIDATION PASSED")
         print(f"  No low-trust nodes were selected as parents!")
+    if retained:
+        print(f"  ℹ️  {len(retained)} interval(s) where a parent was kept after its trust dropped")
     
     # Additional analysis: show trust distribution
     print(f"\n[5] Trust Value Distribution:")